@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+import cpp2java
+import rules
+
+# Building blocks of the synthetic corpus. `{v}` is replaced by a fresh
+# variable name, `{i}` by the current indentation.
+_STRUCT = '''struct {T} {{
+  int i;
+  int j;
+  long long val;
+  {T}(int i, int j, long long val) : i(i), j(j), val(val) {{}}
+}};
+'''
+_DECLARATIONS = [
+    '{i}vector<int> {v};',
+    '{i}vector<int> {v}(n + 1);',
+    '{i}vector<int> {v}{{1, 2, 3}};',
+    '{i}vector<vector<long long>> {v}(m + 1, vector<long long>(n + 1));',
+    '{i}vector<vector<int>> {v}(n);',
+    '{i}vector<vector<pair<int, long>>> {v}(n);',
+    '{i}unordered_set<int> {v};',
+    '{i}set<long long> {v};',
+    '{i}stack<char> {v};',
+    '{i}queue<pair<int, int>> {v};',
+    '{i}unordered_map<string, int> {v};',
+    '{i}map<char, int> {v};',
+    '{i}priority_queue<pair<int, long>, vector<pair<int, long>>, greater<>> {v};',
+    '{i}priority_queue<int> {v};',
+    '{i}string {v};',
+    '{i}UF {v}(m * n);',
+]
+_LOOPS = [
+    '{i}for (const auto& [key, value] : {map}) {{',
+    '{i}for (const auto& [_, value] : {map}) {{',
+    '{i}for (const auto& [v, w] : {graph}[u]) {{',
+    '{i}for (const vector<int>& edge : edges) {{',
+    '{i}for (const int num : nums) {{',
+    '{i}for (int i = 0; i < n; ++i) {{',
+]
+_EXPRESSIONS = [
+    '{i}const int m = {array}.size();',
+    '{i}ans = max(ans, min(dp[i][j], abs(x - y)));',
+    '{i}if ({set}.count(x) && !{stack}.empty())',
+    '{i}  return INT_MAX;',
+    '{i}{stack}.push(c), {stack}.pop();',
+    '{i}{list}.push_back(to_string(stoi(s)));',
+    '{i}const long long kMod = 1\'000\'000\'007;',
+    '{i}TreeNode* node = root->left->right;',
+    '{i}ListNode* next = curr->next;',
+    '{i}const string& s = t.substr(i, j - i + 1) + t.substr(j);',
+    '{i}ans += {heap}.top(), {heap}.pop();',
+    '{i}{graph}[u].emplace_back(v, w);',
+    '{i}return accumulate(begin(nums), end(nums), 0);',
+    '{i}const int lo = *min_element(begin(nums), end(nums));',
+    '{i}sort(begin(nums), end(nums), greater<>());',
+    '{i}bool ok = curr != nullptr && LLONG_MAX > x;',
+]
+
+# Pathological lines as (prefix, unit, suffix): `unit` is repeated to make
+# the line long. Each one targets rules that used to backtrack on it.
+_ADVERSARIAL = {
+    'unclosed calls': ('', 'stoi(', ''),
+    'nested calls': ('', 'to_string(', 'x' + ')' * 8),
+    'quotes in a call': ('stoi(', '"]', 'x'),
+    'function header': ('int f(', 'a f(', ') {x'),
+    'constructor': ('A(', ') : ', '{}x'),
+    'substr chain': ('', 's.substr(', ''),
+    'long word': ('size() ', 'a', ''),
+    'long word before a subscript': ('', 'a', ' + b[0];'),
+    'peek then pop': ('', 'a.top(), ', 'b.pop();x'),
+    'min_element': ('', '*min_element(begin(', ''),
+    'accumulate': ('accumulate(begin(', 'x), end(', ''),
+    'emplace_back': ('.emplace_back(', 'a', ''),
+    'min heap': ('priority_queue<', 'a, vector<', ''),
+    'queue initializer': ('queue<', '> a{{', ''),
+    'vector sizes': ('vector<vector<int>> a(', 'b, vector<int>(', ''),
+    'vector size': ('vector<vector<', '>> a(', ''),
+    'braces': ('int a', '{', ''),
+}
+
+
+def generate_solution(rng: random.Random, num_lines: int) -> str:
+  # Returns a C++ solution of roughly `num_lines` lines.
+  lines: List[str] = []
+  counter = 0
+
+  def fresh() -> str:
+    nonlocal counter
+    counter += 1
+    return f'v{counter}'
+
+  lines.extend(_STRUCT.format(T=f'T{rng.randrange(100)}').splitlines())
+  lines.append('class Solution {')
+  lines.append(' public:')
+  while len(lines) < num_lines:
+    lines.append(f'  long long solve{fresh()}(vector<int>& nums, const string& s, int n) {{')
+    names = {
+        'array': 'nums', 'map': 'count', 'graph': 'graph', 'set': 'seen',
+        'stack': 'stack', 'list': 'ans', 'heap': 'maxHeap',
+    }
+    lines.extend([
+        '    unordered_map<string, int> count;',
+        '    vector<vector<pair<int, long>>> graph(n);',
+        '    unordered_set<int> seen;',
+        '    stack<char> stack;',
+        '    vector<int> ans;',
+        '    priority_queue<int> maxHeap;',
+    ])
+    for _ in range(rng.randint(3, 8)):
+      template = rng.choice(_DECLARATIONS)
+      lines.append(template.format(i='    ', v=fresh()))
+    for _ in range(rng.randint(2, 4)):
+      lines.append(rng.choice(_LOOPS).format(i='    ', **names))
+      for _ in range(rng.randint(1, 4)):
+        lines.append(rng.choice(_EXPRESSIONS).format(i='      ', **names))
+      lines.append('    }')
+    lines.append('    return 0;')
+    lines.append('  }')
+    lines.append('')
+  lines.append('};')
+  return '\n'.join(lines) + '\n'
+
+
+def generate_corpus(num_files: int, lines_per_file: int, seed: int = 0) -> List[str]:
+  rng = random.Random(seed)
+  return [generate_solution(rng, lines_per_file) for _ in range(num_files)]
+
+
+def bench_to_java(corpus: List[str], repeat: int) -> Dict[str, Any]:
+  sources = [source.splitlines(keepends=True) for source in corpus]
+  num_lines = sum(len(lines) for lines in sources)
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for lines in sources:
+      cpp2java.CppConverter().to_java(lines)
+    best = min(best, time.perf_counter() - start)
+
+  tracemalloc.start()
+  for lines in sources:
+    cpp2java.CppConverter().to_java(lines)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return {
+      'lines': num_lines,
+      'seconds': best,
+      'lines_per_sec': num_lines / best,
+      'peak_memory_bytes': peak,
+  }
+
+
+def bench_rules(corpus: List[str]) -> Dict[str, float]:
+  # Isolated cost of every rule over all corpus lines: prefilters plus the
+  # regex search for statement rules, the whole handler for rewrite rules.
+  lines = [line for source in corpus for line in source.splitlines()]
+  converter = cpp2java.CppConverter()
+  converter.to_java(lines)  # Learns the declared types.
+  candidates = [{id(rule) for rule in cpp2java._RULES.candidates(line)}
+                for line in lines]
+  seconds: Dict[str, float] = {}
+  for rule in cpp2java._RULES.rules:
+    start = time.perf_counter()
+    for line_number, line in enumerate(lines, 1):
+      if id(rule) not in candidates[line_number - 1]:
+        continue
+      if rule.when is not None and not rule.when(converter):
+        continue
+      if not all(s in line for s in rule.required):
+        continue
+      if rule.pattern is None:
+        rule.handler(converter, line, line_number)
+      else:
+        rule.pattern.search(line)
+    seconds[rule.name] = seconds.get(rule.name, 0.0) + \
+        time.perf_counter() - start
+  return seconds
+
+
+def bench_rule_stats(corpus: List[str]) -> Dict[str, Dict[str, Any]]:
+  # Attempts, hits and time of every rule in a real conversion of the corpus.
+  stats = rules.RuleStats()
+  for source in corpus:
+    cpp2java.CppConverter(stats=stats).to_java(source.splitlines(keepends=True))
+  return stats.to_json()
+
+
+def bench_adversarial(length: int) -> Dict[str, Dict[str, float]]:
+  # Seconds to convert every pathological line at `length` and 4 * `length`
+  # characters. Linear rules take about 4 times longer on the longer line.
+  results: Dict[str, Dict[str, float]] = {}
+  for name, (prefix, unit, suffix) in _ADVERSARIAL.items():
+    seconds = []
+    for n in (length, 4 * length):
+      line = prefix + unit * (n // len(unit)) + suffix
+      converter = cpp2java.CppConverter(line_budget=len(line))
+      start = time.perf_counter()
+      converter.to_java([line])
+      seconds.append(time.perf_counter() - start)
+    results[name] = {
+        'seconds': seconds[0],
+        'seconds_4x': seconds[1],
+        'growth': seconds[1] / seconds[0] if seconds[0] else 0.0,
+    }
+  return results
+
+
+def bench_cli(corpus: List[str], jobs: int) -> Dict[str, Any]:
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    for i, source in enumerate(corpus):
+      with open(os.path.join(tmp_dir, f'{i}.cpp'), 'w', encoding='utf-8') as f:
+        f.write(source)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cpp2java.py')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, script, '-q', '-j', str(jobs), tmp_dir],
+                   check=True)
+    seconds = time.perf_counter() - start
+  num_lines = sum(source.count('\n') for source in corpus)
+  # The peak RSS of the largest process waited for, i.e. of the CLI or of one
+  # of its workers. It's in KiB, but in bytes on macOS.
+  max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+  return {
+      'jobs': jobs,
+      'seconds': seconds,
+      'lines_per_sec': num_lines / seconds,
+      'peak_memory_bytes': max_rss if sys.platform == 'darwin' else max_rss * 1024,
+  }
+
+
+def _git_revision() -> str:
+  try:
+    return subprocess.run(
+        ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+  except OSError:
+    return ''
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  parser = argparse.ArgumentParser(description='Benchmarks the converter.')
+  parser.add_argument('--files', type=int, default=200)
+  parser.add_argument('--lines', type=int, default=60,
+                      help='lines per generated file')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                      help='worker processes for the CLI benchmark')
+  parser.add_argument('--no-cli', action='store_true',
+                      help='skip the CLI benchmark')
+  parser.add_argument('--adversarial-length', type=int, default=5000,
+                      help='length of the pathological lines (0 to skip)')
+  parser.add_argument('-o', '--output', help='write the results as JSON here')
+  args = parser.parse_args(argv)
+
+  corpus = generate_corpus(args.files, args.lines, args.seed)
+  results: Dict[str, Any] = {
+      'revision': _git_revision(),
+      'files': args.files,
+      'lines_per_file': args.lines,
+      'seed': args.seed,
+      'to_java': bench_to_java(corpus, args.repeat),
+      'rules': bench_rules(corpus),
+      'rule_stats': bench_rule_stats(corpus),
+  }
+  if args.adversarial_length:
+    results['adversarial'] = bench_adversarial(args.adversarial_length)
+  if not args.no_cli:
+    results['cli'] = bench_cli(corpus, args.jobs)
+
+  to_java = results['to_java']
+  print(f"to_java: {to_java['lines']} lines in {to_java['seconds']:.3f}s "
+        f"({to_java['lines_per_sec']:,.0f} lines/s), "
+        f"peak memory {to_java['peak_memory_bytes'] / 1024:,.0f} KiB")
+  if 'cli' in results:
+    cli = results['cli']
+    print(f"cli -j {cli['jobs']}: {cli['seconds']:.3f}s "
+          f"({cli['lines_per_sec']:,.0f} lines/s), "
+          f"peak memory {cli['peak_memory_bytes'] / 1024:,.0f} KiB")
+  if 'adversarial' in results:
+    print(f'adversarial lines ({args.adversarial_length:,} and '
+          f'{4 * args.adversarial_length:,} chars):')
+    for name, result in results['adversarial'].items():
+      print(f"  {name:<32} {result['seconds'] * 1000:9.2f} ms "
+            f"{result['seconds_4x'] * 1000:9.2f} ms  x{result['growth']:.1f}")
+  print('per-rule time:')
+  for name, seconds in sorted(results['rules'].items(), key=lambda item: -item[1]):
+    print(f'  {name:<32} {seconds * 1000:9.2f} ms')
+
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=2)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
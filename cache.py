@@ -0,0 +1,73 @@
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import files
+
+
+class ConversionCache:
+  """An on-disk cache mapping C++ sources to the Java they convert to.
+
+  Entries are keyed by the SHA-256 of the converter version and the source,
+  and stored as `<directory>/<key[:2]>/<key>.java`. A hit refreshes the
+  entry's mtime, and `evict()` removes the least recently used entries until
+  the cache fits in `max_bytes`.
+  """
+
+  def __init__(self, directory: str, version: str,
+               max_bytes: int = 256 * 1024 * 1024):
+    self.directory = directory
+    self.version = version
+    self.max_bytes = max_bytes
+
+  def key(self, source: bytes) -> str:
+    h = hashlib.sha256(self.version.encode())
+    h.update(b'\0')
+    h.update(source)
+    return h.hexdigest()
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self.directory, key[:2], f'{key}.java')
+
+  def get(self, key: str) -> Optional[str]:
+    path = self._path(key)
+    try:
+      with open(path, 'r', encoding='utf-8') as f:
+        java = f.read()
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    return java
+
+  def put(self, key: str, java: str) -> None:
+    path = self._path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    files.write_atomically(path, java.encode('utf-8'))
+
+  def evict(self) -> int:
+    # Returns the number of evicted entries.
+    entries: List[Tuple[float, int, str]] = []
+    total = 0
+    if not os.path.isdir(self.directory):
+      return 0
+    for subdir in os.scandir(self.directory):
+      if not subdir.is_dir():
+        continue
+      for entry in os.scandir(subdir.path):
+        if not entry.name.endswith('.java'):
+          continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    entries.sort()
+    evicted = 0
+    for _, size, path in entries:
+      if total <= self.max_bytes:
+        break
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        pass
+      total -= size
+      evicted += 1
+    return evicted
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import files
+import support
+from diagnostics import Diagnostic
+
+
+def default_socket_path() -> str:
+  runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+  return os.environ.get('CPP2JAVA_SOCKET') or \
+      os.path.join(runtime_dir, f'cpp2java-{os.getuid()}.sock')
+
+
+class ServerError(Exception):
+  pass
+
+
+class Client:
+  """A connection to the conversion server (see server.py), which can serve
+  any number of requests.
+
+  It only imports the standard library modules it needs, so it starts much
+  faster than `cpp2java.py`.
+  """
+
+  def __init__(self, socket_path: Optional[str] = None):
+    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      self._sock.connect(socket_path or default_socket_path())
+    except OSError:
+      self._sock.close()
+      raise
+    self._reader = self._sock.makefile('rb')
+    self._next_id = 0
+
+  def close(self) -> None:
+    self._reader.close()
+    self._sock.close()
+
+  def __enter__(self) -> 'Client':
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  def convert(self, source: str,
+              options: Optional[Dict[str, Any]] = None) -> str:
+    return self.convert_with_diagnostics(source, options)[0]
+
+  def convert_with_diagnostics(
+          self, source: str, options: Optional[Dict[str, Any]] = None
+  ) -> Tuple[str, List[Dict[str, Any]]]:
+    # Also returns what couldn't be converted, as JSON objects of
+    # `diagnostics.Diagnostic`. `options` are the converter's, see
+    # `server.OPTIONS`.
+    self._next_id += 1
+    request: Dict[str, Any] = {'id': self._next_id, 'source': source}
+    if options:
+      request['options'] = options
+    self._sock.sendall(json.dumps(request).encode() + b'\n')
+    line = self._reader.readline()
+    if not line:
+      raise ServerError('connection closed by the server')
+    response = json.loads(line)
+    if 'error' in response:
+      raise ServerError(response['error'])
+    return response['java'], response.get('diagnostics', [])
+
+
+def _print_diagnostics(filename: str,
+                       diagnostics: List[Dict[str, Any]]) -> None:
+  for diagnostic in diagnostics:
+    print(Diagnostic(**diagnostic).format(filename), file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  parser = argparse.ArgumentParser(
+      description='Converts C++ solutions to Java with a running server '
+                  '(see server.py), or in-process if none is running.')
+  parser.add_argument('paths', nargs='+',
+                      help='.cpp files, or - to convert stdin to stdout')
+  parser.add_argument('--socket', help='path of the Unix socket of the server')
+  parser.add_argument('--profile', default='boxed',
+                      help='output profile, see cpp2java.py --help')
+  parser.add_argument('--csr', action='store_true',
+                      help='emit adjacency lists as CSR graphs')
+  parser.add_argument('--pack-pairs', action='store_true',
+                      help='pack pairs of ints of heaps and queues into longs')
+  args = parser.parse_args(argv)
+  options = {'profile': args.profile, 'csr': args.csr,
+             'pack_pairs': args.pack_pairs}
+
+  try:
+    client = Client(args.socket)
+  except OSError:
+    # No server, convert in-process.
+    import cpp2java
+    flags = ['--profile', args.profile]
+    if args.csr:
+      flags.append('--csr')
+    if args.pack_pairs:
+      flags.append('--pack-pairs')
+    return cpp2java.main(flags + args.paths)
+
+  with client:
+    if args.paths == ['-']:
+      java, diagnostics = client.convert_with_diagnostics(sys.stdin.read(),
+                                                          options)
+      sys.stdout.write(java)
+      _print_diagnostics('<stdin>', diagnostics)
+      return 0
+    failures = 0
+    for in_filename in args.paths:
+      try:
+        out_filename = files.java_filename(in_filename)
+        with open(in_filename, 'r', encoding='utf-8') as f:
+          java, diagnostics = client.convert_with_diagnostics(f.read(), options)
+        files.write_if_changed(out_filename, java)
+        support.copy_required_files(java, os.path.dirname(out_filename))
+        _print_diagnostics(in_filename, diagnostics)
+      except (OSError, UnicodeDecodeError, ValueError, ServerError) as e:
+        print(f'{in_filename}: {type(e).__name__}: {e}', file=sys.stderr)
+        failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
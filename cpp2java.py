@@ -1,18 +1,94 @@
+import argparse
+import collections
+import concurrent.futures
+import functools
+import glob
+import hashlib
+import io
+import json
 import os.path
 import re
 import sys
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Match, NamedTuple, Optional, Set, TextIO, Tuple
 
+import csr
+import files
 import keywords
+import lexer
+import rules
+import statements
+import support
+import symbols
 import util
+import watch
+from cache import ConversionCache
+from diagnostics import Diagnostics
+
+
+# Lines longer than this are kept as they are (see `CppConverter`).
+DEFAULT_LINE_BUDGET = 10_000
+
+# Output profiles: 'boxed' uses Java's collections, 'primitive' uses the
+# int/long specialized ones of support/Primitives.java where the element types
+# allow it.
+PROFILES = ('boxed', 'primitive')
 
 
 class CppConverter:
-  def __init__(self):
+  # `sequential_replace` applies `keywords.replaced_end` entry by entry like
+  # older versions did, instead of in one leftmost-longest pass. If `stats` is
+  # given, every rule attempt is recorded in it. What can't be converted is
+  # recorded in `diagnostics` (a new collector if not given). `profile` is
+  # one of `PROFILES`. With `csr`, adjacency lists that are built, then only
+  # read are emitted as support/CsrGraph.java (see csr.py), which needs the
+  # whole input before converting the first line. With `pack_pairs`, heaps and
+  # queues of pair<int, int> store each pair in a long, see
+  # support/PackedPairs.java.
+  #
+  # Every rule runs in time linear in the line's length, but a minified or
+  # macro-expanded line can still be huge: statements longer than
+  # `line_budget` characters are passed through unchanged with a warning.
+  def __init__(self, sequential_replace: bool = False,
+               stats: Optional[rules.RuleStats] = None,
+               line_budget: int = DEFAULT_LINE_BUDGET,
+               diagnostics: Optional[Diagnostics] = None,
+               profile: str = 'boxed',
+               csr: bool = False,
+               pack_pairs: bool = False):
+    if profile not in PROFILES:
+      raise ValueError(f'unknown profile {profile!r}')
+    self._sequential_replace = sequential_replace
+    self._profile = profile
+    self._csr = csr
+    self._pack_pairs = pack_pairs
+    # Line numbers of the declarations of the graphs emitted as CSR.
+    self._csr_graphs: Set[int] = set()
+    # Line numbers of the `string s = "";` emitted as StringBuilders.
+    self._string_builders: Set[int] = set()
+    self._stats = stats
+    self.diagnostics = diagnostics if diagnostics is not None \
+        else Diagnostics()
+    self._line_budget = line_budget
+    self._lexer = lexer.Lexer()
+    self._code = ''
+    self._rewritten_code = ''
     self._is_private = False
     self._is_in_class = False
-    self._function_block_level = 0
-    self._var_to_type: Dict[str, str] = {}
+    # Types of the declared variables, scoped by braces.
+    self._var_to_type = symbols.SymbolTable()
+    # Java return type of the function being converted.
+    self._return_type = ''
+    # Literals of the line being converted, see `_split_line()`.
+    self._literals: List[str] = []
+    # Whether the previous line is e.g. 'for (...)' without a brace, so that
+    # this line is the whole body.
+    self._is_braceless_header = False
+    self._is_braceless_body = False
+    self._has_imports = False
+    self._has_main = False
+    # Depth of the scope of a top-level main(), which is wrapped in a class.
+    self._main_depth: Optional[int] = None
+    self._uses_stdio = False
 
   def _convert_substr_to_substring(self, groups: Tuple[str, str, str]) -> str:
     var, start, end = groups
@@ -26,21 +102,119 @@ class CppConverter:
       return f'{var}.substring({start}, {tokens[0]})'
     return f'{var}.substring({start}, ???)'
 
+  def _primitive_class(self, cpp_container: str, *cpp_types: str) -> Optional[str]:
+    # The class of support/Primitives.java replacing `cpp_container` of
+    # `cpp_types` with the 'primitive' profile, if any.
+    if self._profile != 'primitive':
+      return None
+    object_types = tuple(util.to_object_type(type) for type in cpp_types)
+    return _PRIMITIVE_CLASSES.get((cpp_container, object_types))
+
+  def _packed_pair_class(self, java_class: str, cpp_type: str) -> Optional[str]:
+    # The class of support/PackedPairs.java replacing `java_class` of
+    # `cpp_type` with `pack_pairs`, if any.
+    if not self._pack_pairs or \
+            util.to_object_type(cpp_type) != 'Pair<Integer, Integer>':
+      return None
+    return _PACKED_PAIR_CLASSES.get(java_class)
+
+  def _element_type(self, expr: str) -> str:
+    # The type of e.g. 'graph[u]' if `graph` is an array.
+    var, *indices = expr.split('[')
+    type: str = self._var_to_type.get(var, 'UNKNOWN_TYPE')
+    for _ in indices:
+      if not type.endswith('[]'):
+        return 'UNKNOWN_TYPE'
+      type = type[:-2]
+    return type
+
+  def _split_line(self, line: str) -> Tuple[str, List[str], str]:
+    # Lexes the line once and splits it into
+    #
+    #   1. the code, with every string/char literal and inner comment replaced
+    #      by a placeholder '"i"', so that no rule can rewrite them,
+    #   2. the literals, to be put back by `_restore_literals()`,
+    #   3. the trailing comment with its leading spaces.
+    #
+    # The token-level rewrites (see `_rewrite_tokens()`) are done in the same
+    # pass and kept in `self._rewritten_code`.
+    if not self._lexer.in_block_comment and not _LEXED_CHARS.search(line):
+      # Nothing to mask or rewrite.
+      self._code = self._rewritten_code = line
+      return line, [], ''
+    tokens = self._lexer.tokenize(line)
+    end = len(tokens)
+    while end and tokens[end - 1].kind == lexer.SPACE:
+      end -= 1
+    comment = ''
+    if end and tokens[end - 1].kind == lexer.COMMENT:
+      end -= 1
+      while end and tokens[end - 1].kind == lexer.SPACE:
+        end -= 1
+      comment = ''.join(token.text for token in tokens[end:])
+      del tokens[end:]
+
+    literals: List[str] = []
+    for i, token in enumerate(tokens):
+      if token.kind in lexer.LITERALS:
+        tokens[i] = lexer.Token(lexer.STRING, f'"{len(literals)}"')
+        literals.append(token.text)
+
+    self._code = ''.join(token.text for token in tokens)
+    self._rewritten_code = ''.join(_rewrite_tokens(tokens))
+    return self._code, literals, comment
+
   def _substitute(self, line: str, line_number: int) -> str:
+    code, literals, comment = self._split_line(line)
+    if comment and not code.strip():
+      # Comments are kept as is.
+      return line
+
     # If we meet 'private:' keyword, then any method we meet later should be
     # prefixed with 'private '.
-    if 'private:' in line:
+    if 'private:' in code:
       self._is_private = True
 
     for access_modifier in ['public:', 'private:']:
-      if access_modifier in line:
+      if access_modifier in code:
         return ''
 
-    ########
-    # Stmt #
-    ########
-
-    # Converts `struct` to `class`.
+    self._is_braceless_body = self._is_braceless_header
+    self._is_braceless_header = bool(_BRACELESS_HEADER.match(code))
+    if '{' in code or '}' in code:
+      self._enter_and_exit_scopes(code)
+    if len(code) > self._line_budget:
+      self.diagnostics.warning(
+          'line budget', line_number,
+          f'longer than {self._line_budget} characters, kept as is', line)
+      return line
+    self._literals = literals
+    java_line = _RULES.apply(self, code, line_number, self._stats)
+    if literals:
+      java_line = _PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], java_line)
+    if comment and java_line:
+      java_line += comment
+    return java_line
+
+  def _enter_and_exit_scopes(self, code: str) -> None:
+    # Closes the scopes the line closes and opens the ones it leaves open
+    # before the line is converted, so e.g. a function's parameters are
+    # declared in the function's scope:
+    #
+    #   '} else {'         -> pop, push
+    #   'int f(int x) {'   -> push, then x is declared
+    #   'A = {1, 2};'      -> nothing
+    closes, opens = _count_braces(code)
+    for _ in range(closes):
+      self._var_to_type.pop()
+    for _ in range(opens):
+      self._var_to_type.push()
+
+  ########
+  # Stmt #
+  ########
+
+  def _convert_struct(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -struct T {
         -  int i;
         -  int j;
@@ -59,186 +233,223 @@ class CppConverter:
         +}
     }
     """
-    match = re.search(r'^(\s*)struct (\w+) \{$', line)
-    if match:
-      spaces, class_name = match.groups()
-      self._is_in_class = True
-      return f'{spaces}class {class_name} ' + '{'
-    match = re.search(r'^};$', line)
-    if match:
-      self._is_in_class = False
-      return '}'
-    match = re.search(r'^(\s*)(\w+)\((.*)\) : (.+) {}$', line)
-    if match:
-      spaces, class_name, params, initializer_list = match.groups()
-      tokens = util.tokenize(params)
-      types = [util.to_java_type(token.rsplit(' ', 1)[0]) for token in tokens]
-      names = [token.rsplit(' ', 1)[1] for token in tokens]
-      java_params = ', '.join([f'{type} {name}'
-                               for type, name in zip(types, names)])
-      assignments = [f'{spaces}  this.{name} = {name};' for name in names]
-      access_modifier = 'public' if self._is_in_class else '???'
-      if java_params:
-        return \
-            f'{spaces}{access_modifier} {class_name}({java_params}) ' + '{\n' \
-            + f'\n'.join(assignments) + f'\n{spaces}' + '}'
-    if self._is_in_class:
-      match = re.search(r'^(\s*)(.*);$', line)
-      if match:
-        spaces, var_declaration = match.groups()
-        return f'{spaces}public {var_declaration};'
-
-    # Converts class constructor.
+    spaces, class_name = match.groups()
+    self._is_in_class = True
+    return f'{spaces}class {class_name} ' + '{'
+
+  def _convert_struct_end(self, line: str, line_number: int, match: Match[str]) -> str:
+    self._is_in_class = False
+    return '}'
+
+  def _convert_initializer_list_constructor(
+          self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
+    spaces, class_name, params, initializer_list = match.groups()
+    tokens = util.tokenize(params)
+    types = [util.to_java_type(token.rsplit(' ', 1)[0]) for token in tokens]
+    names = [token.rsplit(' ', 1)[1] for token in tokens]
+    java_params = ', '.join([f'{type} {name}'
+                             for type, name in zip(types, names)])
+    assignments = [f'{spaces}  this.{name} = {name};' for name in names]
+    access_modifier = 'public' if self._is_in_class else '???'
+    if java_params:
+      return \
+          f'{spaces}{access_modifier} {class_name}({java_params}) ' + '{\n' \
+          + f'\n'.join(assignments) + f'\n{spaces}' + '}'
+    return None
+
+  def _convert_class_member(self, line: str, line_number: int, match: Match[str]) -> str:
+    spaces, var_declaration = match.groups()
+    return f'{spaces}public {var_declaration};'
+
+  def _convert_class_constructor(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -MyClass(const vector<int>& v1) {
         +MyClass(int[] v1) {
     """
-    match = re.search(r'^(\s*)(\w+)\((.*)\) {$', line)
-    if match:
-      spaces, class_name, cpp_params = match.groups()
-      access_modifier = 'private' if self._is_private else 'public'
-      if cpp_params:
-        return f'{spaces}{access_modifier} {class_name}({util.to_java_params(cpp_params)}) ' + '{'
-      return line
+    spaces, class_name, cpp_params = match.groups()
+    access_modifier = 'private' if self._is_private else 'public'
+    if cpp_params:
+      return f'{spaces}{access_modifier} {class_name}({util.to_java_params(cpp_params)}) ' + '{'
+    return line
+
+  ############
+  # Var Decl #
+  ############
 
-    ############
-    # Var Decl #
-    ############
-
-    # Converts C++ container to Java interface and implementation.
-    for cpp_container, (java_interface, java_implementation) in keywords.data_structure.items():
-      pattern = r'^(\s*)' + cpp_container + r'<(.*)> (\w+);$'
-      match = re.search(pattern, line)
-      if match:
-        spaces, type, var = match.groups()
-        object_type = util.to_object_type(type)
-        full_type = f'{java_interface}<{object_type}>'
-        self._var_to_type[var] = full_type
-        return f'{spaces}{full_type} {var} = new {java_implementation}<>();'
-
-    # Converts `std::unordered_map` to `HashMap`.
+  def _convert_container(self, line: str, line_number: int, match: Match[str],
+                         cpp_container: str, java_interface: str,
+                         java_implementation: str) -> str:
+    """ -unordered_set<int> seen;
+        +Set<Integer> seen = new HashSet<>();
+        +IntSet seen = new IntSet();  // --profile primitive
+
+        -queue<pair<int, int>> q;
+        +LongQueue q = new LongQueue();  // --pack-pairs
+    """
+    spaces, type, var = match.groups()
+    primitive_class = self._primitive_class(cpp_container, type) or \
+        self._packed_pair_class(java_implementation, type)
+    if primitive_class:
+      self._var_to_type[var] = primitive_class
+      return f'{spaces}{primitive_class} {var} = new {primitive_class}();'
+    object_type = util.to_object_type(type)
+    full_type = f'{java_interface}<{object_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new {java_implementation}<>();'
+
+  def _convert_unordered_map(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -unordered_map<char, int> count;
         +Map<Character, Integer> count = new HashMap<>();
+
+        -unordered_map<int, int> count;
+        +IntIntMap count = new IntIntMap();  // --profile primitive
+
+        -unordered_map<int, vector<int>> graph;
+        +Map<Integer, List<Integer>> graph = new HashMap<>();
     """
-    match = re.search(r'^(\s*)unordered_map<([^,]+), (.*)> (\w+);$', line)
-    if match:
-      spaces, key_type, value_type, var = match.groups()
-      object_key_type = util.to_object_type(key_type)
-      object_value_type = util.to_object_type(value_type)
-      full_type = f'Map<{object_key_type}, {object_value_type}>'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new HashMap<>();'
-
-    # Converts `std::map` to `TreeMap`.
+    spaces, key_type, value_type, var = match.groups()
+    primitive_class = self._primitive_class('unordered_map', key_type, value_type)
+    if primitive_class:
+      self._var_to_type[var] = primitive_class
+      return f'{spaces}{primitive_class} {var} = new {primitive_class}();'
+    object_key_type = util.to_object_type(key_type)
+    vector = _VECTOR.fullmatch(value_type)
+    # Vector values are appended to, see `_rewrite_map_idioms()`.
+    object_value_type = f'List<{util.to_object_type(vector.group(1))}>' \
+        if vector else util.to_object_type(value_type)
+    full_type = f'Map<{object_key_type}, {object_value_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new HashMap<>();'
+
+  def _convert_map(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -map<char, int> count;
         +TreeMap<Character, Integer> count = new TreeMap<>();
     """
-    match = re.search(r'^(\s*)map<([^,]+), ([^>]+)> (\w+);$', line)
-    if match:
-      spaces, key_type, value_type, var = match.groups()
-      object_key_type = util.to_object_type(key_type)
-      object_value_type = util.to_object_type(value_type)
-      full_type = f'TreeMap<{object_key_type}, {object_value_type}>'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new TreeMap<>();'
-
-    # Converts `std::priority_queue` minHeap to `PriorityQueue`.
+    spaces, key_type, value_type, var = match.groups()
+    object_key_type = util.to_object_type(key_type)
+    object_value_type = util.to_object_type(value_type)
+    full_type = f'TreeMap<{object_key_type}, {object_value_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new TreeMap<>();'
+
+  def _convert_min_heap(
+          self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
     """ -priority_queue<pair<int, long>, vector<pair<int, long>>, greater<>> minHeap;
         +Queue<Pair<Integer, Long>> minHeap = new PriorityQueue<>();
-    """
-    match = re.search(
-        r'^(\s*)priority_queue<(.*), vector<(?:.*)>, greater<>> (\w+);$',
-        line)
-    if match:
-      spaces, type, var = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'Queue<{object_type}>'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new PriorityQueue<>();'
 
-    # Converts `std::priority_queue` maxHeap to `PriorityQueue`.
+        -priority_queue<pair<int, int>, vector<pair<int, int>>, greater<>> minHeap;
+        +LongHeap minHeap = new LongHeap();  // --pack-pairs
+    """
+    spaces, type_args, var = match.groups()
+    type_args = util.tokenize(type_args)
+    if len(type_args) != 2 or not type_args[1].startswith('vector<'):
+      return None
+    type = type_args[0]
+    packed_pair_class = self._packed_pair_class('PriorityQueue', type)
+    if packed_pair_class:
+      self._var_to_type[var] = packed_pair_class
+      return f'{spaces}{packed_pair_class} {var} = new {packed_pair_class}();'
+    object_type = util.to_object_type(type)
+    full_type = f'Queue<{object_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new PriorityQueue<>();'
+
+  def _convert_max_heap(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -priority_queue<pair<int, int>> maxHeap;
         +Queue<Pair<Integer, Integer>> maxHeap = new PriorityQueue<>(Collections.reverseOrder());'
+        +LongHeap maxHeap = LongHeap.maxHeap();  // --pack-pairs
     """
-    match = re.search(r'^(\s*)priority_queue<(.*)> (\w+);$', line)
-    if match:
-      spaces, type, var = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'Queue<{object_type}>'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new PriorityQueue<>(Collections.reverseOrder());'
-
-    # Converts `std::queue` with initializer list to `ArrayDeque`.
+    spaces, type, var = match.groups()
+    packed_pair_class = self._packed_pair_class('PriorityQueue', type)
+    if packed_pair_class:
+      self._var_to_type[var] = packed_pair_class
+      return f'{spaces}{packed_pair_class} {var} = {packed_pair_class}.maxHeap();'
+    object_type = util.to_object_type(type)
+    full_type = f'Queue<{object_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new PriorityQueue<>(Collections.reverseOrder());'
+
+  def _convert_queue_with_initializer_list(
+          self, line: str, line_number: int, match: Match[str]) -> str:
     """ -queue<pair<TreeNode*, int>> q{{{root, 1}, {node, 2}}};
         +Queue<Pair<TreeNode, Integer>> q = new ArrayDeque<>(Arrays.asList(new Pair<>(root, 1), new Pair<>(node, 2)));
+
+        -queue<pair<int, int>> q{{{i, 1}, {j, 2}}};
+        +LongQueue q = LongQueue.of(Pairs.pack(i, 1), Pairs.pack(j, 2));  // --pack-pairs
     """
-    match = re.search(r'^(\s*)queue<(.*)> (\w+){{(.*)}};$', line)
-    if match:
-      spaces, type, var, initializer_list = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'Queue<{object_type}>'
-      self._var_to_type[var] = full_type
-      if object_type.startswith('Pair<'):
-        java_initializer_list = util.to_java_initializer_list(initializer_list)
-        return \
-            f'{spaces}{full_type} {var} = new ArrayDeque<>' \
-            f'(Arrays.asList({java_initializer_list}));'
+    spaces, type, var, initializer_list = match.groups()
+    packed_pair_class = self._packed_pair_class('ArrayDeque', type)
+    if packed_pair_class:
+      self._var_to_type[var] = packed_pair_class
+      packed_pairs = ', '.join(
+          f'Pairs.pack({pair})'
+          for pair in _PAIR_INITIALIZER.findall(initializer_list))
+      return f'{spaces}{packed_pair_class} {var} = {packed_pair_class}.of({packed_pairs});'
+    object_type = util.to_object_type(type)
+    full_type = f'Queue<{object_type}>'
+    self._var_to_type[var] = full_type
+    if object_type.startswith('Pair<'):
+      java_initializer_list = util.to_java_initializer_list(initializer_list)
       return \
           f'{spaces}{full_type} {var} = new ArrayDeque<>' \
-          f'(Arrays.asList({initializer_list}));'
+          f'(Arrays.asList({java_initializer_list}));'
+    return \
+        f'{spaces}{full_type} {var} = new ArrayDeque<>' \
+        f'(Arrays.asList({initializer_list}));'
 
-    # Converts 1D `std::vector` to `ArrayList`.
+  def _convert_vector(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -vector<int> A;
         +List<Integer> A = new ArrayList<>();
+        +IntList A = new IntList();  // --profile primitive
     """
-    match = re.search(r'^(\s*)vector<([^>]+)> (\w+);$', line)
-    if match:
-      spaces, type, var = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'List<{object_type}>'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new ArrayList<>();'
-
-    # Converts 1D `std::vector` with initializer list to `ArrayList`.
+    spaces, type, var = match.groups()
+    primitive_class = self._primitive_class('vector', type)
+    if primitive_class:
+      self._var_to_type[var] = primitive_class
+      return f'{spaces}{primitive_class} {var} = new {primitive_class}();'
+    object_type = util.to_object_type(type)
+    full_type = f'List<{object_type}>'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new ArrayList<>();'
+
+  def _convert_vector_with_initializer_list(
+          self, line: str, line_number: int, match: Match[str]) -> str:
     """ -vector<int> A{1, f(x)};
         +List<Integer> A = new ArrayList<>(Arrays.asList(1, f(x)));
+        +IntList A = IntList.of(1, f(x));  // --profile primitive
     """
-    match = re.search(r'^(\s*)vector<([^>]+)> (\w+)\{(.*)\};$', line)
-    if match:
-      spaces, type, var, initializer_list = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'List<{object_type}>'
-      self._var_to_type[var] = full_type
-      return \
-          f'{spaces}{full_type} {var} = new ArrayList<>' \
-          f'(Arrays.asList({initializer_list}));'
-
-    # Converts 1D `std::vector` with initialized size to 1D array.
+    spaces, type, var, initializer_list = match.groups()
+    primitive_class = self._primitive_class('vector', type)
+    if primitive_class:
+      self._var_to_type[var] = primitive_class
+      return f'{spaces}{primitive_class} {var} = {primitive_class}.of({initializer_list});'
+    object_type = util.to_object_type(type)
+    full_type = f'List<{object_type}>'
+    self._var_to_type[var] = full_type
+    return \
+        f'{spaces}{full_type} {var} = new ArrayList<>' \
+        f'(Arrays.asList({initializer_list}));'
+
+  def _convert_vector_with_size(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -vector<int> A(1 + B.size());
         +int[] A = new int[1 + B.size()];
     """
-    match = re.search(r'^(\s*)vector<([^>]+)> (\w+)\((.*)\);$', line)
-    if match:
-      spaces, type, var, sz = match.groups()
-      java_type = util.to_java_type(type)
-      full_type = f'{java_type}[]'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new {java_type}[{sz}];'
+    spaces, type, var, sz = match.groups()
+    java_type = util.to_java_type(type)
+    full_type = f'{java_type}[]'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new {java_type}[{sz}];'
 
-    # Converts 2D `std::vector` with initialized sizes to 2D array.
+  def _convert_2d_vector_with_sizes(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -vector<vector<long long>> A(m + 1, vector<long long>(n + 1));
         +long[][] A = new long[m + 1][n + 1];
     """
-    match = re.search(
-        r'^(\s*)vector<vector<([^>]+)>> (\w+)\((.+), vector<[^>]+>\((\w+|.*?)\)\);$',
-        line)
-    if match:
-      spaces, type, var, sz1, sz2 = match.groups()
-      java_type = util.to_java_type(type)
-      full_type = f'{java_type}[][]'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new {java_type}[{sz1}][{sz2}];'
+    spaces, type, var, sz1, sz2 = match.groups()
+    java_type = util.to_java_type(type)
+    full_type = f'{java_type}[][]'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new {java_type}[{sz1}][{sz2}];'
 
-    # Converts 2D `std::vector` with initialized size to 2D array.
+  def _convert_2d_vector_with_size(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -vector<vector<int>> graph(n);
         +List<Integer>[] graph = new List[n];
         +
@@ -250,81 +461,180 @@ class CppConverter:
         +
         +for (int i = 0; i < n; ++i)
         +  graph[i] = new ArrayList<>();
+
+        -vector<vector<int>> graph(n);  // --profile primitive
+        +IntList[] graph = new IntList[n];
+        +
+        +for (int i = 0; i < n; ++i)
+        +  graph[i] = new IntList();
+
+        -vector<vector<int>> graph(n);  // --csr, if planned
+        +CsrGraph graph = new CsrGraph(n);
     """
-    match = re.search(
-        r'^(\s*)vector<vector<(.*)>> (\w+)\((.*)\);$',
-        line)
-    if match:
-      spaces, type, var, sz = match.groups()
-      object_type = util.to_object_type(type)
-      full_type = f'List<{object_type}>[]'
-      self._var_to_type[var] = full_type
+    spaces, type, var, sz = match.groups()
+    if line_number in self._csr_graphs:
+      self._var_to_type[var] = 'CsrGraph'
+      return f'{spaces}CsrGraph {var} = new CsrGraph({sz});'
+    primitive_class = self._primitive_class('vector', type)
+    if primitive_class:
+      self._var_to_type[var] = f'{primitive_class}[]'
       return \
-          f'{spaces}{full_type} {var} = new List[{sz}];\n\n' \
+          f'{spaces}{primitive_class}[] {var} = new {primitive_class}[{sz}];\n\n' \
           f'{spaces}for (int i = 0; i < {sz}; ++i)\n' \
-          f'{spaces}  {var}[i] = new ArrayList<>();'
-
-    # Converts class var declaration.
+          f'{spaces}  {var}[i] = new {primitive_class}();'
+    object_type = util.to_object_type(type)
+    full_type = f'List<{object_type}>[]'
+    self._var_to_type[var] = full_type
+    return \
+        f'{spaces}{full_type} {var} = new List[{sz}];\n\n' \
+        f'{spaces}for (int i = 0; i < {sz}; ++i)\n' \
+        f'{spaces}  {var}[i] = new ArrayList<>();'
+
+  def _convert_class_var(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -UF uf(m * n);
         +UF uf = new UF(m * n);
     """
-    match = re.search(r'^(\s*)(\w+) (\w+)\((.*)\);$', line)
-    if match:
-      spaces, class_name, var, arguments = match.groups()
-      return f'{spaces}{class_name} {var} = new {class_name}({arguments});'
+    spaces, class_name, var, arguments = match.groups()
+    return f'{spaces}{class_name} {var} = new {class_name}({arguments});'
 
-    # Converts `std::string` var declaration.
+  def _convert_string(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -string s;
         +StringBuilder s = new StringBuilder();
     """
-    match = re.search(r'^(\s*)string (\w+);$', line)
-    if match:
-      spaces, var = match.groups()
-      full_type = 'StringBuilder'
-      self._var_to_type[var] = full_type
-      return f'{spaces}{full_type} {var} = new StringBuilder();'
-
-    # TODO: More work on string concatenation, need to find them semantically.
-
-    #############
-    # Func Decl #
-    #############
-
-    # Converts function declaration.
+    spaces, var = match.groups()
+    full_type = 'StringBuilder'
+    self._var_to_type[var] = full_type
+    return f'{spaces}{full_type} {var} = new StringBuilder();'
+
+  def _convert_string_with_initializer(
+          self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
+    """ -string s = "";
+        +StringBuilder s = new StringBuilder();  // if s is built, see
+                                                 // `_plan_string_builders()`
+
+        -string s = t + "a";
+        +String s = t + "a";
+    """
+    spaces, var, value = match.groups()
+    if line_number in self._string_builders:
+      self._var_to_type[var] = 'StringBuilder'
+      return f'{spaces}StringBuilder {var} = new StringBuilder();'
+    # Converted by the next rules.
+    self._var_to_type[var] = 'String'
+    return None
+
+  def _convert_return(self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
+    """ -return 0;  // in main()
+        +return;
+
+        -return ans;
+        +return ans.toString();  // if `ans` is a StringBuilder and the
+                                 // function returns a String
+
+        -return ans;
+        +return ans.toArray();  // --profile primitive, if `ans` is an IntList
+                                // and the function returns an int[]
+    """
+    spaces, var = match.groups()
+    if var == '0' and self._return_type == 'void':
+      return f'{spaces}return;'
+    type = self._var_to_type.get(var)
+    if type == 'StringBuilder' and self._return_type == 'String':
+      return f'{spaces}return {var}.toString();'
+    if type in _ARRAY_TYPES and _ARRAY_TYPES[type] == self._return_type:
+      return f'{spaces}return {var}.toArray();'
+    return None
+
+  def _convert_scalar_declaration(
+          self, line: str, line_number: int, match: Match[str]) -> None:
+    # Only records the types, e.g. for `cin >> n`. The line is converted by the
+    # next rules.
+    """ -long long a = 0, b;
+        +long a = 0, b;
+    """
+    type, declarators = match.groups()
+    java_type = util.to_java_type(type)
+    for name in _DECLARATOR_NAME.findall(declarators):
+      self._var_to_type[name] = java_type
+    return None
+
+  #############
+  # Func Decl #
+  #############
+
+  def _convert_main(self, line: str, line_number: int, match: Match[str]) -> str:
+    """ -int main() {
+        +class Main {
+        +  static final FastReader in = new FastReader(System.in);
+        +  static final FastWriter out = new FastWriter(System.out);
+        +
+        +  public static void main(String[] args) {
+    """
+    spaces = match.group(1)
+    self._has_main = True
+    self._return_type = 'void'
+    members = \
+        f'{spaces}static final FastReader in = new FastReader(System.in);\n' \
+        f'{spaces}static final FastWriter out = new FastWriter(System.out);\n\n' \
+        f'{spaces}public static void main(String[] args) ' + '{'
+    if self._var_to_type.depth > 1:
+      # Already in a class.
+      return members
+    # Java has no top-level members, so main() and its body are indented into
+    # a class closed with main(), see `iter_java()`.
+    self._main_depth = self._var_to_type.depth
+    return f'{spaces}class Main ' + '{\n' + _indent(members)
+
+  def _convert_function(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -long long myFunc(const string& param1, bool param2) {
         +public long myFunc(final String param1, boolean param2) {
     """
-    match = re.search(r'^(\s*)(.*) (\w+)\((.*)\) {$', line)
-    if match:
-      self._is_in_function = True
-      spaces, return_type, func_name, params = match.groups()
-      tokens = util.tokenize(params)
-      types = [util.to_java_type(token.rsplit(' ', 1)[0]) for token in tokens]
-      names = [token.rsplit(' ', 1)[1] for token in tokens]
-      java_params = ', '.join([f'{type} {name}'
-                               for type, name in zip(types, names)])
-      access_modifier = 'private' if self._is_private else 'public'
-      java_return_type = util.to_java_type(return_type)
-      for type, name in zip(types, names):
-        self._var_to_type[name] = type
-      return \
-          f'{spaces}{access_modifier} ' \
-          f'{java_return_type} {func_name}({java_params}) ' + '{'
-
-    # Converts range-based for loop.
+    self._is_in_function = True
+    spaces, return_type, func_name, params = match.groups()
+    tokens = util.tokenize(params)
+    types = [util.to_java_type(token.rsplit(' ', 1)[0]) for token in tokens]
+    names = [token.rsplit(' ', 1)[1] for token in tokens]
+    java_params = ', '.join([f'{type} {name}'
+                             for type, name in zip(types, names)])
+    access_modifier = 'private' if self._is_private else 'public'
+    java_return_type = util.to_java_type(return_type)
+    self._return_type = java_return_type
+    for type, name in zip(types, names):
+      self._var_to_type[name] = type
+    return \
+        f'{spaces}{access_modifier} ' \
+        f'{java_return_type} {func_name}({java_params}) ' + '{'
+
+  def _convert_range_based_for(self, line: str, line_number: int, match: Match[str]) -> str:
     """ -for (const vector<int>& edge : edges)
         +for (int[] edge : edges)
+
+        -for (const int v : graph[u])
+        +for (final int v : graph[u].toArray())  // if graph[u] is an IntList
+
+        -for (const int v : graph[u])  // if graph is a CsrGraph
+        +for (int vEdge = graph.begin(u); vEdge < graph.end(u); ++vEdge) {
+        +  final int v = graph.target(vEdge);
     """
-    match = re.search(
-        r'^(\s*)for \((.*) (\w+) : (\S+)\)( {)?', line)
-    if match:
-      spaces, type, var, iterable, left_bracket = match.groups()
-      java_type = util.to_java_type(type)
+    spaces, type, var, iterable, left_bracket = match.groups()
+    graph, _, index = iterable.partition('[')
+    if index and self._var_to_type.get(graph) == 'CsrGraph':
+      u = index[:-1]
+      edge = f'{var}Edge'
+      java_type = 'final int' if type.startswith('const') else 'int'
       return \
-          f'{spaces}for ({java_type} {var} : {iterable})' \
-          f'{left_bracket if left_bracket else ""}'
-
-    # Converts structured binding range-based for loop.
+          f'{spaces}for (int {edge} = {graph}.begin({u}); ' \
+          f'{edge} < {graph}.end({u}); ++{edge}) ' + '{\n' \
+          f'{spaces}  {java_type} {var} = {graph}.target({edge});'
+    java_type = util.to_java_type(type)
+    if self._element_type(iterable) in _ARRAY_TYPES:
+      iterable += '.toArray()'
+    return \
+        f'{spaces}for ({java_type} {var} : {iterable})' \
+        f'{left_bracket if left_bracket else ""}'
+
+  def _convert_structured_binding_for(
+          self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
     # Assume
     #
     # var_to_type = {
@@ -347,100 +657,290 @@ class CppConverter:
         -for (const auto& [key, _] : count)
         +for (final String key : count.keySet())
     """
-
-    match = re.search(
-        r'^(\s*)for \((?:const )auto(?:&) \[(\w+), (\w+)\] : ([^)]+)\)( {)?', line)
-    if match:
-      spaces, key, value, iterable, left_bracket = match.groups()
-      var = iterable.split('[')[0]  # 'graph[u]' -> 'graph'
-      type: str = self._var_to_type.get(var, 'UNKNOWN_TYPE')
-
-      def get_key_value_types_in_angle_brackets(type: str) -> \
-              Optional[Tuple[str, str, str, str]]:
-        match = re.search(
-            r'(?:List<Pair|Map)<([^,]+), ([^>]+)>', type)
-        if not match:
-          return None
-        key_object_type, value_object_type = match.groups()
-        return (util.to_java_type(key_object_type),
-                util.to_java_type(value_object_type),
-                key_object_type,
-                value_object_type)
-
-      types = get_key_value_types_in_angle_brackets(type)
-      if not types:
-        print(f"Failed to parse '{type}' in line {line_number}: {line}")
-        return line
-      key_type, value_type, object_key_type, object_value_type = types
-      if type.startswith('List<Pair<'):
+    spaces, key, value, iterable, left_bracket = match.groups()
+    var = iterable.split('[')[0]  # 'graph[u]' -> 'graph'
+    type: str = self._var_to_type.get(var, 'UNKNOWN_TYPE')
+    if self._element_type(iterable) == 'IntIntMap':
+      if key == '_':
         return \
-            f'{spaces}for (Pair<{object_key_type}, {object_value_type}> ' \
-            f'pair : {iterable}) ' + '{\n' \
-            f'{spaces}  final {key_type} {key} = pair.getKey();\n' \
-            f'{spaces}  final {value_type} {value} = pair.getValue();'
-      elif type.startswith('Map<'):
-        if key == '_':
-          # Don't care about keys -> iterates values.
-          return \
-              f'{spaces}for (final {value_type} {value} : {iterable}.values())' \
-              f'{left_bracket if left_bracket else ""}'
-        elif value == '_':
-          # Don't care about values -> iterates keys.
-          return \
-              f'{spaces}for (final {key_type} {key} : {iterable}.keySet())' \
-              f'{left_bracket if left_bracket else ""}'
-        else:
-          # Iterator both values and keys.
-          return \
-              f'{spaces}for (Map.Entry<{object_key_type}, {object_value_type}> ' \
-              f'entry : {iterable}.entrySet()) ' + '{\n' \
-              f'{spaces}  final {key_type} {key} = entry.getKey();\n' \
-              f'{spaces}  final {value_type} {value} = entry.getValue();'
-
-      print(f"'{type}' not found in line {line_number}: {line}")
-      return ''
+            f'{spaces}for (final int {value} : {iterable}.values())' \
+            f'{left_bracket if left_bracket else ""}'
+      if value == '_':
+        return \
+            f'{spaces}for (final int {key} : {iterable}.keys())' \
+            f'{left_bracket if left_bracket else ""}'
+      return \
+          f'{spaces}for (final int {key} : {iterable}.keys()) ' + '{\n' \
+          f'{spaces}  final int {value} = {iterable}.get({key});'
+
+    def get_key_value_types_in_angle_brackets(type: str) -> \
+            Optional[Tuple[str, str, str, str]]:
+      match = _KEY_VALUE_TYPES.search(type)
+      if not match:
+        return None
+      key_object_type, value_object_type = match.groups()
+      return (util.to_java_type(key_object_type),
+              util.to_java_type(value_object_type),
+              key_object_type,
+              value_object_type)
+
+    types = get_key_value_types_in_angle_brackets(type)
+    if not types:
+      self.diagnostics.warning('structured binding for loop', line_number,
+                               f"can't iterate '{var}' of type '{type}'", line)
+      return None
+    key_type, value_type, object_key_type, object_value_type = types
+    if type.startswith('List<Pair<'):
+      return \
+          f'{spaces}for (Pair<{object_key_type}, {object_value_type}> ' \
+          f'pair : {iterable}) ' + '{\n' \
+          f'{spaces}  final {key_type} {key} = pair.getKey();\n' \
+          f'{spaces}  final {value_type} {value} = pair.getValue();'
+    elif type.startswith('Map<'):
+      if key == '_':
+        # Don't care about keys -> iterates values.
+        return \
+            f'{spaces}for (final {value_type} {value} : {iterable}.values())' \
+            f'{left_bracket if left_bracket else ""}'
+      elif value == '_':
+        # Don't care about values -> iterates keys.
+        return \
+            f'{spaces}for (final {key_type} {key} : {iterable}.keySet())' \
+            f'{left_bracket if left_bracket else ""}'
+      else:
+        # Iterator both values and keys.
+        return \
+            f'{spaces}for (Map.Entry<{object_key_type}, {object_value_type}> ' \
+            f'entry : {iterable}.entrySet()) ' + '{\n' \
+            f'{spaces}  final {key_type} {key} = entry.getKey();\n' \
+            f'{spaces}  final {value_type} {value} = entry.getValue();'
+
+    self.diagnostics.warning('structured binding for loop', line_number,
+                             f"can't iterate '{var}' of type '{type}'", line)
+    return None
 
-    # Converts `std::sort` to `Arrays.sort`.
+  def _convert_sort(self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
     """ -sort(begin(A), end(A));
         +Arrays.sort(A);
+
+        -sort(A.begin(), A.end(), greater<>());
+        +Arrays.sort(A);  // if A is an int[]
+        +Algorithms.reverse(A);
+
+        -sort(begin(A), end(A), greater<>());
+        +A.sort(Comparator.reverseOrder());  // if A is a List
+
+        -sort(begin(A), end(A), greater<>());
+        +Arrays.sort(A, (a, b) -> Arrays.compare(b, a));  // if A is an int[][]
+
+        -sort(begin(A), end(A), [](const auto& a, const auto& b) { return a[1] < b[1]; });
+        +Arrays.sort(A, (a, b) -> a[1] < b[1] ? -1 : b[1] < a[1] ? 1 : 0);
     """
-    match = re.search(r'^(\s*)sort\(begin\((\S+)\), end\((?:\S+)\);$', line)
-    if match:
-      spaces, var = match.groups()
+    spaces, args = match.groups()
+    args = _split_operands(args, ', ')
+    if len(args) not in (2, 3):
+      return None
+    iterator_range = _iterator_range(args[0], args[1])
+    if not iterator_range:
+      return None
+    var, is_reversed = iterator_range
+    comparator = None
+    if len(args) == 3:
+      if _GREATER.fullmatch(args[2]):
+        is_reversed = not is_reversed
+      elif not _LESS.fullmatch(args[2]):
+        comparator = _to_java_comparator(args[2], is_reversed)
+        if not comparator:
+          return None
+    type = self._element_type(var)
+    if type.endswith('[]'):
+      element_type = type[:-2]
+    elif type.startswith('List<'):
+      element_type = type[len('List<'):-1]
+    else:
+      element_type = ''
+    if comparator:
+      if type.startswith('List<'):
+        return f'{spaces}{var}.sort({comparator});'
+      if element_type in _PRIMITIVE_STREAMS:
+        # A comparator needs boxed elements. The sorted copy is written back,
+        # so e.g. a caller's array passed by reference is sorted too.
+        to_primitive, unbox = _PRIMITIVE_STREAMS[element_type]
+        return \
+            f'{spaces}System.arraycopy(Arrays.stream({var}).boxed().sorted({comparator})' \
+            f'.{to_primitive}({unbox}).toArray(), 0, {var}, 0, {var}.length);'
+      if not type.endswith('[]'):
+        self.diagnostics.warning('sort', line_number,
+                                 f"'{var}' of type '{type}' may not be an "
+                                 'array of objects', line)
+      return f'{spaces}Arrays.sort({var}, {comparator});'
+    if type in ('IntList', 'LongList'):
+      if is_reversed:
+        return f'{spaces}{var}.sort();\n{spaces}{var}.reverse();'
+      return f'{spaces}{var}.sort();'
+    if element_type.endswith('[]') and element_type[:-2] in _SORTABLE_PRIMITIVES:
+      # Arrays aren't Comparable, C++ compares vectors lexicographically.
+      comparator = '(a, b) -> Arrays.compare(b, a)' if is_reversed \
+          else 'Arrays::compare'
+      if type.startswith('List<'):
+        return f'{spaces}{var}.sort({comparator});'
+      return f'{spaces}Arrays.sort({var}, {comparator});'
+    if element_type and element_type not in _SORTABLE_PRIMITIVES and \
+            element_type not in _COMPARABLE_TYPES:
+      self.diagnostics.warning('sort', line_number,
+                               f"the elements of '{var}' of type '{type}' may "
+                               'not be Comparable', line)
+    if type.startswith('List<'):
+      if is_reversed:
+        return f'{spaces}{var}.sort(Comparator.reverseOrder());'
+      return f'{spaces}Collections.sort({var});'
+    if not is_reversed:
       return f'{spaces}Arrays.sort({var});'
+    if element_type in _SORTABLE_PRIMITIVES:
+      # Sorting ascendingly, then reversing doesn't box the elements.
+      return f'{spaces}Arrays.sort({var});\n{spaces}Algorithms.reverse({var});'
+    if not type.endswith('[]'):
+      self.diagnostics.warning('sort', line_number,
+                               f"'{var}' of type '{type}' may not be an "
+                               'array of objects', line)
+    return f'{spaces}Arrays.sort({var}, Comparator.reverseOrder());'
+
+  #######
+  # I/O #
+  #######
+
+  def _convert_include(self, line: str, line_number: int, match: Match[str]) -> str:
+    """ -#include <bits/stdc++.h>
+        -#include <iostream>
+        +import java.util.*;
+    """
+    if self._has_imports:
+      return ''
+    self._has_imports = True
+    return 'import java.util.*;'
 
-    # Converts `std::sort` to `Arrays.sort` (descendingly).
-    """ -sort(begin(A), end(A), greater<>());
-        +Arrays.sort(A, (a, b) -> b - a);
+  def _drop_line(self, line: str, line_number: int, match: Match[str]) -> str:
+    """ -using namespace std;
+        -ios::sync_with_stdio(false);
+        -cin.tie(nullptr);
     """
-    match = re.search(
-        r'^(\s*)sort\(begin\((\S+)\), end\((?:\S+), greater<>\(\)\);$', line)
-    if match:
-      spaces, var = match.groups()
-      return f'{spaces}Arrays.sort({var}, (a, b) -> b - a);'
+    return ''
+
+  def _braced(self, spaces: str, statements: List[str]) -> str:
+    # Several statements replacing one, braced if they're the body of e.g. a
+    # 'for (...)' without braces.
+    if len(statements) == 1:
+      return spaces + statements[0]
+    if self._is_braceless_body:
+      return spaces + '{ ' + ' '.join(statements) + ' }'
+    return '\n'.join(spaces + statement for statement in statements)
+
+  def _read(self, target: str, line: str, line_number: int, rule: str) -> Optional[str]:
+    # The statement reading `target` with `FastReader`, if its type is known.
+    type = self._element_type(target)
+    if type.startswith('final '):
+      type = type[len('final '):]
+    if type not in _READS:
+      self.diagnostics.warning(rule, line_number,
+                               f"can't read '{target}' of type '{type}'", line)
+      return None
+    self._uses_stdio = True
+    return f'{target} = {_READS[type]};'
+
+  def _rewrite_cin(self, line: str, line_number: int) -> str:
+    # Assume
+    #
+    # var_to_type = {
+    #   'n': 'int',
+    #   'A': 'long[]'
+    # }
+    """ -cin >> n >> A[i];
+        +n = in.nextInt();
+        +A[i] = in.nextLong();
+    """
+    match = _CIN.match(line)
+    if not match:
+      return line
+    spaces, targets = match.groups()
+    reads = [self._read(target, line, line_number, 'cin')
+             for target in _split_operands(targets, ' >> ')]
+    if None in reads:
+      return line
+    return self._braced(spaces, reads)
 
-    ########
-    # Expr #
-    ########
+  def _rewrite_scanf(self, line: str, line_number: int) -> str:
+    """ -scanf("%d %lld", &n, &A[i]);
+        +n = in.nextInt();
+        +A[i] = in.nextLong();
+    """
+    match = _SCANF.match(line)
+    if not match:
+      return line
+    spaces, args = match.groups()
+    reads = [self._read(arg.lstrip('&'), line, line_number, 'scanf')
+             for arg in _split_operands(args, ', ')]
+    if None in reads:
+      return line
+    return self._braced(spaces, reads)
 
-    # Only one group to be captured.
-    for cpp_func_name, java_func_name in keywords.func_name.items():
-      pattern = cpp_func_name + r'\((\w+|.*?[)\]}"]+)\)'
-      line = re.sub(pattern, java_func_name + r'(\1)'
-                    if java_func_name else r'\1', line)
+  def _rewrite_cout(self, line: str, line_number: int) -> str:
+    """ -cout << fixed << setprecision(2) << x << " " << n << endl;
+        +out.fixed().precision(2).print(x).print(" ").print(n).println();
+    """
+    match = _COUT.match(line)
+    if not match:
+      return line
+    spaces, operands = match.groups()
+    calls: List[str] = []
+    for operand in _split_operands(operands, ' << '):
+      if operand == 'endl':
+        calls.append('println()')
+      elif operand == 'fixed':
+        # Without it, the precision counts significant digits.
+        calls.append('fixed()')
+      elif operand.startswith('setprecision('):
+        calls.append('precision' + operand[len('setprecision'):])
+      else:
+        calls.append(f'print({operand})')
+    self._uses_stdio = True
+    return f'{spaces}out.' + '.'.join(calls) + ';'
+
+  def _rewrite_printf(self, line: str, line_number: int) -> str:
+    """ -printf("%lld %.2lf\\n", a, b);
+        +out.printf("%d %.2f\\n", a, b);
+    """
+    match = _PRINTF.match(line)
+    if not match:
+      return line
+    spaces, i, args = match.groups()
+    # The format is masked, see `_split_line()`.
+    self._literals[int(i)] = _FORMAT_SPEC.sub(_to_java_format_spec,
+                                              self._literals[int(i)])
+    self._uses_stdio = True
+    return f'{spaces}out.printf("{i}"{args});'
+
+  ########
+  # Expr #
+  ########
+
+  def _rewrite_func_names(self, line: str, line_number: int) -> str:
+    """ -to_string(stoi(s))
+        +String.valueOf(Integer.valueOf(s))
+    """
+    return _FUNC_NAMES.sub(line)
 
-    # String
+  def _rewrite_substr(self, line: str, line_number: int) -> str:
     """ -s.substr(start, end - start + 1)
         +s.substring(start, end)
-    """
-    line = re.sub(r'(\S+)\.substr\(([^,]+), ([^)]+)\)',
-                  lambda m: self._convert_substr_to_substring(m.groups()), line)
 
-    """ -s.substr(start)
+        -s.substr(start)
         +s.substring(start)
     """
-    line = re.sub(r'(\S+)\.substr\(([^)]+)\)', r'\1.substring(\2)', line)
+    line = _SUBSTR_WITH_LENGTH.sub(
+        lambda m: self._convert_substr_to_substring(m.groups()), line)
+    return _SUBSTR.sub(r'\1.substring(\2)', line)
 
+  def _convert_peek_then_pop(self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
     """ -maxHeap.top(), maxHeap.pop();
         +maxHeap.poll();
 
@@ -450,105 +950,1377 @@ class CppConverter:
         -stack.top(), stack.pop();
         +stack.pop();
     """
-    match = re.search(r'(.*?)(\w+)\.(?:top|front)\(\), \w+\.pop\(\);$', line)
+    anything, var = match.groups()
+    type: str = self._var_to_type.get(var, 'UNKNOWN_TYPE')
+    if type.startswith('Queue<') or type in _PACKED_PAIR_TYPES:
+      return f'{anything}{var}.poll();'
+    if type.startswith('Deque<'):
+      return f'{anything}{var}.pop();'
+    self.diagnostics.warning('peek then pop', line_number,
+                             f"'{var}' of type '{type}' is neither a queue "
+                             'nor a stack', line)
+    return None
+
+  def _convert_packed_pair_binding(
+          self, line: str, line_number: int, match: Match[str]) -> Optional[str]:
+    """ -const auto [d, u] = minHeap.top();  // if minHeap is a LongHeap
+        +final int d = Pairs.first(minHeap.peek());
+        +final int u = Pairs.second(minHeap.peek());
+    """
+    spaces, const, first, second, var = match.groups()
+    if self._var_to_type.get(var) not in _PACKED_PAIR_TYPES:
+      return None
+    java_type = 'final int' if const else 'int'
+    return \
+        f'{spaces}{java_type} {first} = Pairs.first({var}.peek());\n' \
+        f'{spaces}{java_type} {second} = Pairs.second({var}.peek());'
+
+  def _rewrite_packed_pairs(self, line: str, line_number: int) -> str:
+    """ -minHeap.emplace(d, u);  // if minHeap is a LongHeap
+        +minHeap.add(Pairs.pack(d, u));
+
+        -q.push({u, step + 1});  // if q is a LongQueue
+        +q.add(Pairs.pack(u, step + 1));
+
+        -q.front().second
+        +Pairs.second(q.peek())
+    """
+    def rewrite_peek(match: Match[str]) -> str:
+      var, component = match.groups()
+      if self._var_to_type.get(var) not in _PACKED_PAIR_TYPES:
+        return match.group(0)
+      if component:
+        return f'Pairs.{component}({var}.peek())'
+      return f'{var}.peek()'
+
+    if not self._pack_pairs:
+      return line
+    match = _PACKED_PAIR_PUSH.match(line)
+    if match and self._var_to_type.get(match.group(2)) in _PACKED_PAIR_TYPES:
+      spaces, var, pair = match.groups()
+      if pair.startswith('{') and pair.endswith('}'):
+        pair = pair[1:-1]
+      elif pair.startswith('make_pair(') and pair.endswith(')'):
+        pair = pair[len('make_pair('):-1]
+      if len(_split_operands(pair, ', ')) == 2:
+        return f'{spaces}{var}.add(Pairs.pack({pair}));'
+    return _PACKED_PAIR_PEEK.sub(rewrite_peek, line)
+
+  def _map_value_type(self, var: str) -> Optional[str]:
+    # The object type of the values of map `var`, if it's a map.
+    type: str = self._var_to_type.get(var, '')
+    if type == 'IntIntMap':
+      return 'Integer'
+    if not type.startswith(('Map<', 'TreeMap<')):
+      return None
+    key_value_types = util.tokenize(type[type.index('<') + 1:-1])
+    return key_value_types[1] if len(key_value_types) == 2 else None
+
+  def _to_map_update(self, var: str, key: str, operator: str,
+                     operand: str) -> Optional[str]:
+    # Java updating the value of `key` in map `var` like
+    # `var[key] {operator}= operand`, where a missing value is 0 like in C++.
+    value_type = self._map_value_type(var)
+    if value_type == 'String' and operator == '+':
+      return f'{var}.merge({key}, {operand}, String::concat)'
+    if value_type not in _MERGE_OPERANDS:
+      return None
+    cast, suffix = _MERGE_OPERANDS[value_type]
+    is_number = bool(_NUMBER.fullmatch(operand))
+    if operator in ('+', '-', '|', '^'):
+      # 0 is the identity, so merge() may insert the operand as is.
+      if operator in ('|', '^') and value_type == 'Double':
+        return None
+      if is_number:
+        operand += suffix
+      elif cast:
+        operand = f'{cast} {_parenthesized(operand)}'
+      if operator == '-':
+        operand = f'-{operand if is_number else _parenthesized(operand)}'
+      function = f'{value_type}::sum' if operator in ('+', '-') else \
+          f'(oldValue, operand) -> oldValue {operator} operand'
+      return f'{var}.merge({key}, {operand}, {function})'
+    if self._var_to_type.get(var) == 'IntIntMap':
+      return f'{var}.put({key}, {var}.get({key}) {operator} {_parenthesized(operand)})'
+    default_value = _DEFAULT_VALUES[value_type]
+    if is_number:
+      # No local is captured, so the lambda always compiles.
+      return \
+          f'{var}.compute({key}, (mapKey, oldValue) -> oldValue == null ? ' \
+          f'{default_value} : oldValue {operator} {operand})'
+    return \
+        f'{var}.put({key}, {var}.getOrDefault({key}, {default_value}) ' \
+        f'{operator} {_parenthesized(operand)})'
+
+  def _rewrite_map_reads(self, line: str) -> Optional[str]:
+    # Rewrites every `m[key]` of a map `m` in an expression to a single
+    # lookup. Returns None if one is assigned to, which can't be lowered.
+    is_assigned = False
+
+    def rewrite(match: Match[str]) -> str:
+      nonlocal is_assigned
+      var, key, postfix = match.groups()
+      key = self._rewrite_map_reads(key)
+      if key is None:
+        is_assigned = True
+        return match.group(0)
+      value_type = self._map_value_type(var)
+      if value_type is None:
+        return f'{var}[{key}]{postfix or ""}'
+      if postfix:
+        # The merged value minus the increment is the old value.
+        merge = self._to_map_update(var, key, postfix[0], '1')
+        if merge:
+          return f'({merge} {"-" if postfix == "++" else "+"} 1)'
+        is_assigned = True
+        return match.group(0)
+      if _ASSIGNMENT_OPERATOR.match(match.string, match.end()):
+        is_assigned = True
+        return match.group(0)
+      if match.string.startswith('.', match.end()):
+        # A method call on the value, which C++ inserts if missing.
+        for prefix, constructor in _VALUE_CONSTRUCTORS:
+          if value_type.startswith(prefix):
+            return f'{var}.computeIfAbsent({key}, absentKey -> {constructor})'
+        return match.group(0)
+      if self._var_to_type.get(var) == 'IntIntMap':
+        return f'{var}.get({key})'
+      if value_type in _DEFAULT_VALUES:
+        return f'{var}.getOrDefault({key}, {_DEFAULT_VALUES[value_type]})'
+      return f'{var}.get({key})'
+
+    line = _MAP_OPERAND.sub(rewrite, line)
+    return None if is_assigned else line
+
+  def _rewrite_map_statement(self, line: str) -> Tuple[bool, Optional[str]]:
+    # Rewrites `m[key] op= value;` or `m[key]++;`, possibly after e.g. the
+    # header of a braceless loop. Returns whether `line` is one and its
+    # conversion, None if it can't be lowered.
+    code = line.rstrip('\r\n')
+    if code != line:
+      # The line terminator is kept as is.
+      is_statement, java = self._rewrite_map_statement(code)
+      return is_statement, None if java is None else java + line[len(code):]
+    for match in _MAP_SUBSCRIPT.finditer(line):
+      head = line[:match.start()]
+      if head.strip() and not head.endswith((') ', '; ', '{ ', 'else ')):
+        continue
+      var, key = match.groups()
+      if self._map_value_type(var) is None:
+        continue
+      update = _MAP_UPDATE.fullmatch(line, match.end())
+      if not update:
+        return False, None
+      increment, operator, operand = update.groups()
+      key = self._rewrite_map_reads(key)
+      if increment:
+        operator, operand = increment[0], '1'
+      else:
+        operand = self._rewrite_map_reads(operand)
+      if key is None or operand is None:
+        return True, None
+      if operator is None:
+        return True, f'{head}{var}.put({key}, {operand});'
+      java = self._to_map_update(var, key, operator, operand)
+      return True, f'{head}{java};' if java else None
+    return False, None
+
+  def _rewrite_map_idioms(self, line: str, line_number: int) -> str:
+    """ -++count[c];
+        +count.merge(c, 1, Integer::sum);
+
+        -count[c] += freq[i];
+        +count.merge(c, freq[i], Integer::sum);
+
+        -if (--count[c] == 0)
+        +if (count.merge(c, -1, Integer::sum) == 0)
+
+        -ans += count[c];
+        +ans += count.getOrDefault(c, 0);
+
+        -if (count.count(c))  // also count.find(c) != count.end()
+        +if (count.containsKey(c))
+
+        -graph[u].push_back(v);  // if graph is a Map<Integer, List<Integer>>
+        +graph.computeIfAbsent(u, absentKey -> new ArrayList<>()).add(v);
+    """
+    if '[' not in line and '.count(' not in line and '.find(' not in line:
+      return line
+    if not any(self._map_value_type(var) is not None or
+               self._var_to_type.get(var, '').startswith(('Set<', 'IntSet'))
+               for var in _MAP_CANDIDATE.findall(line)):
+      return line
+
+    def rewrite_find(match: Match[str]) -> str:
+      var, key, operator = match.groups()
+      if self._map_value_type(var) is not None:
+        method = 'containsKey'
+      elif self._var_to_type.get(var, '').startswith(('Set<', 'IntSet')):
+        method = 'contains'
+      else:
+        return match.group(0)
+      negation = '!' if operator == '==' else ''
+      return f'{negation}{var}.{method}({key})'
+
+    def rewrite_count(match: Match[str]) -> str:
+      var = match.group(1)
+      if self._map_value_type(var) is None:
+        return match.group(0)
+      return f'{var}.containsKey('
+
+    def rewrite_prefix(match: Match[str]) -> str:
+      operator, var, key = match.groups()
+      java_key = self._rewrite_map_reads(key)
+      merge = java_key is not None and \
+          self._to_map_update(var, java_key, operator[0], '1')
+      return merge or match.group(0)
+
+    cpp_line = line
+    line = _MAP_FIND.sub(rewrite_find, line)
+    line = _MAP_COUNT.sub(rewrite_count, line)
+    line = _MAP_PREFIX.sub(rewrite_prefix, line)
+    is_statement, java = self._rewrite_map_statement(line)
+    if not is_statement:
+      java = self._rewrite_map_reads(line)
+    if java is None:
+      self.diagnostics.warning('map idioms', line_number,
+                               "can't lower the assignment to a map value",
+                               cpp_line)
+      return cpp_line
+    return java
+
+  def _to_list_element(self, var: str, indices: List[str]) -> Optional[Tuple[str, str]]:
+    # `(owner, index)` if `var[i]...[j]` is an element of an IntList or a
+    # LongList, e.g. ('graph[u]', 'i') for 'graph[u][i]' of an IntList[].
+    type: str = self._var_to_type.get(var, '')
+    for i, index in enumerate(indices):
+      if type in _PRIMITIVE_LISTS:
+        if i + 1 < len(indices):
+          return None
+        return var + ''.join(f'[{index}]' for index in indices[:i]), index
+      if not type.endswith('[]'):
+        return None
+      type = type[:-2]
+    return None
+
+  def _rewrite_list_reads(self, line: str) -> Optional[str]:
+    # Rewrites every element `A[i]` of a primitive list read in an expression
+    # to `A.get(i)`. Returns None if one is updated, which can't be lowered.
+    is_updated = False
+
+    def rewrite(match: Match[str]) -> str:
+      nonlocal is_updated
+      var, chain, postfix = match.groups()
+      indices = []
+      for index in _SUBSCRIPT_INDEX.findall(chain):
+        java_index = self._rewrite_list_reads(index)
+        if java_index is None:
+          is_updated = True
+          return match.group(0)
+        indices.append(java_index)
+      element = self._to_list_element(var, indices)
+      if element is None:
+        return var + ''.join(f'[{index}]' for index in indices) + (postfix or '')
+      if postfix or match.string[:match.start()].endswith(('++', '--')) or \
+              _ASSIGNMENT_OPERATOR.match(match.string, match.end()):
+        is_updated = True
+        return match.group(0)
+      owner, index = element
+      return f'{owner}.get({index})'
+
+    line = _LIST_OPERAND.sub(rewrite, line)
+    return None if is_updated else line
+
+  def _rewrite_list_statement(self, line: str) -> Tuple[bool, Optional[str]]:
+    # Rewrites `A[i] op= value;`, `A[i]++;` or `++A[i];`, possibly after e.g.
+    # the header of a braceless loop. Returns whether `line` is one and its
+    # conversion, None if it can't be lowered.
+    code = line.rstrip('\r\n')
+    if code != line:
+      # The line terminator is kept as is.
+      is_statement, java = self._rewrite_list_statement(code)
+      return is_statement, None if java is None else java + line[len(code):]
+    for match in _LIST_SUBSCRIPTS.finditer(line):
+      head = line[:match.start()]
+      prefix = head[-2:] if head.endswith(('++', '--')) else ''
+      head = head[:len(head) - len(prefix)]
+      if head.strip() and not head.endswith((') ', '; ', '{ ', 'else ')):
+        continue
+      var, chain = match.groups()
+      element = self._to_list_element(var, _SUBSCRIPT_INDEX.findall(chain))
+      if element is None:
+        continue
+      update = _MAP_UPDATE.fullmatch(line, match.end())
+      if prefix:
+        if line[match.end():] != ';':
+          return False, None
+        increment, operator, operand = prefix, None, None
+      elif update:
+        increment, operator, operand = update.groups()
+      else:
+        return False, None
+      owner, index = element
+      owner = self._rewrite_list_reads(owner)
+      index = self._rewrite_list_reads(index)
+      if increment:
+        operator, operand = increment[0], '1'
+      else:
+        operand = self._rewrite_list_reads(operand)
+      if owner is None or index is None or operand is None:
+        return True, None
+      if operator is not None:
+        operand = f'{owner}.get({index}) {operator} {_parenthesized(operand)}'
+      return True, f'{head}{owner}.set({index}, {operand});'
+    return False, None
+
+  def _rewrite_primitive_lists(self, line: str, line_number: int) -> str:
+    """ -A[i] = A[i - 1] + x;  // if A is an IntList
+        +A.set(i, A.get(i - 1) + x);
+
+        -++graph[u][i];  // if graph is an IntList[]
+        +graph[u].set(i, graph[u].get(i) + 1);
+    """
+    if self._profile != 'primitive' or not any(
+            self._var_to_type.get(var, '').split('[')[0] in _PRIMITIVE_LISTS
+            for var in _SUBSCRIPTED_VAR.findall(line)):
+      return line
+    is_statement, java = self._rewrite_list_statement(line)
+    if not is_statement:
+      java = self._rewrite_list_reads(line)
+    if java is None:
+      self.diagnostics.warning('primitive lists', line_number,
+                               "can't lower the update of a list element", line)
+      return line
+    return java
+
+  def _rewrite_csr_edge(self, line: str, line_number: int) -> str:
+    """ -graph[u].push_back(v);  // if graph is a CsrGraph
+        +graph.addEdge(u, v);
+    """
+    match = _CSR_EDGE.match(line)
+    if not match:
+      return line
+    spaces, graph, u, v = match.groups()
+    if self._var_to_type.get(graph) != 'CsrGraph':
+      return line
+    return f'{spaces}{graph}.addEdge({u}, {v});'
+
+  def _rewrite_string_builder(self, line: str, line_number: int) -> str:
+    # Assume
+    #
+    # var_to_type = {
+    #   's': 'StringBuilder'
+    # }
+    """ -s += t;
+        +s.append(t);
+
+        -s = s + t + 'a';
+        +s.append(t).append('a');
+
+        -s = "x" + t + s;
+        +s.insert(0, t).insert(0, "x");
+
+        -s.insert(0, t);
+        +s.insert(0, t);  // not renamed to add() like a set's insert()
+
+        -s.push_back(c);
+        +s.append(c);
+
+        -s.pop_back();
+        +s.setLength(s.length() - 1);
+
+        -s.back()
+        +s.charAt(s.length() - 1)
+    """
+    if not _STRING_BUILDER_OPS.search(line):
+      return line
+
+    def rewrite_back(match: Match[str]) -> str:
+      var = match.group(1)
+      if self._var_to_type.get(var) != 'StringBuilder':
+        return match.group(0)
+      return f'{var}.charAt({var}.length() - 1)'
+    line = _BACK.sub(rewrite_back, line)
+
+    def mask_insert(match: Match[str]) -> str:
+      var = match.group(1)
+      if self._var_to_type.get(var) != 'StringBuilder':
+        return match.group(0)
+      return var + self._masked('.insert(')
+    line = _INSERT.sub(mask_insert, line)
+
+    match = _APPEND.match(line) or _PUSH_BACK.match(line) or \
+        _CONCAT.match(line)
     if match:
-      anything, var = match.groups()
-      type: str = self._var_to_type[var]
-      if type.startswith('Queue<'):
-        return f'{anything}{var}.poll();'
-      if type.startswith('Deque<'):
-        return f'{anything}{var}.pop();'
-      print(f"'{type}' not found in line {line_number}: {line}")
-      return ''
+      spaces, var, operands = match.groups()
+      if self._var_to_type.get(var) == 'StringBuilder':
+        if match.re is _CONCAT:
+          operands = _split_operands(operands, ' + ')
+        else:
+          operands = [operands]
+        appends = ''.join(f'.append({self._to_appended(operand)})'
+                          for operand in operands)
+        return f'{spaces}{var}{appends};'
+    match = _ASSIGN.match(line)
+    if match and self._var_to_type.get(match.group(2)) == 'StringBuilder':
+      spaces, var, operands = match.groups()
+      operands = _split_operands(operands, ' + ')
+      if var in operands:
+        if operands.count(var) > 1:
+          self.diagnostics.warning('string builder', line_number,
+                                   f"can't lower the concatenation to '{var}'",
+                                   line)
+          return line
+        # The operands before `var` are inserted in front, last first.
+        i = operands.index(var)
+        insert = self._masked('.insert(')
+        inserts = ''.join(f'{insert}0, {self._to_appended(operand)})'
+                          for operand in reversed(operands[:i]))
+        appends = ''.join(f'.append({self._to_appended(operand)})'
+                          for operand in operands[i + 1:])
+        return f'{spaces}{var}{inserts}{appends};'
+    match = _POP_BACK.match(line)
+    if match:
+      spaces, var = match.groups()
+      if self._var_to_type.get(var) == 'StringBuilder':
+        return f'{spaces}{var}.setLength({var}.length() - 1);'
+    return line
 
-    # Converts .size() to .length if needed
+  def _masked(self, text: str) -> str:
+    # A placeholder for `text`, restored with the literals (see
+    # `_split_line()`) after the last rule, so that no later rewrite changes
+    # it, e.g. `keywords.replaced_end` renaming '.insert(' to '.add('.
+    self._literals.append(text)
+    return f'"{len(self._literals) - 1}"'
+
+  def _to_appended(self, operand: str) -> str:
+    # C++ appends 'a' + i as a char, Java as an int.
+    """ -'a' + i
+        +(char) ('a' + i)
+    """
+    if _ARITHMETIC.search(operand) and any(
+            self._literals[int(i)].startswith("'")
+            for i in _PLACEHOLDER.findall(operand)):
+      return f'(char) ({operand})'
+    return operand
+
+  def _rewrite_size(self, line: str, line_number: int) -> str:
+    # Converts .size() to .length or .length() if needed
     # Assume
     #
     # var_to_type = {
     #   'A': 'int[]',
-    #   'B': 'List<Integer>'
+    #   'B': 'List<Integer>',
+    #   's': 'StringBuilder'
     # }
     """ -A.size()
         +A.length
 
         -B.size()
         +B.size()
-    """
-    match = re.search(r'(\S+).size\(\)', line)
-    if match:
-      name = match.groups()[0]
-      var = name.split('[')[0]  # 'grid[0]' -> 'grid'
-      type: str = self._var_to_type.get(var, 'UNKNOWN_TYPE')
-      if '[]' in type:
-        line = re.sub(r'(\S+).size\(\)', f'{name}.length', line)
 
-    """ -ListNode*
-        +ListNode
-    """
-    line = re.sub(r'(\S+)\*', r'\1', line)
+        -s.size()
+        +s.length()
 
-    """ -curr->next->next
-        +curr.next.next
+        -graph[u].size()
+        +graph.degree(u)  // if graph is a CsrGraph
     """
-    line = re.sub(r'(\S+)->(\S+)->(\S+)', r'\1.\2.\3', line)
-
-    """ -curr->next
-        +curr.next
+    def rewrite(match: Match[str]) -> str:
+      name = match.group(1)
+      graph, _, index = name.partition('[')
+      if index and self._var_to_type.get(graph) == 'CsrGraph':
+        return f'{graph}.degree({index[:-1]})'
+      type = self._element_type(name)  # 'grid[0]' -> type of grid minus []
+      if type.endswith('[]'):
+        return f'{name}.length'
+      if type in _STRING_TYPES:
+        return f'{name}.length()'
+      return match.group(0)
+    return _SIZE.sub(rewrite, line)
+
+  def _rewrite_tokens(self, line: str, line_number: int) -> str:
+    """ -ListNode* curr = node->next->next;
+        +ListNode curr = node.next.next;
+
+        -const int kMod = 1'000'000'007;
+        +const int kMod = 1_000_000_007;
     """
-    line = re.sub(r'(\S+)->(\S+)', r'\1.\2', line)
-
+    if line == self._code:
+      return self._rewritten_code
+    return ''.join(_rewrite_tokens(lexer.Lexer().tokenize(line)))
+
+  def _algorithm_range(self, first: str, last: str) -> Optional[str]:
+    # The Java argument of the support/Algorithms.java method for the range
+    # [first, last), if it's a whole container.
+    iterator_range = _iterator_range(first, last)
+    if not iterator_range:
+      return None
+    var = iterator_range[0]
+    if self._element_type(var) in ('IntList', 'LongList'):
+      return f'{var}.toArray()'
+    return var
+
+  def _rewrite_min_max_element(self, line: str, line_number: int) -> str:
     """ -*min_element(begin(A), end(A));
-        +Arrays.stream(A).min().getAsInt();
+        +Algorithms.min(A);
 
-        -*max_element(begin(A), end(A));
-        +Arrays.stream(A).max().getAsInt();
+        -*max_element(A.begin(), A.end());
+        +Algorithms.max(A);
     """
-    line = re.sub(r'\*(min|max)_element\(begin\((\S+)\), end\((\S+)\)\)',
-                  r'Arrays.stream(\2).\1().getAsInt()', line)
-
-    """ -accumulate(begin(A), end(A), 0);
-        +Arrays.stream(A).sum();
+    def rewrite(match: Match[str]) -> str:
+      func, args = match.groups()
+      args = _split_operands(args, ', ')
+      var = len(args) == 2 and self._algorithm_range(*args)
+      if not var:
+        return match.group(0)
+      return f'Algorithms.{func}({var})'
+    return _MIN_MAX_ELEMENT.sub(rewrite, line)
+
+  def _rewrite_accumulate(self, line: str, line_number: int) -> str:
+    """ -accumulate(begin(A), end(A), 0LL);
+        +Algorithms.sum(A, 0L);
     """
-    line = re.sub(r'accumulate\(begin\((.*)\), end\((\w|.)+\), [^)]*\);',
-                  r'Arrays.stream(\1).sum();', line)
-
+    # The overloads of Algorithms.sum() return the type of `init` like C++,
+    # e.g. a long for 0LL even if A is an int[].
+    def rewrite(match: Match[str]) -> str:
+      args = _split_operands(match.group(1), ', ')
+      var = len(args) == 3 and self._algorithm_range(*args[:2])
+      if not var:
+        return match.group(0)
+      init = _INTEGER_SUFFIX.sub(
+          lambda m: m.group(1) + ('L' if 'l' in m.group(2).lower() else ''),
+          args[2])
+      return f'Algorithms.sum({var}, {init})'
+    return _ACCUMULATE.sub(rewrite, line)
+
+  def _rewrite_emplace_back(self, line: str, line_number: int) -> str:
     """ -graph[u].emplace_back(v, vals[v]);
         +graph[u].add(new Pair<>(v, vals[v]));
     """
-    line = re.sub(r'(\w+)\[(\w+)\]\.emplace_back\(([^,]+), ([^)]+)\);',
-                  r'\1[\2].add(new Pair<>(\3, \4));', line)
+    return _EMPLACE_BACK.sub(r'\1[\2].add(new Pair<>(\3, \4));', line)
 
-    for k, v in keywords.replaced_end.items():
-      line = line.replace(k, v)
+  def _rewrite_replaced_end(self, line: str, line_number: int) -> str:
+    if self._sequential_replace:
+      return _REPLACED_END.sub_sequentially(line)
+    return _REPLACED_END.sub(line)
 
-    return line
+  def iter_java(self, lines: Iterable[str]) -> Iterator[str]:
+    # Converts lines lazily. The converter's state (e.g. the types of declared
+    # variables) is kept across lines, so `lines` can be any stream.
+    #
+    # Statements spanning several lines are converted as a whole and yielded
+    # as one item, with the original line breaks restored where possible.
+    units: Iterable[Tuple[int, List[str]]] = \
+        statements.StatementAssembler().statements(lines)
+    closing_braces: Dict[int, str] = {}
+    if self._csr:
+      units = list(units)
+      plan = csr.plan([(line_number, statements.join(statement))
+                       for line_number, statement in units])
+      self._csr_graphs = plan.graphs
+      closing_braces = plan.closing_braces
+    for line_number, statement in self._plan_string_builders(units):
+      is_in_main = self._main_depth is not None
+      if len(statement) == 1:
+        java = self._substitute(statement[0], line_number)
+      else:
+        java = self._substitute(statements.join(statement), line_number)
+        java = statements.rewrap(java, statement)
+      if line_number in closing_braces:
+        # The body of a loop rewritten with a brace, see `csr.CsrPlan`.
+        newline = '\n' if java.endswith('\n') else ''
+        java = f"{java.rstrip(chr(10))}\n{closing_braces[line_number]}}}{newline}"
+      if is_in_main:
+        java = _indent(java)
+        if self._var_to_type.depth < self._main_depth:
+          # The brace closing main() closes class Main too.
+          self._main_depth = None
+          newline = '\n' if java.endswith('\n') else ''
+          java = f"{java.rstrip(chr(10))}\n}}{newline}"
+      yield java
+    if self._uses_stdio and not self._has_main:
+      self.diagnostics.warning(
+          'main', line_number, "'in' and 'out' are declared with main(), "
+          'which is missing', '')
+
+  def _plan_string_builders(
+          self, units: Iterable[Tuple[int, List[str]]]) -> Iterator[Tuple[int, List[str]]]:
+    # Yields `units`, reading ahead the scope of every `string s = "";` to
+    # decide whether `s` is emitted as a StringBuilder, see
+    # `_plan_string_scope()`. Only that scope is buffered, so `units` can
+    # still be any stream.
+    units = iter(units)
+    pending: Deque[Tuple[int, List[str]]] = collections.deque()
+    planned: Set[int] = set()
+    while True:
+      if not pending:
+        unit = next(units, None)
+        if unit is None:
+          return
+        pending.append(unit)
+      line_number, statement = pending[0]
+      if line_number not in planned and _EMPTY_STRING.match(statement[0]):
+        for declaration, is_built in _plan_string_scope(pending, units):
+          planned.add(declaration)
+          if is_built:
+            self._string_builders.add(declaration)
+      planned.discard(line_number)
+      yield pending.popleft()
 
   def to_java(self, lines: List[str]) -> List[str]:
-    return [self._substitute(line, i + 1)
-            for i, line in enumerate(lines)]
+    return list(self.iter_java(lines))
+
+  def convert(self, lines: List[str]) -> Tuple[List[str], Diagnostics]:
+    # Returns the Java lines and the converter's diagnostics, which include
+    # the ones of the lines converted before.
+    return self.to_java(lines), self.diagnostics
+
+
+class _StringDeclaration:
+  # A `string s = "";` planned by `_plan_string_scope()`.
+
+  def __init__(self, line_number: int, name: str, depth: int):
+    self.line_number = line_number
+    self.name = name
+    self.depth = depth
+    # Whether it's appended or prepended to, e.g. `s += c;` or `s = t + s;`.
+    self.is_built = False
+    # Whether it's assigned anything else, e.g. `s = t;`, which a
+    # StringBuilder can't hold.
+    self.is_assigned = False
+
+
+def _plan_string_scope(pending: Deque[Tuple[int, List[str]]],
+                       units: Iterator[Tuple[int, List[str]]]) -> Iterator[Tuple[int, bool]]:
+  # Reads ahead from `units` into `pending` to the end of the scope of the
+  # `string s = "";` starting `pending`, and yields the line number of it and
+  # of every such declaration nested in its scope, with whether it's built and
+  # never assigned anything else. One scan decides them all, so no statement
+  # is read twice. A scope longer than `_MAX_SCOPE_LOOKAHEAD` statements is
+  # given up on, leaving its strings as they are.
+  def ahead() -> Iterator[Tuple[int, List[str]]]:
+    yield from pending
+    for unit in units:
+      pending.append(unit)
+      yield unit
+
+  # The declarations whose scope is open, the innermost last.
+  declarations: List[_StringDeclaration] = []
+  by_name: Dict[str, List[_StringDeclaration]] = {}
+
+  def close(depth: int) -> Iterator[Tuple[int, bool]]:
+    while declarations and declarations[-1].depth > depth:
+      declaration = declarations.pop()
+      by_name[declaration.name].pop()
+      yield declaration.line_number, \
+          declaration.is_built and not declaration.is_assigned
+
+  depth = 0
+  for i, (line_number, statement) in enumerate(ahead()):
+    if i == _MAX_SCOPE_LOOKAHEAD:
+      for declaration in declarations:
+        declaration.is_assigned = True
+      break
+    text = statements.join(statement)
+    closes, opens = _count_braces(text)
+    depth -= closes
+    yield from close(depth)
+    if depth < 0:
+      return
+    match = _EMPTY_STRING.match(text)
+    if match:
+      declaration = _StringDeclaration(line_number, match.group(1), depth)
+      declarations.append(declaration)
+      by_name.setdefault(declaration.name, []).append(declaration)
+    else:
+      for name, operator in _STRING_UPDATE.findall(text):
+        if not by_name.get(name):
+          continue
+        declaration = by_name[name][-1]
+        if operator == ' = ':
+          match = _ASSIGN.match(text)
+          if not match or match.group(2) != name or \
+                  name not in _split_operands(match.group(3), ' + '):
+            declaration.is_assigned = True
+            continue
+        declaration.is_built = True
+    depth += opens
+  yield from close(-1)
+
+
+def _count_braces(code: str) -> Tuple[int, int]:
+  # The numbers of scopes `code` closes and of scopes it leaves open, e.g.
+  # (1, 1) for '} else {'.
+  closes = opens = 0
+  for brace in _BRACES.findall(code):
+    if brace == '{':
+      opens += 1
+    elif opens:
+      opens -= 1
+    else:
+      closes += 1
+  return closes, opens
+
+
+def _indent(java: str) -> str:
+  # Indents every non-blank line of `java` by one level.
+  return '\n'.join('  ' + line if line.strip() else line
+                   for line in java.split('\n'))
+
+
+def _rewrite_tokens(tokens: List[lexer.Token]) -> Iterator[str]:
+  # '->' -> '.', drops the '*' of pointer types and turns digit separators
+  # into Java's underscores.
+  for i, (kind, text) in enumerate(tokens):
+    if kind == lexer.PUNCT:
+      if text == '->':
+        text = '.'
+      elif text == '*' and _is_pointer(tokens, i):
+        text = ''
+    elif kind == lexer.NUMBER and "'" in text:
+      text = text.replace("'", '_')
+    yield text
+
+
+def _split_operands(expr: str, separator: str) -> List[str]:
+  """ -'a << f(b << 1) << c', ' << '
+      +['a', 'f(b << 1)', 'c']
+  """
+  operands: List[str] = []
+  depth = start = i = 0
+  while i < len(expr):
+    c = expr[i]
+    if c in '([{':
+      depth += 1
+    elif c in ')]}':
+      depth -= 1
+    elif depth == 0 and expr.startswith(separator, i):
+      operands.append(expr[start:i])
+      i = start = i + len(separator)
+      continue
+    i += 1
+  operands.append(expr[start:])
+  return operands
+
+
+def _parenthesized(expr: str) -> str:
+  return expr if _IDENTIFIER.fullmatch(expr) else f'({expr})'
+
+
+def _iterator_range(first: str, last: str) -> Optional[Tuple[str, bool]]:
+  """ -'begin(A)', 'end(A)'
+      +('A', False)
+
+      -'A.rbegin()', 'A.rend()'
+      +('A', True)
+  """
+  first_match = _BEGIN.fullmatch(first)
+  last_match = _END.fullmatch(last)
+  if not first_match or not last_match:
+    return None
+  first_reverse, first_var = first_match.group(1, 2) if first_match.group(2) \
+      else first_match.group(4, 3)
+  last_reverse, last_var = last_match.group(1, 2) if last_match.group(2) \
+      else last_match.group(4, 3)
+  if first_var != last_var or first_reverse != last_reverse:
+    return None
+  return first_var, bool(first_reverse)
+
+
+def _to_java_comparator(cpp_lambda: str, is_reversed: bool) -> Optional[str]:
+  """ -[](const auto& a, const auto& b) { return a[1] < b[1]; }
+      +(a, b) -> a[1] < b[1] ? -1 : b[1] < a[1] ? 1 : 0
+  """
+  # C++ comparators are "less than" predicates, Java's return an int. Asking
+  # the predicate both ways works for any element type without overflowing.
+  match = _LAMBDA_COMPARATOR.fullmatch(cpp_lambda)
+  if not match:
+    return None
+  a, b, less = match.groups()
+  swapped = re.sub(rf'\b(?:{a}|{b})\b',
+                   lambda m: b if m.group(0) == a else a, less)
+  if any(op in less for op in ('&&', '||', '?', '=')):
+    less, swapped = f'({less})', f'({swapped})'
+  if is_reversed:
+    a, b = b, a
+  return f'({a}, {b}) -> {less} ? -1 : {swapped} ? 1 : 0'
+
+
+def _to_java_format_spec(match: Match[str]) -> str:
+  # '%lld' -> '%d', '%.2lf' -> '%.2f', '%u' -> '%d'
+  flags, conversion = match.groups()
+  return f'%{flags}{_FORMAT_CONVERSIONS.get(conversion, conversion)}'
+
+
+def _is_pointer(tokens: List[lexer.Token], i: int) -> bool:
+  # Whether `tokens[i]` is the '*' of a pointer type, e.g. 'TreeNode* node',
+  # as opposed to a multiplication or a dereference.
+  if i == 0 or not (tokens[i - 1].kind == lexer.IDENTIFIER or
+                    tokens[i - 1].text == '>'):
+    return False
+  return i + 1 == len(tokens) or tokens[i + 1].kind == lexer.SPACE or \
+      tokens[i + 1].text in ('>', '>>', ',', ')', '&', '*')
+
+
+# (C++ container, object types of its elements) -> the class replacing it with
+# the 'primitive' profile.
+_PRIMITIVE_CLASSES = {
+    ('vector', ('Integer',)): 'IntList',
+    ('vector', ('Long',)): 'LongList',
+    ('unordered_set', ('Integer',)): 'IntSet',
+    ('unordered_map', ('Integer', 'Integer')): 'IntIntMap',
+}
+# Classes of support/Primitives.java -> the type of their `toArray()`.
+_ARRAY_TYPES = {'IntList': 'int[]', 'LongList': 'long[]', 'IntSet': 'int[]'}
+# Classes of support/Primitives.java indexed with get() and set().
+_PRIMITIVE_LISTS = {'IntList', 'LongList'}
+# Java type -> how `FastReader` reads it.
+_READS = {
+    'int': 'in.nextInt()',
+    'long': 'in.nextLong()',
+    'double': 'in.nextDouble()',
+    'float': '(float) in.nextDouble()',
+    'char': 'in.nextChar()',
+    'String': 'in.next()',
+    'StringBuilder': 'new StringBuilder(in.next())',
+}
+_CIN = re.compile(r'^(\s*)cin >> (.+);$')
+_COUT = re.compile(r'^(\s*)cout << (.+);$')
+_SCANF = re.compile(r'^(\s*)scanf\("\d+", (.+)\);$')
+_PRINTF = re.compile(r'^(\s*)printf\("(\d+)"(.*)\);$')
+# Length modifiers are dropped, Java's %d and %f take any size.
+_FORMAT_SPEC = re.compile(r'%([-+ #0]*\d*(?:\.\d+)?)(?:hh|h|ll|l|I64|z)?([diufFeEgGxXoscp%])')
+_FORMAT_CONVERSIONS = {'i': 'd', 'u': 'd', 'p': 'h'}
+_BRACELESS_HEADER = re.compile(r'^\s*(?:(?:} )?else(?: if \(.*\))?|(?:for|while|if) \(.*\))$')
+_DECLARATOR_NAME = re.compile(r'(?:^|, )(\w+)')
+_BEGIN = re.compile(r'(r?)begin\((.+)\)|(.+)\.(r?)begin\(\)')
+_END = re.compile(r'(r?)end\((.+)\)|(.+)\.(r?)end\(\)')
+_GREATER = re.compile(r'greater<[^<>]*>\(\)')
+_LESS = re.compile(r'less<[^<>]*>\(\)')
+_LAMBDA_COMPARATOR = re.compile(
+    r'\[&?\]\([^,()]*?\b(\w+), [^,()]*?\b(\w+)\) \{\s*return (.+?);\s*\}')
+_SORTABLE_PRIMITIVES = {'int', 'long', 'double', 'char'}
+_COMPARABLE_TYPES = {'Integer', 'Long', 'Double', 'Float', 'Character',
+                     'Boolean', 'String'}
+# Primitive type -> how to unbox its stream.
+_PRIMITIVE_STREAMS = {
+    'int': ('mapToInt', 'Integer::intValue'),
+    'long': ('mapToLong', 'Long::longValue'),
+    'double': ('mapToDouble', 'Double::doubleValue'),
+}
+_VECTOR = re.compile(r'vector<(.+)>')
+# A subscript allowing one level of nested brackets, e.g. 'count[s[i]]'.
+_MAP_KEY = r'((?:[^\[\]]|\[[^\[\]]*\])+)'
+_MAP_SUBSCRIPT = re.compile(r'(?<![\w.\]])(\w+)\[' + _MAP_KEY + r'\]')
+_MAP_PREFIX = re.compile(r'(?<![\w.\]+-])(\+\+|--)(\w+)\[' + _MAP_KEY + r'\]')
+# What follows `m[key]` in a statement updating it.
+_MAP_UPDATE = re.compile(r'(?:(\+\+|--)|(?: ([-+*/%&|^]|<<|>>)?= (.+)));')
+_ASSIGNMENT_OPERATOR = re.compile(r'\s*(?:[-+*/%&|^]|<<|>>)?=(?!=)')
+_MAP_OPERAND = re.compile(_MAP_SUBSCRIPT.pattern + r'(\+\+|--)?')
+_MAP_CANDIDATE = re.compile(r'(?<![\w.])(\w+)(?:\[|\.count\(|\.find\()')
+_MAP_COUNT = re.compile(r'(?<![\w.\]])(\w+)\.count\(')
+_MAP_FIND = re.compile(
+    r'(?<![\w.\]])(\w+)\.find\(((?:[^()]|\([^()]*\))*)\) ([!=]=) \1\.end\(\)')
+# `A[i]...[j]` and its indices, allowing one level of nested brackets.
+_SUBSCRIPT_INDEX = re.compile(r'\[((?:[^\[\]]|\[[^\[\]]*\])+)\]')
+_LIST_SUBSCRIPTS = re.compile(
+    r'(?<![\w.\]])(\w+)((?:\[(?:[^\[\]]|\[[^\[\]]*\])+\])+)')
+_LIST_OPERAND = re.compile(_LIST_SUBSCRIPTS.pattern + r'(\+\+|--)?')
+_SUBSCRIPTED_VAR = re.compile(r'(?<![\w.])(\w+)\[')
+_NUMBER = re.compile(r'\d+')
+_IDENTIFIER = re.compile(r'\w+')
+# Value type -> the cast and the literal suffix of what merge() adds to it.
+_MERGE_OPERANDS = {'Integer': ('', ''), 'Long': ('(long)', 'L'), 'Double': ('(double)', '.0')}
+_DEFAULT_VALUES = {'Integer': '0', 'Long': '0L', 'Double': '0.0', 'Boolean': 'false'}
+# Value type prefix -> the new value inserted by computeIfAbsent().
+_VALUE_CONSTRUCTORS = [
+    ('List<', 'new ArrayList<>()'),
+    ('Set<', 'new HashSet<>()'),
+    ('Map<', 'new HashMap<>()'),
+    ('TreeMap<', 'new TreeMap<>()'),
+    ('Deque<', 'new ArrayDeque<>()'),
+    ('Queue<', 'new ArrayDeque<>()'),
+]
+_PACKED_PAIR_CLASSES = {'PriorityQueue': 'LongHeap', 'ArrayDeque': 'LongQueue'}
+_PACKED_PAIR_TYPES = set(_PACKED_PAIR_CLASSES.values())
+_PAIR_INITIALIZER = re.compile(r'\{([^{}]+)\}')
+_PACKED_PAIR_PUSH = re.compile(r'^(\s*)(\w+)\.(?:emplace|push)\((.+)\);$')
+_PACKED_PAIR_PEEK = re.compile(r'(?<![\w.])(\w+)\.(?:top|front)\(\)(?:\.(first|second)\b)?')
+_CSR_EDGE = re.compile(
+    r'^(\s*)(\w+)\[((?:[^\[\]]|\[[^\[\]]*\])+)\]\.(?:push|emplace)_back\((.+)\);$')
+_STRING_TYPES = {'String', 'final String', 'StringBuilder'}
+# Prefilter of `_rewrite_string_builder()`.
+_STRING_BUILDER_OPS = re.compile(
+    r' \+= |\.(?:push_back|pop_back|back|insert)\(| = \w+ \+ | \+ \w+[ ;]')
+_APPEND = re.compile(r'^(\s*)(\w+) \+= (.+);$')
+_PUSH_BACK = re.compile(r'^(\s*)(\w+)\.push_back\((.+)\);$')
+_CONCAT = re.compile(r'^(\s*)(\w+) = \2 \+ (.+);$')
+_ASSIGN = re.compile(r'^(\s*)(\w+) = (.+);$')
+_POP_BACK = re.compile(r'^(\s*)(\w+)\.pop_back\(\);$')
+_ARITHMETIC = re.compile(r' [-+] ')
+_BACK = re.compile(r'(?<![\w.])(\w+)\.back\(\)')
+_INSERT = re.compile(r'(?<![\w.])(\w+)\.insert\(')
+_EMPTY_STRING = re.compile(r'^\s*string (\w+) = "";$')
+_STRING_UPDATE = re.compile(
+    r'(?<![\w.])(\w+)( \+= |\.(?:push_back|pop_back|insert)\(| = )')
+# Statements read ahead to plan a StringBuilder, see `_scope_after()`.
+_MAX_SCOPE_LOOKAHEAD = 10_000
+_KEY_VALUE_TYPES = re.compile(r'(?:List<Pair|Map)<([^,]+), ([^>]+)>')
+# `(?<!\S)` only lets `(\S+)` start where a run of non-spaces starts, which is
+# where the leftmost match starts anyway, so it isn't retried at every index.
+_SUBSTR_WITH_LENGTH = re.compile(r'(?<!\S)(\S+)\.substr\(([^,()]+), ([^()]+)\)')
+_SUBSTR = re.compile(r'(?<!\S)(\S+)\.substr\(([^()]+)\)')
+# A variable, maybe indexed, e.g. 'grid[i]'.
+_SIZE = re.compile(r'(?<![\w.\]])(\w+(?:\[[^\[\]]*\])*)\.size\(\)')
+_PLACEHOLDER = re.compile(r'"(\d+)"')
+_BRACES = re.compile(r'[{}]')
+# Lines without these characters have no literals, comments or tokens to
+# rewrite, and don't need to be lexed.
+_LEXED_CHARS = re.compile(r'["\'/*]|->')
+# The arguments allow one level of parentheses, e.g. 'begin(A)'.
+_MIN_MAX_ELEMENT = re.compile(
+    r'\*(min|max)_element\(((?:[^()]|\([^()]*\))*)\)')
+_ACCUMULATE = re.compile(r'(?<![\w.])accumulate\(((?:[^()]|\([^()]*\))*)\)')
+_INTEGER_SUFFIX = re.compile(r'\b(\d+)([uU]?(?:ll|LL|l|L)|(?:ll|LL|l|L)?[uU])\b')
+_EMPLACE_BACK = re.compile(r'(?<!\w)(\w+)\[(\w+)\]\.emplace_back\(([^,]+), ([^)]+)\);')
+_FUNC_NAMES = rules.CallRewriter(lambda: keywords.func_name)
+_REPLACED_END = rules.Replacer(lambda: keywords.replaced_end)
+
+# The order of the rules matters: the first statement rule that converts a
+# line wins, and rewrite rules are applied one after another.
+_RULES = rules.RuleSet([
+    # Stmt
+    rules.rule('struct', r'^(\s*)struct (\w+) \{$',
+               CppConverter._convert_struct, keyword='struct'),
+    rules.rule('struct end', r'^};$',
+               CppConverter._convert_struct_end, required=('};',)),
+    rules.rule('initializer list constructor', r'^(\s*)(\w+)\(([^)]*)\) : (.+) {}$',
+               CppConverter._convert_initializer_list_constructor,
+               required=(') : ', '{}')),
+    rules.rule('class member', r'^(\s*)(.*);$',
+               CppConverter._convert_class_member, required=(';',),
+               when=lambda converter: converter._is_in_class),
+    rules.rule('class constructor', r'^(\s*)(\w+)\((.*)\) {$',
+               CppConverter._convert_class_constructor, required=(') {',)),
+    # Var Decl
+    *[rules.rule(cpp_container, r'^(\s*)' + cpp_container + r'<(.*)> (\w+);$',
+                 functools.partial(CppConverter._convert_container,
+                                   cpp_container=cpp_container,
+                                   java_interface=java_interface,
+                                   java_implementation=java_implementation),
+                 keyword=cpp_container)
+      for cpp_container, (java_interface, java_implementation)
+      in keywords.data_structure.items()],
+    rules.rule('unordered_map', r'^(\s*)unordered_map<([^,]+), (.*)> (\w+);$',
+               CppConverter._convert_unordered_map, keyword='unordered_map'),
+    rules.rule('map', r'^(\s*)map<([^,]+), ([^>]+)> (\w+);$',
+               CppConverter._convert_map, keyword='map'),
+    rules.rule('min heap',
+               r'^(\s*)priority_queue<(.*)>, greater<>> (\w+);$',
+               CppConverter._convert_min_heap, keyword='priority_queue'),
+    rules.rule('max heap', r'^(\s*)priority_queue<(.*)> (\w+);$',
+               CppConverter._convert_max_heap, keyword='priority_queue'),
+    rules.rule('queue with initializer list', r'^(\s*)queue<([^{]*)> (\w+){{(.*)}};$',
+               CppConverter._convert_queue_with_initializer_list, keyword='queue'),
+    rules.rule('vector', r'^(\s*)vector<([^>]+)> (\w+);$',
+               CppConverter._convert_vector, keyword='vector'),
+    rules.rule('vector with initializer list', r'^(\s*)vector<([^>]+)> (\w+)\{(.*)\};$',
+               CppConverter._convert_vector_with_initializer_list, keyword='vector'),
+    rules.rule('vector with size', r'^(\s*)vector<([^>]+)> (\w+)\((.*)\);$',
+               CppConverter._convert_vector_with_size, keyword='vector'),
+    rules.rule('2D vector with sizes',
+               r'^(?=.*\)\);$)(\s*)vector<vector<([^>]+)>> (\w+)\((.+), vector<[^>]+>\((\w+|.*?)\)\);$',
+               CppConverter._convert_2d_vector_with_sizes, keyword='vector'),
+    rules.rule('2D vector with size', r'^(?=.*\);$)(\s*)vector<vector<(.*)>> (\w+)\((.*)\);$',
+               CppConverter._convert_2d_vector_with_size, keyword='vector'),
+    # `return f(x);` and friends are statements, not declarations.
+    rules.rule('class var',
+               r'^(\s*)(?!(?:return|throw|delete|else|do|goto|case)\b)(\w+) (\w+)\((.*)\);$',
+               CppConverter._convert_class_var, required=(');',)),
+    rules.rule('string', r'^(\s*)string (\w+);$',
+               CppConverter._convert_string, keyword='string'),
+    rules.rule('string with initializer', r'^(\s*)string (\w+) = (.+);$',
+               CppConverter._convert_string_with_initializer, keyword='string'),
+    *[rules.rule('scalar declaration',
+                 r'^\s*(?:const )?(' + type + r') ((?:\w+(?: = [^,;()]+)?, )*\w+(?: = [^,;()]+)?);$',
+                 CppConverter._convert_scalar_declaration, keyword=type.split()[0])
+      for type in ['int', 'long long', 'long', 'double', 'float', 'char', 'bool']],
+    rules.rule('packed pair binding',
+               r'^(\s*)(const )?auto&? \[(\w+), (\w+)\] = (\w+)\.(?:top|front)\(\);$',
+               CppConverter._convert_packed_pair_binding, required=('] = ',),
+               when=lambda converter: converter._pack_pairs),
+    rules.rule('return', r'^(\s*)return (\w+);$',
+               CppConverter._convert_return, keyword='return'),
+    # Func Decl
+    rules.rule('main', r'^(\s*)int main\(.*\) {$',
+               CppConverter._convert_main, keyword='int'),
+    rules.rule('function', r'^(\s*)([^(]*) (\w+)\((.*)\) {$',
+               CppConverter._convert_function, required=(') {',)),
+    rules.rule('range-based for loop', r'^(\s*)for \((.*) (\w+) : (\S+)\)( {)?',
+               CppConverter._convert_range_based_for, keyword='for'),
+    rules.rule('structured binding for loop',
+               r'^(\s*)for \((?:const )auto(?:&) \[(\w+), (\w+)\] : ([^)]+)\)( {)?',
+               CppConverter._convert_structured_binding_for, keyword='for'),
+    rules.rule('sort', r'^(\s*)sort\((.+)\);$',
+               CppConverter._convert_sort, keyword='sort'),
+    # I/O
+    rules.rule('include', r'^#include\b', CppConverter._convert_include,
+               required=('#include',)),
+    rules.rule('using namespace', r'^\s*using namespace std;$',
+               CppConverter._drop_line, keyword='using'),
+    rules.rule('stdio setup',
+               r'^\s*(?:std::)?ios(?:_base)?::sync_with_stdio\(.*\);$',
+               CppConverter._drop_line, required=('sync_with_stdio(',)),
+    rules.rule('stdio setup', r'^\s*(?:cin|cout)\.tie\(.*\);$',
+               CppConverter._drop_line, required=('.tie(',)),
+    # Expr
+    rules.rewrite('tokens', CppConverter._rewrite_tokens),
+    # After 'tokens' for the operands, before the rest for the result.
+    rules.rewrite('cin', CppConverter._rewrite_cin, required=('cin >> ',)),
+    rules.rewrite('cout', CppConverter._rewrite_cout, required=('cout << ',)),
+    rules.rewrite('scanf', CppConverter._rewrite_scanf, required=('scanf(',)),
+    rules.rewrite('printf', CppConverter._rewrite_printf, required=('printf(',)),
+    rules.rewrite('string builder', CppConverter._rewrite_string_builder),
+    rules.rewrite('CSR edge', CppConverter._rewrite_csr_edge,
+                  required=('_back(',)),
+    rules.rewrite('packed pairs', CppConverter._rewrite_packed_pairs,
+                  required=('.',)),
+    rules.rewrite('map idioms', CppConverter._rewrite_map_idioms),
+    rules.rewrite('primitive lists', CppConverter._rewrite_primitive_lists,
+                  required=('[',)),
+    rules.rewrite('func names', CppConverter._rewrite_func_names),
+    rules.rewrite('substr', CppConverter._rewrite_substr, required=('.substr(',)),
+    rules.rule('peek then pop', r'^(.*?)(?<!\w)(\w+)\.(?:top|front)\(\), \w+\.pop\(\);$',
+               CppConverter._convert_peek_then_pop, required=('(), ', '.pop();')),
+    rules.rewrite('size', CppConverter._rewrite_size, required=('size()',)),
+    rules.rewrite('min/max element', CppConverter._rewrite_min_max_element,
+                  required=('_element(',)),
+    rules.rewrite('accumulate', CppConverter._rewrite_accumulate,
+                  required=('accumulate(',)),
+    rules.rewrite('emplace_back', CppConverter._rewrite_emplace_back,
+                  required=('.emplace_back(',)),
+    rules.rewrite('replaced_end', CppConverter._rewrite_replaced_end),
+])
+
+
+def find_cpp_files(paths: Iterable[str]) -> List[str]:
+  # Expands directories (recursively) and glob patterns to `.cpp` files.
+  # Other files named explicitly raise a ValueError, since their output
+  # filename could be their own.
+  in_filenames: List[str] = []
+  for path in paths:
+    if os.path.isdir(path):
+      for root, dirs, filenames in os.walk(path):
+        dirs.sort()
+        in_filenames.extend(os.path.join(root, filename)
+                            for filename in sorted(filenames)
+                            if filename.endswith('.cpp'))
+    elif os.path.isfile(path):
+      files.java_filename(path)  # Raises if it isn't a .cpp file.
+      in_filenames.append(path)
+    elif glob.has_magic(path):
+      in_filenames.extend(
+          filename for filename in sorted(glob.glob(path, recursive=True))
+          if filename.endswith('.cpp') and os.path.isfile(filename))
+    else:
+      raise FileNotFoundError(path)
+  return in_filenames
+
+
+def _iter_java_output(java_lines: Iterable[str]) -> Iterator[str]:
+  # Drops empty lines and makes sure every line ends with a newline.
+  for java_line in java_lines:
+    if java_line:
+      yield java_line if java_line[-1] == '\n' else java_line + '\n'
+
+
+def _join_java(java_lines: Iterable[str]) -> str:
+  return ''.join(_iter_java_output(java_lines))
+
+
+def convert_stream(in_file: TextIO, out_file: TextIO,
+                   stats: Optional[rules.RuleStats] = None,
+                   options: Optional[Dict[str, Any]] = None,
+                   diagnostics: Optional[Diagnostics] = None) -> None:
+  # Converts line by line, so memory use doesn't depend on the input size.
+  # `options` are passed to `CppConverter`.
+  converter = CppConverter(stats=stats, diagnostics=diagnostics,
+                           **(options or {}))
+  out_file.writelines(_iter_java_output(converter.iter_java(in_file)))
+
+
+def convert_source(source: str,
+                   stats: Optional[rules.RuleStats] = None,
+                   options: Optional[Dict[str, Any]] = None,
+                   diagnostics: Optional[Diagnostics] = None) -> str:
+  # Converts a whole C++ source as the CLI does, with universal newlines.
+  cpp_lines = io.StringIO(source, newline=None).readlines()
+  converter = CppConverter(stats=stats, diagnostics=diagnostics,
+                           **(options or {}))
+  return _join_java(converter.to_java(cpp_lines))
+
+
+def ruleset_version(options: Optional[Dict[str, Any]] = None) -> str:
+  # Changes whenever the converter's code, the `keywords` tables or the
+  # converter's `options` change, so it can be used to invalidate cached
+  # conversions.
+  h = hashlib.sha256(_source_version().encode())
+  h.update(repr((keywords.func_name, keywords.data_structure,
+                 keywords.replaced_end, sorted((options or {}).items()))).encode())
+  return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_version() -> str:
+  h = hashlib.sha256()
+  for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))):
+    if path.endswith('_test.py'):
+      continue
+    with open(path, 'rb') as f:
+      h.update(f.read())
+  return h.hexdigest()
+
+
+def convert_file(in_filename: str,
+                 cache: Optional[ConversionCache] = None,
+                 stats: Optional[rules.RuleStats] = None,
+                 options: Optional[Dict[str, Any]] = None,
+                 diagnostics: Optional[Diagnostics] = None) -> Tuple[str, bool, bool]:
+  # Returns the output filename, whether the conversion was cached and
+  # whether the output file changed. An unchanged output file isn't
+  # rewritten, which keeps its mtime for incremental builds. A cached
+  # conversion records no diagnostics. The support files the output needs are
+  # copied next to it.
+  out_filename = files.java_filename(in_filename)
+
+  with open(in_filename, 'rb') as f:
+    source = f.read()
+
+  key = cache.key(source) if cache else None
+  java = cache.get(key) if cache else None
+  cached = java is not None
+  if java is None:
+    java = convert_source(source.decode('utf-8'), stats, options, diagnostics)
+    if cache:
+      cache.put(key, java)
+
+  changed = files.write_if_changed(out_filename, java)
+  support.copy_required_files(java, os.path.dirname(out_filename))
+  return out_filename, cached, changed
+
+
+class ConversionResult(NamedTuple):
+  in_filename: str
+  out_filename: Optional[str]
+  error: Optional[str]
+  cached: bool = False
+  stats: Optional[rules.RuleStats] = None
+  unchanged: bool = False
+  diagnostics: Optional[Diagnostics] = None
+
+
+def _convert_file_safely(in_filename: str,
+                         cache: Optional[ConversionCache] = None,
+                         with_stats: bool = False,
+                         options: Optional[Dict[str, Any]] = None) -> ConversionResult:
+  stats = rules.RuleStats() if with_stats else None
+  diagnostics = Diagnostics()
+  try:
+    out_filename, cached, changed = convert_file(
+        in_filename, cache, stats, options, diagnostics)
+    return ConversionResult(in_filename, out_filename, None, cached, stats,
+                            unchanged=not changed, diagnostics=diagnostics)
+  except Exception as e:
+    return ConversionResult(in_filename, None, f'{type(e).__name__}: {e}',
+                            stats=stats, diagnostics=diagnostics)
+
+
+def convert_files(in_filenames: List[str], jobs: int = 1,
+                  cache: Optional[ConversionCache] = None,
+                  with_stats: bool = False,
+                  options: Optional[Dict[str, Any]] = None) -> Iterator[ConversionResult]:
+  # Yields results in the order of `in_filenames`. Each file is converted by a
+  # fresh `CppConverter` in one of `jobs` worker processes.
+  convert = functools.partial(_convert_file_safely, cache=cache,
+                              with_stats=with_stats, options=options)
+  if jobs <= 1 or len(in_filenames) <= 1:
+    yield from map(convert, in_filenames)
+    return
+  chunksize = max(1, len(in_filenames) // (jobs * 4))
+  with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+    yield from executor.map(convert, in_filenames, chunksize=chunksize)
+
+
+def _report_stats(stats: Optional[rules.RuleStats],
+                  args: argparse.Namespace) -> None:
+  if stats is None:
+    return
+  if args.stats:
+    print(stats.format_table(), file=sys.stderr)
+  if args.stats_json:
+    with open(args.stats_json, 'w', encoding='utf-8') as f:
+      json.dump(stats.to_json(), f, indent=2)
+
+
+def _print_diagnostics(filename: str, diagnostics: Diagnostics) -> None:
+  for diagnostic in diagnostics:
+    print(diagnostic.format(filename), file=sys.stderr)
+
+
+def _report_diagnostics(diagnostics: Dict[str, Diagnostics],
+                        args: argparse.Namespace) -> None:
+  # `diagnostics` maps filenames to their diagnostics.
+  if not args.diagnostics_json:
+    return
+  counts: Dict[str, int] = {}
+  items: List[Dict[str, Any]] = []
+  for filename, file_diagnostics in diagnostics.items():
+    for rule, count in file_diagnostics.counts().items():
+      counts[rule] = counts.get(rule, 0) + count
+    items.extend({'file': filename, **diagnostic}
+                 for diagnostic in file_diagnostics.to_json())
+  with open(args.diagnostics_json, 'w', encoding='utf-8') as f:
+    json.dump({'counts': counts, 'diagnostics': items}, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  parser = argparse.ArgumentParser(
+      description='Converts C++ solutions to Java.',
+      fromfile_prefix_chars='@')
+  parser.add_argument(
+      'paths', nargs='+',
+      help='.cpp files, directories or glob patterns (@FILE reads paths from '
+           'FILE), or - to convert stdin to stdout')
+  parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                      help='number of worker processes (default: CPU count)')
+  parser.add_argument('-q', '--quiet', action='store_true',
+                      help="don't print progress")
+  parser.add_argument('--cache-dir',
+                      help='reuse conversions of unchanged files cached in this directory')
+  parser.add_argument('--cache-size', type=int, default=256,
+                      help='maximum size of the cache in MiB (default: 256)')
+  parser.add_argument('--stats', action='store_true',
+                      help='print per-rule attempts, hits and time to stderr')
+  parser.add_argument('--stats-json',
+                      help='write per-rule attempts, hits and time as JSON here')
+  parser.add_argument('--diagnostics-json',
+                      help='write what couldn\'t be converted, and the counts '
+                           'per rule, as JSON here')
+  parser.add_argument('--line-budget', type=int, default=DEFAULT_LINE_BUDGET,
+                      help='keep statements longer than this many characters '
+                           'as they are (default: %(default)s)')
+  parser.add_argument('--profile', choices=PROFILES, default='boxed',
+                      help="'primitive' uses the int/long collections of "
+                           'support/Primitives.java instead of boxing, where '
+                           'the element types allow it (default: %(default)s)')
+  parser.add_argument('--csr', action='store_true',
+                      help='emit vector<vector<int>> adjacency lists that are '
+                           'built, then only read as support/CsrGraph.java')
+  parser.add_argument('--pack-pairs', action='store_true',
+                      help='store each pair<int, int> of heaps and queues in '
+                           'a long, see support/PackedPairs.java')
+  parser.add_argument('--watch', action='store_true',
+                      help='after converting, keep reconverting the files that '
+                           'are created or modified until interrupted')
+  args = parser.parse_args(argv)
+  if args.watch and args.paths == ['-']:
+    parser.error("--watch can't be used with -")
+  with_stats = args.stats or bool(args.stats_json)
+  options = {'line_budget': args.line_budget, 'profile': args.profile,
+             'csr': args.csr, 'pack_pairs': args.pack_pairs}
+
+  cache = ConversionCache(args.cache_dir, ruleset_version(options),
+                          args.cache_size * 1024 * 1024) \
+      if args.cache_dir else None
+
+  stats = rules.RuleStats() if with_stats else None
+  if args.paths == ['-']:
+    diagnostics = Diagnostics()
+    convert_stream(sys.stdin, sys.stdout, stats, options, diagnostics)
+    _report_stats(stats, args)
+    _print_diagnostics('<stdin>', diagnostics)
+    _report_diagnostics({'<stdin>': diagnostics}, args)
+    return 0
+
+  try:
+    in_filenames = find_cpp_files(args.paths)
+  except FileNotFoundError as e:
+    print('Not a file or directory', e.args[0], file=sys.stderr)
+    return -1
+  except ValueError as e:
+    print(e, file=sys.stderr)
+    return -1
+
+  failures = _convert_and_report(in_filenames, args, cache, stats, options)
+  if args.watch:
+    dirs = [path for path in args.paths if os.path.isdir(path)]
+    cpp_files = find_cpp_files(path for path in args.paths
+                               if not os.path.isdir(path))
+    return _watch(dirs, cpp_files, args, cache, stats, options)
+  return 1 if failures else 0
+
+
+def _convert_and_report(in_filenames: List[str], args: argparse.Namespace,
+                        cache: Optional[ConversionCache],
+                        stats: Optional[rules.RuleStats],
+                        options: Dict[str, Any],
+                        jobs: Optional[int] = None) -> List[ConversionResult]:
+  # Converts the files, prints the progress, the diagnostics and the
+  # failures, returns the failures.
+  n = len(in_filenames)
+  failures: List[ConversionResult] = []
+  diagnostics: Dict[str, Diagnostics] = {}
+  for i, result in enumerate(
+          convert_files(in_filenames, jobs or args.jobs, cache,
+                        stats is not None, options), 1):
+    if result.stats:
+      stats.merge(result.stats)
+    if result.error:
+      failures.append(result)
+    if result.diagnostics:
+      diagnostics[result.in_filename] = result.diagnostics
+    if not (args.quiet or n == 1 and not result.error and not args.watch):
+      status = result.out_filename if not result.error else 'FAILED'
+      if result.cached:
+        status += ' (cached)'
+      if result.unchanged:
+        status += ' (unchanged)'
+      print(f'[{i}/{n}] {result.in_filename} -> {status}', flush=True)
+    if result.diagnostics:
+      _print_diagnostics(result.in_filename, result.diagnostics)
+
+  if cache:
+    cache.evict()
+  _report_stats(stats, args)
+  _report_diagnostics(diagnostics, args)
+
+  if failures:
+    print(f'{len(failures)} of {n} files failed:', file=sys.stderr)
+    for failure in failures:
+      print(f'  {failure.in_filename}: {failure.error}', file=sys.stderr)
+  return failures
+
+
+def _watch(dirs: List[str], cpp_files: List[str], args: argparse.Namespace,
+           cache: Optional[ConversionCache],
+           stats: Optional[rules.RuleStats], options: Dict[str, Any]) -> int:
+  # Reconverts the changed files in this process, so the compiled rules and
+  # type caches stay warm, until interrupted.
+  watcher = watch.create_watcher(dirs, cpp_files)
+  if not args.quiet:
+    print(f'Watching for changes with {type(watcher).__name__} '
+          '(Ctrl-C to stop)', flush=True)
+  try:
+    for changed in watch.watch(watcher):
+      if stats is not None:
+        stats = rules.RuleStats()
+      _convert_and_report(changed, args, cache, stats, options, jobs=1)
+  except KeyboardInterrupt:
+    pass
+  finally:
+    watcher.close()
+  return 0
 
 
 if __name__ == '__main__':
-  if len(sys.argv) != 2:
-    sys.exit(-1)
-
-  if not os.path.isfile(sys.argv[1]):
-    print('Not a file or directory', sys.argv[1], file=sys.stderr)
-    sys.exit(-1)
-
-  in_filename: str = sys.argv[1]  # 'abc123.cpp'
-  out_filename: str = in_filename.replace('.cpp', '.java')
-
-  with open(in_filename, 'r', encoding='utf-8') as f:
-    cpp_lines = f.readlines()
-
-  java_lines = CppConverter().to_java(cpp_lines)
-
-  with open(out_filename, 'w+', encoding='utf-8') as f:
-    for java_line in java_lines:
-      if java_line:
-        f.write(java_line)
-        if java_line[-1] != '\n':
-          f.write('\n')
-
-    # f.write(''.join(java_lines))
+  sys.exit(main())
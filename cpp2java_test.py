@@ -1,5 +1,37 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
 import unittest
+import unittest.mock
+from typing import List, Tuple
+
 import cpp2java
+import cpptypes
+import files
+import keywords
+import lexer
+import rules
+import server
+import statements
+import support
+import symbols
+import watch
+from cache import ConversionCache
+from client import Client, ServerError
+from diagnostics import Diagnostics
+
+
+def _convert_lines(converter: cpp2java.CppConverter,
+                   cpp_lines: List[str]) -> Tuple[List[str], Diagnostics]:
+  # Converts `cpp_lines` ending with '\n' like the lines of a file, and drops
+  # the line terminators of the Java lines.
+  java_lines, diagnostics = converter.convert([line + '\n' for line in cpp_lines])
+  return [line.rstrip('\n') for line in java_lines], diagnostics
 
 
 class CppToJavaTestCase(unittest.TestCase):
@@ -120,9 +152,13 @@ class CppToJavaTestCase(unittest.TestCase):
   def test_class_var_declaration(self):
     cpp_lines = [
         'UF uf(m * n);',
+        'return dfs(root);',
+        'else dfs(root);',
     ]
     java_lines = [
         'UF uf = new UF(m * n);',
+        'return dfs(root);',
+        'else dfs(root);',
     ]
     self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
 
@@ -135,6 +171,76 @@ class CppToJavaTestCase(unittest.TestCase):
     ]
     self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
 
+    # `string s = "";` is a StringBuilder only if it's built in its scope.
+    cpp_lines = [
+        'string s = "";',
+        'string u = "";',
+        'for (const char c : t) {',
+        '  string w = "";',
+        '  w = c + w;',
+        '  s += w;',
+        '}',
+        'u = t;',
+    ]
+    java_lines = [
+        'StringBuilder s = new StringBuilder();',
+        'String u = "";',
+        'for (final char c : t) {',
+        '  StringBuilder w = new StringBuilder();',
+        '  w.insert(0, c);',
+        '  s.append(w);',
+        '}',
+        'u = t;',
+    ]
+    self.assertEqual(cpp2java.CppConverter().to_java(cpp_lines), java_lines)
+
+  def test_string_builder(self):
+    cpp_lines = [
+        'string f(const string& t) {',
+        '  string s;',
+        '  string u = "";',
+        '  string v = t + "a";',
+        '  for (int i = 0; i < 26; ++i) {',
+        "    s += 'a' + i;",
+        '    s = s + t + "b";',
+        '    s = "c" + t + s + t;',
+        '    u = s + u + u;',
+        '    u.insert(0, t);',
+        '    u.push_back(s.back());',
+        '    v += "x";',
+        '  }',
+        '  s.pop_back();',
+        '  if (s.size() > t.size())',
+        '    return s;',
+        '  return v;',
+        '}',
+    ]
+    java_lines = [
+        'public String f(final String t) {',
+        '  StringBuilder s = new StringBuilder();',
+        '  StringBuilder u = new StringBuilder();',
+        '  String v = t + "a";',
+        '  for (int i = 0; i < 26; ++i) {',
+        "    s.append((char) ('a' + i));",
+        '    s.append(t).append("b");',
+        '    s.insert(0, t).insert(0, "c").append(t);',
+        # Kept for a human to convert.
+        '    u = s + u + u;',
+        '    u.insert(0, t);',
+        '    u.append(s.charAt(s.length() - 1));',
+        '    v += "x";',
+        '  }',
+        '  s.setLength(s.length() - 1);',
+        '  if (s.length() > t.length())',
+        '    return s.toString();',
+        '  return v;',
+        '}',
+    ]
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(
+        cpp2java.CppConverter(sequential_replace=True).to_java(cpp_lines),
+        java_lines)
+
   def test_func_declaraction(self):
     cpp_lines = [
         'long long myFunc(const string& param1, bool param2) {'
@@ -177,16 +283,64 @@ class CppToJavaTestCase(unittest.TestCase):
 
   def test_sort(self):
     cpp_lines = [
+        'vector<int> nums(n);',
+        'vector<vector<int>> matrix(m, vector<int>(n));',
+        'vector<string> words;',
         'sort(begin(nums), end(nums));',
-        'sort(begin(nums), end(nums), greater<>());',
-        'sort(begin(matrix[0]), end(matrix[0]));',
+        'sort(nums.begin(), nums.end(), greater<>());',
+        'sort(nums.rbegin(), nums.rend());',
+        'sort(begin(matrix[0]), end(matrix[0]), greater<int>());',
+        'sort(begin(words), end(words));',
+        'sort(begin(words), end(words), greater<>());',
+        'sort(begin(matrix), end(matrix), [](const vector<int>& a, const vector<int>& b) {',
+        '  return a[1] < b[1];',
+        '});',
+        'sort(begin(matrix), end(matrix), [](const auto& a, const auto& b) { return a[0] == b[0] ? a[1] > b[1] : a[0] < b[0]; });',
+        'sort(begin(words), end(words), [](const string& a, const string& b) { return a.length() < b.length(); });',
+        'sort(begin(nums), end(nums), [](int x, int y) { return x % 10 < y % 10; });',
     ]
     java_lines = [
+        'int[] nums = new int[n];',
+        'int[][] matrix = new int[m][n];',
+        'List<String> words = new ArrayList<>();',
         'Arrays.sort(nums);',
-        'Arrays.sort(nums, (a, b) -> b - a);',
-        'Arrays.sort(matrix[0]);',
+        'Arrays.sort(nums);\nAlgorithms.reverse(nums);',
+        'Arrays.sort(nums);\nAlgorithms.reverse(nums);',
+        'Arrays.sort(matrix[0]);\nAlgorithms.reverse(matrix[0]);',
+        'Collections.sort(words);',
+        'words.sort(Comparator.reverseOrder());',
+        'Arrays.sort(matrix, (a, b) -> a[1] < b[1] ? -1 : b[1] < a[1] ? 1 : 0);',
+        'Arrays.sort(matrix, (a, b) -> (a[0] == b[0] ? a[1] > b[1] : a[0] < b[0]) ? -1 : '
+        '(b[0] == a[0] ? b[1] > a[1] : b[0] < a[0]) ? 1 : 0);',
+        'words.sort((a, b) -> a.length() < b.length() ? -1 : b.length() < a.length() ? 1 : 0);',
+        'System.arraycopy(Arrays.stream(nums).boxed()'
+        '.sorted((x, y) -> x % 10 < y % 10 ? -1 : y % 10 < x % 10 ? 1 : 0)'
+        '.mapToInt(Integer::intValue).toArray(), 0, nums, 0, nums.length);',
     ]
     self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['Algorithms.java'])
+
+    # The order of an untracked variable depends on its type.
+    java_lines, diagnostics = cpp2java.CppConverter().convert(
+        ['sort(begin(A), end(A), greater<>());'])
+    self.assertEqual(java_lines, ['Arrays.sort(A, Comparator.reverseOrder());'])
+    self.assertEqual([d.rule for d in diagnostics], ['sort'])
+
+    # Arrays aren't Comparable, and other classes may not be.
+    java_lines, diagnostics = cpp2java.CppConverter().convert([
+        'vector<vector<int>> B(n, vector<int>(2));',
+        'vector<Item> items;',
+        'sort(begin(B), end(B), greater<>());',
+        'sort(begin(B), end(B));',
+        'sort(begin(items), end(items), greater<>());',
+    ])
+    self.assertEqual(java_lines[2:], [
+        'Arrays.sort(B, (a, b) -> Arrays.compare(b, a));',
+        'Arrays.sort(B, Arrays::compare);',
+        'items.sort(Comparator.reverseOrder());',
+    ])
+    self.assertEqual([(d.rule, d.line_number) for d in diagnostics], [('sort', 5)])
 
   def test_string_expression(self):
     cpp_lines = [
@@ -253,23 +407,1015 @@ class CppToJavaTestCase(unittest.TestCase):
     ]
     self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
 
+  def test_literals_and_comments_are_untouched(self):
+    cpp_lines = [
+        'string t = "node->next * const";  // ListNode* curr->next',
+        'cout << \'*\' << "a->b";',
+        '/* vector<int> A;',
+        '   TreeNode* node->left */',
+        'ListNode* curr = head->next;  // const long long',
+        'const long long kMod = 1\'000\'000\'007;',
+        'int x = a*b;',
+    ]
+    java_lines = [
+        'String t = "node->next * const";  // ListNode* curr->next',
+        'out.print(\'*\').print("a->b");',
+        '/* vector<int> A;',
+        '   TreeNode* node->left */',
+        'ListNode curr = head.next;  // const long long',
+        'final long kMod = 1_000_000_007;',
+        'int x = a*b;',
+    ]
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+
+  def test_declaration_with_trailing_comment(self):
+    cpp_lines = ['vector<int> A;  // indices\n']
+    java_lines = ['List<Integer> A = new ArrayList<>();  // indices\n']
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+
+  def test_statement_spanning_lines(self):
+    cpp_lines = [
+        'vector<vector<int>> dp(m + 1,\n',
+        '                       vector<int>(n + 1));\n',
+        'long long solve(const vector<int>& nums,\n',
+        '                const string& s) {\n',
+        '  ans = max(a,\n',
+        '            b);  // comment\n',
+        '  foo(a,  // a\n',
+        '      b);\n',
+        '}\n',
+    ]
+    java_lines = [
+        'int[][] dp = new int[m + 1][n + 1];',
+        'public long solve(int[] nums, final String s) {',
+        '  ans = Math.max(a,\n'
+        '            b);  // comment\n',
+        '  foo(a,  // a\n',
+        '      b);\n',
+        '}\n',
+    ]
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+
   def test_min_or_max_element(self):
     cpp_lines = [
         '*min_element(begin(A), end(A));',
         '*max_element(begin(A), end(A));',
+        'int d = *max_element(nums.begin(), nums.end()) - *min_element(begin(grid[0]), end(grid[0]));',
+        'auto it = min_element(begin(A) + 1, end(A));',
     ]
     java_lines = [
-        'Arrays.stream(A).min().getAsInt();',
-        'Arrays.stream(A).max().getAsInt();',
+        'Algorithms.min(A);',
+        'Algorithms.max(A);',
+        'int d = Algorithms.max(nums) - Algorithms.min(grid[0]);',
+        'auto it = min_element(begin(A) + 1, end(A));',
+    ]
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
+
+  def test_iter_java_keeps_state_across_lines(self):
+    java_lines = self.cpp_converter.iter_java(
+        iter(['vector<int> A(n);', 'int m = A.size();']))
+    self.assertEqual(next(java_lines), 'int[] A = new int[n];')
+    self.assertEqual(next(java_lines), 'int m = A.length;')
+    self.assertIsNone(next(java_lines, None))
+
+  def test_types_are_scoped_by_braces(self):
+    java_lines = self.cpp_converter.to_java([
+        'void f(vector<int>& A) {',
+        '  int m = A.size();',
+        '}',
+        'void g() {',
+        '  int m = A.size();',
+        '}',
+    ])
+    self.assertEqual(java_lines[1], '  int m = A.length;')
+    self.assertEqual(java_lines[4], '  int m = A.size();')
+
+  def test_types_dont_accumulate_across_inputs(self):
+    for i in range(100):
+      self.cpp_converter.to_java([
+          f'int f{i}(vector<int>& A{i}) {{',
+          f'  vector<int> B{i}(n);',
+          '  return 0;',
+          '}',
+      ])
+    self.assertEqual(len(self.cpp_converter._var_to_type), 0)
+
+  def test_min_heap_with_nested_type(self):
+    self.assertEqual(
+        self.cpp_converter.to_java([
+            'priority_queue<pair<int, vector<int>>, vector<pair<int, vector<int>>>, '
+            'greater<>> minHeap;'
+        ]),
+        ['Queue<Pair<Integer, int[]>> minHeap = new PriorityQueue<>();'])
+
+  def test_pathological_lines(self):
+    # Used to backtrack for minutes.
+    for line in ['s.substr(' * 2000, 'queue<' + '> a{{' * 2000,
+                 'vector<vector<int>> a(' + 'b, vector<int>(' * 2000]:
+      self.assertEqual(self.cpp_converter.to_java([line]), [line])
+
+  def test_line_budget(self):
+    converter = cpp2java.CppConverter(line_budget=10)
+    java_lines, diagnostics = converter.convert(['vector<int> A(n);', 'int x;'])
+    self.assertEqual(java_lines, ['vector<int> A(n);', 'int x;'])
+    self.assertEqual(
+        [d.format() for d in diagnostics],
+        ['line 1: warning: longer than 10 characters, kept as is [line budget]'])
+
+  def test_primitive_profile(self):
+    converter = cpp2java.CppConverter(profile='primitive')
+    cpp_lines = [
+        'vector<int> f(int n) {',
+        '  vector<int> ans{1, 2};',
+        '  vector<string> names;',
+        '  unordered_set<int> seen;',
+        '  unordered_map<int, int> count;',
+        '  unordered_map<int, long> sums;',
+        '  vector<vector<int>> graph(n);',
+        '  for (const int v : graph[0])',
+        '    ans.push_back(v);',
+        '  for (const auto& [key, value] : count)',
+        '    seen.insert(key);',
+        '  return ans;',
+        '}',
+    ]
+    java_lines = [
+        'public int[] f(int n) {',
+        '  IntList ans = IntList.of(1, 2);',
+        '  List<String> names = new ArrayList<>();',
+        '  IntSet seen = new IntSet();',
+        '  IntIntMap count = new IntIntMap();',
+        '  Map<Integer, Long> sums = new HashMap<>();',
+        '  IntList[] graph = new IntList[n];\n'
+        '\n'
+        '  for (int i = 0; i < n; ++i)\n'
+        '    graph[i] = new IntList();',
+        '  for (final int v : graph[0].toArray())',
+        '    ans.add(v);',
+        '  for (final int key : count.keys()) {\n'
+        '    final int value = count.get(key);',
+        '    seen.add(key);',
+        '  return ans.toArray();',
+        '}',
+    ]
+    self.assertEqual(converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['Primitives.java'])
+    with self.assertRaises(ValueError):
+      cpp2java.CppConverter(profile='unboxed')
+
+  def test_primitive_list_subscripts(self):
+    converter = cpp2java.CppConverter(profile='primitive')
+    cpp_lines = [
+        'vector<int> A{0};',
+        'vector<vector<int>> graph(n);',
+        'A[i] = A[i - 1] + graph[u][A[j]];',
+        'A[i] *= 2;',
+        'for (int i = 1; i < n; ++i) ++A[i];',
+        'graph[u][i]--;',
+        'return A[i];',
+        'ans += A[i]++;',
+    ]
+    java_lines = [
+        'IntList A = IntList.of(0);',
+        'IntList[] graph = new IntList[n];\n'
+        '\n'
+        'for (int i = 0; i < n; ++i)\n'
+        '  graph[i] = new IntList();',
+        'A.set(i, A.get(i - 1) + graph[u].get(A.get(j)));',
+        'A.set(i, A.get(i) * 2);',
+        'for (int i = 1; i < n; ++i) A.set(i, A.get(i) + 1);',
+        'graph[u].set(i, graph[u].get(i) - 1);',
+        'return A.get(i);',
+        # Kept for a human to convert.
+        'ans += A[i]++;',
+    ]
+    self.assertEqual(_convert_lines(converter, cpp_lines),
+                     (java_lines, converter.diagnostics))
+    self.assertEqual([(d.rule, d.line_number) for d in converter.diagnostics],
+                     [('primitive lists', 8)])
+
+  def test_csr(self):
+    converter = cpp2java.CppConverter(csr=True)
+    cpp_lines = [
+        'vector<vector<int>> graph(n);',
+        'for (const auto& [u, v] : edges) {',
+        '  graph[u].push_back(v);',
+        '  graph[v].emplace_back(u);',
+        '}',
+        'for (int u = 0; u < n; ++u)',
+        '  for (const int v : graph[u])',
+        '    sum += v;',
+        'for (int v : graph[0]) {',
+        '  ans = max(ans, (int)graph[v].size());',
+        '}',
+    ]
+    java_lines = [
+        'CsrGraph graph = new CsrGraph(n);',
+        'for (final auto& [u, v] : edges) {',
+        '  graph.addEdge(u, v);',
+        '  graph.addEdge(v, u);',
+        '}',
+        'for (int u = 0; u < n; ++u)',
+        '  for (int vEdge = graph.begin(u); vEdge < graph.end(u); ++vEdge) {\n'
+        '    final int v = graph.target(vEdge);',
+        '    sum += v;\n'
+        '  }',
+        'for (int vEdge = graph.begin(0); vEdge < graph.end(0); ++vEdge) {\n'
+        '  int v = graph.target(vEdge);',
+        '  ans = Math.max(ans, (int)graph.degree(v));',
+        '}',
+    ]
+    self.assertEqual(converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['CsrGraph.java'])
+
+    # Graphs used in any other way keep the usual output.
+    for cpp_lines in (['vector<vector<int>> graph(n);',
+                       'graph[0].push_back(1);',
+                       'dfs(graph, 0);'],
+                      ['vector<vector<int>> graph(n);',
+                       'graph[0].push_back(1);',
+                       'for (const int v : graph[0])',
+                       '  graph[v].push_back(0);'],
+                      # The next iteration adds edges after the read.
+                      ['vector<vector<int>> graph(n);',
+                       'while (cin >> a >> b) {',
+                       '  graph[a].push_back(b);',
+                       '  for (const int v : graph[a])',
+                       '    ++ans;',
+                       '}']):
+      java_lines = cpp2java.CppConverter(csr=True).to_java(cpp_lines)
+      self.assertEqual(java_lines, cpp2java.CppConverter().to_java(cpp_lines))
+      self.assertTrue(java_lines[0].startswith('List<Integer>[] graph'))
+
+    # Nested indices.
+    cpp_lines = [
+        'vector<vector<int>> graph(n);',
+        'for (const vector<int>& edge : edges) {',
+        '  graph[edge[0]].push_back(edge[1]);',
+        '}',
+        'for (const int v : graph[edges[0][0]]) {',
+    ]
+    self.assertEqual(cpp2java.CppConverter(csr=True).to_java(cpp_lines), [
+        'CsrGraph graph = new CsrGraph(n);',
+        'for (int[] edge : edges) {',
+        '  graph.addEdge(edge[0], edge[1]);',
+        '}',
+        'for (int vEdge = graph.begin(edges[0][0]); vEdge < graph.end(edges[0][0]); ++vEdge) {\n'
+        '  final int v = graph.target(vEdge);',
+    ])
+
+  def test_packed_pairs(self):
+    converter = cpp2java.CppConverter(pack_pairs=True)
+    cpp_lines = [
+        'priority_queue<pair<int, int>, vector<pair<int, int>>, greater<>> minHeap;',
+        'priority_queue<pair<int, int>> maxHeap;',
+        'priority_queue<pair<int, long>> pairs;',
+        'queue<pair<int, int>> q{{{src, 0}, {dst, 1}}};',
+        'queue<pair<int, int>> bfs;',
+        'minHeap.emplace(dist[u], u);',
+        'maxHeap.push({f(a, b), c});',
+        'bfs.push(make_pair(i, j));',
+        'const auto [d, u] = minHeap.top();',
+        'minHeap.pop();',
+        'ans += q.front().second + bfs.front().first;',
+        'pairs.emplace(1, 2);',
+    ]
+    java_lines = [
+        'LongHeap minHeap = new LongHeap();',
+        'LongHeap maxHeap = LongHeap.maxHeap();',
+        'Queue<Pair<Integer, Long>> pairs = new PriorityQueue<>(Collections.reverseOrder());',
+        'LongQueue q = LongQueue.of(Pairs.pack(src, 0), Pairs.pack(dst, 1));',
+        'LongQueue bfs = new LongQueue();',
+        'minHeap.add(Pairs.pack(dist[u], u));',
+        'maxHeap.add(Pairs.pack(f(a, b), c));',
+        'bfs.add(Pairs.pack(i, j));',
+        'final int d = Pairs.first(minHeap.peek());\n'
+        'final int u = Pairs.second(minHeap.peek());',
+        'minHeap.poll();',
+        'ans += Pairs.second(q.peek()) + Pairs.first(bfs.peek());',
+        'pairs.add(1, 2);',
+    ]
+    self.assertEqual(converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['PackedPairs.java'])
+    # Off by default.
+    self.assertEqual(self.cpp_converter.to_java(cpp_lines[:1]),
+                     ['Queue<Pair<Integer, Integer>> minHeap = new PriorityQueue<>();'])
+
+  def test_fast_io(self):
+    cpp_lines = [
+        '#include <iostream>',
+        '#include <vector>',
+        'using namespace std;',
+        'int main() {',
+        '  ios::sync_with_stdio(false);',
+        '  cin.tie(nullptr);',
+        '  int n;',
+        '  long long k = 0, sum;',
+        '  cin >> n >> k;',
+        '  vector<int> A(n);',
+        '  for (int i = 0; i < n; ++i)',
+        '    cin >> A[i] >> k;',
+        '  scanf("%d%lld", &n, &A[0]);',
+        '  printf("%lld %.2lf %i\\n", k, 1.0, n);',
+        '  cout << fixed << setprecision(2) << k << " " << head->val << endl;',
+        '  return 0;',
+        '}',
+    ]
+    java_lines = [
+        'import java.util.*;',
+        '',
+        '',
+        'class Main {\n'
+        '  static final FastReader in = new FastReader(System.in);\n'
+        '  static final FastWriter out = new FastWriter(System.out);\n'
+        '\n'
+        '  public static void main(String[] args) {',
+        '',
+        '',
+        '    int n;',
+        '    long k = 0, sum;',
+        '    n = in.nextInt();\n'
+        '    k = in.nextLong();',
+        '    int[] A = new int[n];',
+        '    for (int i = 0; i < n; ++i)',
+        '      { A[i] = in.nextInt(); k = in.nextLong(); }',
+        '    n = in.nextInt();\n'
+        '    A[0] = in.nextInt();',
+        '    out.printf("%d %.2f %d\\n", k, 1.0, n);',
+        '    out.fixed().precision(2).print(k).print(" ").print(head.val).println();',
+        '    return;',
+        '  }\n'
+        '}',
+    ]
+    self.assertEqual(self.cpp_converter.convert(cpp_lines),
+                     (java_lines, self.cpp_converter.diagnostics))
+    self.assertEqual(len(self.cpp_converter.diagnostics), 0)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['FastIO.java'])
+
+    # Unknown types are kept for a human to convert.
+    java_lines, diagnostics = cpp2java.CppConverter().convert(
+        ['int x;', 'cin >> x >> y;', 'cin >> x;'])
+    self.assertEqual(java_lines, ['int x;', 'cin >> x >> y;', 'x = in.nextInt();'])
+    self.assertEqual([d.rule for d in diagnostics], ['cin', 'main'])
+
+    # Without `fixed`, the precision counts significant digits.
+    self.assertEqual(
+        cpp2java.CppConverter().to_java(['cout << setprecision(3) << x;']),
+        ['out.precision(3).print(x);'])
+
+    # A main() in a class isn't wrapped again.
+    self.assertEqual(cpp2java.CppConverter().to_java(
+        ['class Solution {', ' public:', '  int main() {', '  }', '};'])[2:], [
+        '  static final FastReader in = new FastReader(System.in);\n'
+        '  static final FastWriter out = new FastWriter(System.out);\n'
+        '\n'
+        '  public static void main(String[] args) {',
+        '  }',
+        '}',
+    ])
+
+  def test_diagnostics(self):
+    cpp_lines = [
+        'int x;',
+        'ans += q.front(), q.pop();',
+        'for (const auto& [k, v] : count) {',
+        '}',
+    ]
+    java_lines, diagnostics = self.cpp_converter.convert(cpp_lines)
+    # The lines get the generic rewrites rather than being dropped.
+    self.assertEqual(java_lines, [
+        'int x;',
+        'ans += q[0], q.poll();',
+        'for (final auto& [k, v] : count) {',
+        '}',
+    ])
+    self.assertEqual([(d.rule, d.line_number, d.source) for d in diagnostics],
+                     [('peek then pop', 2, cpp_lines[1]),
+                      ('structured binding for loop', 3, cpp_lines[2])])
+    self.assertEqual(diagnostics.counts(),
+                     {'peek then pop': 1, 'structured binding for loop': 1})
+    self.assertEqual(diagnostics.to_json()[0]['severity'], 'warning')
+
+  def test_func_name(self):
+    cpp_lines = [
+        'int x = stoi(s) + stoll(t);',
+        'ans.push_back(to_string(stoi(s)));',
+        'A = move(B);',
+        'seen.remove(x);',
+    ]
+    java_lines = [
+        'int x = Integer.valueOf(s) + Long.valueOf(t);',
+        'ans.add(String.valueOf(Integer.valueOf(s)));',
+        'A = B;',
+        'seen.remove(x);',
     ]
     self.assertEqual(self.cpp_converter.to_java(cpp_lines), java_lines)
 
   def test_accumulate(self):
-    pass
+    converter = cpp2java.CppConverter(profile='primitive')
+    cpp_lines = [
+        'vector<int> A;',
+        'const long long sum = accumulate(begin(A), end(A), 0LL);',
+        'return accumulate(nums.begin(), nums.end(), k) % kMod;',
+        'double mean = accumulate(begin(A), end(A), 0.0) / A.size();',
+        'int m = *max_element(begin(A), end(A));',
+        'return accumulate(begin(A), end(A), 0);',
+    ]
+    java_lines = [
+        'IntList A = new IntList();',
+        'final long sum = Algorithms.sum(A.toArray(), 0L);',
+        'return Algorithms.sum(nums, k) % kMod;',
+        'double mean = Algorithms.sum(A.toArray(), 0.0) / A.size();',
+        'int m = Algorithms.max(A.toArray());',
+        'return Algorithms.sum(A.toArray(), 0);',
+    ]
+    self.assertEqual(converter.to_java(cpp_lines), java_lines)
+    self.assertEqual(support.required_files('\n'.join(java_lines)),
+                     ['Algorithms.java', 'Primitives.java'])
+
+  def test_map_idioms(self):
+    cpp_lines = [
+        'unordered_map<char, int> count;',
+        'map<int, long long> sums;',
+        'unordered_map<int, vector<int>> graph;',
+        'unordered_set<int> seen;',
+        '++count[s[i]];',
+        'count[c]--;',
+        'count[c] -= a + b;',
+        'sums[x] += y;',
+        'if (--count[c] == 0)',
+        'ans += count[c] * sums[x];',
+        'count[c] = count[d] + 1;',
+        'if (count.count(c) && seen.count(c))',
+        'if (count.find(c) == count.end() || seen.find(x) != seen.end())',
+        'graph[u].push_back(v);',
+    ]
+    java_lines = [
+        'Map<Character, Integer> count = new HashMap<>();',
+        'TreeMap<Integer, Long> sums = new TreeMap<>();',
+        'Map<Integer, List<Integer>> graph = new HashMap<>();',
+        'Set<Integer> seen = new HashSet<>();',
+        'count.merge(s[i], 1, Integer::sum);',
+        'count.merge(c, -1, Integer::sum);',
+        'count.merge(c, -(a + b), Integer::sum);',
+        'sums.merge(x, (long) y, Long::sum);',
+        'if (count.merge(c, -1, Integer::sum) == 0)',
+        'ans += count.getOrDefault(c, 0) * sums.getOrDefault(x, 0L);',
+        'count.put(c, count.getOrDefault(d, 0) + 1);',
+        'if (count.containsKey(c) && seen.contains(c))',
+        'if (!count.containsKey(c) || seen.contains(x))',
+        'graph.computeIfAbsent(u, absentKey -> new ArrayList<>()).add(v);',
+    ]
+    self.assertEqual(_convert_lines(self.cpp_converter, cpp_lines),
+                     (java_lines, self.cpp_converter.diagnostics))
+    self.assertEqual(len(self.cpp_converter.diagnostics), 0)
+
+    converter = cpp2java.CppConverter(profile='primitive')
+    self.assertEqual(
+        _convert_lines(converter, ['unordered_map<int, int> count;', 'count[x]++;',
+                                   'ans = count[x];', 'count[x] *= k;'])[0],
+        ['IntIntMap count = new IntIntMap();',
+         'count.merge(x, 1, Integer::sum);', 'ans = count.get(x);',
+         'count.put(x, count.get(x) * k);'])
+
+  def test_map_assignments(self):
+    cpp_lines = [
+        'unordered_map<int, int> count;',
+        'unordered_map<int, long long> masks;',
+        'unordered_map<int, string> names;',
+        'count[x] *= 2;',
+        'count[x] /= k + 1;',
+        'masks[x] |= mask;',
+        'ans += count[x]++;',
+        'for (int i = 0; i < n; ++i) count[A[i]]++;',
+        'names[x] += "a";',
+        'count[a] = count[b] = 0;',
+        'return count[k] = v;',
+    ]
+    java_lines, diagnostics = _convert_lines(self.cpp_converter, cpp_lines)
+    self.assertEqual(java_lines, [
+        'Map<Integer, Integer> count = new HashMap<>();',
+        'Map<Integer, Long> masks = new HashMap<>();',
+        'Map<Integer, String> names = new HashMap<>();',
+        'count.compute(x, (mapKey, oldValue) -> oldValue == null ? 0 : oldValue * 2);',
+        'count.put(x, count.getOrDefault(x, 0) / (k + 1));',
+        'masks.merge(x, (long) mask, (oldValue, operand) -> oldValue | operand);',
+        'ans += (count.merge(x, 1, Integer::sum) - 1);',
+        'for (int i = 0; i < n; ++i) count.merge(A[i], 1, Integer::sum);',
+        'names.merge(x, "a", String::concat);',
+        # Assignments in expressions are kept for a human to convert.
+        'count[a] = count[b] = 0;',
+        'return count[k] = v;',
+    ])
+    self.assertEqual([(d.rule, d.line_number) for d in diagnostics],
+                     [('map idioms', 10), ('map idioms', 11)])
 
   def test_emplace_back(self):
     pass
 
 
+class RuleSetTestCase(unittest.TestCase):
+  def test_candidates_are_indexed_by_leading_keyword(self):
+    names = [r.name for r in cpp2java._RULES.candidates('  vector<int> A;')]
+    self.assertIn('vector', names)
+    self.assertNotIn('sort', names)
+    self.assertNotIn('map', names)
+
+  def test_unkeyed_line_skips_keyed_rules(self):
+    names = [r.name for r in cpp2java._RULES.candidates('  x = y;')]
+    self.assertNotIn('vector', names)
+    self.assertIn('replaced_end', names)
+
+  def test_required_substrings_and_fall_through(self):
+    rule_set = rules.RuleSet([
+        rules.rule('never', r'^x$', lambda *args: None, required=('x',)),
+        rules.rule('upper', r'^(\w+)$', lambda c, line, n, m: m.group(1).upper()),
+    ])
+    self.assertEqual(rule_set.apply(None, 'x', 1), 'X')
+    self.assertEqual(rule_set.apply(None, 'abc', 1), 'ABC')
+    self.assertEqual(rule_set.apply(None, 'a b', 1), 'a b')
+
+
+class CppTypesTestCase(unittest.TestCase):
+  def test_to_java_type(self):
+    self.assertEqual(cpptypes.to_java_type('const vector<int>&'), 'int[]')
+    self.assertEqual(cpptypes.to_java_type('vector<vector<vector<vector<char>>>>'),
+                     'char[][][][]')
+    self.assertEqual(cpptypes.to_java_type('const long long'), 'final long')
+    self.assertEqual(cpptypes.to_java_type('std::string&'), 'String')
+    self.assertEqual(cpptypes.to_java_type('unordered_map<int, pair<int, int>>'),
+                     'Map<Integer, Pair<Integer, Integer>>')
+    self.assertEqual(cpptypes.to_java_type('TreeNode*'), 'TreeNode')
+    self.assertEqual(cpptypes.to_java_type('Integer'), 'int')
+    self.assertEqual(cpptypes.to_java_type('vector<int>::iterator'),
+                     'vector<int>::iterator')
+
+  def test_to_object_type(self):
+    self.assertEqual(cpptypes.to_object_type('pair<pair<int, int>, char>'),
+                     'Pair<Pair<Integer, Integer>, Character>')
+    self.assertEqual(cpptypes.to_object_type('vector<int>'), 'int[]')
+    self.assertEqual(cpptypes.to_object_type('double'), 'Double')
+    self.assertEqual(
+        cpptypes.to_object_type('priority_queue<int, vector<int>, greater<>>'),
+        'Queue<Integer>')
+    self.assertEqual(cpptypes.to_object_type('int[]'), '???')
+
+  def test_types_are_interned(self):
+    self.assertIs(cpptypes.parse('vector<pair<int, long long>>'),
+                  cpptypes.parse('std::vector<std::pair<int, long>>&'))
+    self.assertIs(cpptypes.parse('pair<int, int>').args[0],
+                  cpptypes.parse('int'))
+
+
+class SymbolTableTestCase(unittest.TestCase):
+  def test_shadowing(self):
+    table = symbols.SymbolTable()
+    table['x'] = 'int'
+    table.push()
+    table['x'] = 'String'
+    table['y'] = 'long'
+    self.assertEqual(table['x'], 'String')
+    table.pop()
+    self.assertEqual(table['x'], 'int')
+    self.assertIsNone(table.get('y'))
+    self.assertEqual(len(table), 1)
+
+  def test_unbalanced_pop_is_ignored(self):
+    table = symbols.SymbolTable()
+    table['x'] = 'int'
+    table.pop()
+    self.assertEqual(table.depth, 0)
+    self.assertEqual(table['x'], 'int')
+
+  def test_scope_size_is_bounded(self):
+    table = symbols.SymbolTable(max_scope_size=2)
+    table['x'] = 'int'
+    table.push()
+    for name in ('a', 'b', 'x'):
+      table[name] = 'long'
+    self.assertNotIn('a', table)
+    self.assertEqual(table['x'], 'long')
+    table.pop()
+    self.assertEqual(table['x'], 'int')
+    self.assertEqual(len(table), 1)
+
+
+class LexerTestCase(unittest.TestCase):
+  def test_tokenize(self):
+    tokens = lexer.Lexer().tokenize('x->y = 1\'000 + \'a\'; // "s"')
+    self.assertEqual([(token.kind, token.text) for token in tokens], [
+        ('identifier', 'x'), ('punct', '->'), ('identifier', 'y'),
+        ('space', ' '), ('punct', '='), ('space', ' '),
+        ('number', "1'000"), ('space', ' '), ('punct', '+'), ('space', ' '),
+        ('char', "'a'"), ('punct', ';'), ('space', ' '),
+        ('comment', '// "s"'),
+    ])
+
+  def test_string_with_escapes(self):
+    tokens = lexer.Lexer().tokenize('"a\\"b" + 0x1F\'FFu')
+    self.assertEqual([(token.kind, token.text) for token in tokens], [
+        ('string', r'"a\"b"'), ('space', ' '), ('punct', '+'), ('space', ' '),
+        ('number', "0x1F'FFu"),
+    ])
+
+  def test_block_comment_spanning_lines(self):
+    lex = lexer.Lexer()
+    self.assertEqual(lex.tokenize('a /* b')[-1], lexer.Token('comment', '/* b'))
+    self.assertEqual(lex.tokenize('c */ d'),
+                     [lexer.Token('comment', 'c */'), lexer.Token('space', ' '),
+                      lexer.Token('identifier', 'd')])
+    self.assertFalse(lex.in_block_comment)
+
+  def test_round_trip(self):
+    line = 'auto [a, b] = f(R"x", L\'c\', 1.5e-3f) >>= 2; /* c */ //d\n'
+    self.assertEqual(''.join(token.text for token in lexer.Lexer().tokenize(line)),
+                     line)
+
+
+class StatementAssemblerTestCase(unittest.TestCase):
+  def statements(self, lines, max_lines=32):
+    assembler = statements.StatementAssembler(max_lines)
+    return list(assembler.statements(lines))
+
+  def test_joins_open_brackets_and_initializer_braces(self):
+    lines = ['f(a,', '  g[b', '  ]);', 'vector<int> A{1,', '  2};', 'x = {',
+             '};']
+    self.assertEqual(self.statements(lines), [
+        (1, ['f(a,', '  g[b', '  ]);']),
+        (4, ['vector<int> A{1,', '  2};']),
+        (6, ['x = {', '};']),
+    ])
+
+  def test_block_braces_dont_join(self):
+    lines = ['if (x) {', '} else{', 'struct T {', '"(" + s;  // (']
+    self.assertEqual(self.statements(lines),
+                     [(i + 1, [line]) for i, line in enumerate(lines)])
+
+  def test_bounded_buffer(self):
+    lines = ['f(', 'a,', 'b,', 'c);']
+    self.assertEqual(self.statements(lines, max_lines=3),
+                     [(1, ['f(']), (2, ['a,']), (3, ['b,']), (4, ['c);'])])
+
+  def test_join_and_rewrap(self):
+    lines = ['x = f(\n', '    a,\n', '    b);\n']
+    self.assertEqual(statements.join(lines), 'x = f(a, b);\n')
+    self.assertEqual(statements.rewrap('x = f(a, b);\n', lines), ''.join(lines))
+    self.assertEqual(statements.rewrap('x = Math.f(a, b);\n', lines),
+                     'x = Math.f(\n    a,\n    b);\n')
+
+
+class RuleStatsTestCase(unittest.TestCase):
+  def test_records_attempts_and_hits(self):
+    stats = rules.RuleStats()
+    converter = cpp2java.CppConverter(stats=stats)
+    self.assertEqual(converter.to_java(['vector<int> A;', 'vector<int> A(n);',
+                                        'x = y;']),
+                     ['List<Integer> A = new ArrayList<>();',
+                      'int[] A = new int[n];',
+                      'x = y;'])
+    counters = stats.to_json()
+    self.assertEqual(counters['vector']['attempts'], 2)
+    self.assertEqual(counters['vector']['hits'], 1)
+    self.assertEqual(counters['vector with size']['hits'], 1)
+    self.assertEqual(counters['replaced_end']['attempts'], 1)
+    self.assertEqual(counters['replaced_end']['hits'], 0)
+    self.assertNotIn('sort', counters)
+
+  def test_merge_and_table(self):
+    stats = rules.RuleStats()
+    stats.record('vector', True, 0.5)
+    other = rules.RuleStats()
+    other.record('vector', False, 0.25)
+    stats.merge(other)
+    self.assertEqual(stats.to_json(),
+                     {'vector': {'attempts': 2, 'hits': 1, 'seconds': 0.75}})
+    self.assertIn('vector', stats.format_table().splitlines()[1])
+
+
+class CallRewriterTestCase(unittest.TestCase):
+  def test_rebuilds_when_table_changes(self):
+    table = rules.VersionedDict({'stoi': 'Integer.valueOf'})
+    rewriter = rules.CallRewriter(lambda: table)
+    self.assertEqual(rewriter.sub('stoi(s) + stod(t)'),
+                     'Integer.valueOf(s) + stod(t)')
+    table['stod'] = 'Double.valueOf'
+    self.assertEqual(rewriter.sub('stoi(s) + stod(t)'),
+                     'Integer.valueOf(s) + Double.valueOf(t)')
+    del table['stoi']
+    self.assertEqual(rewriter.sub('stoi(s)'), 'stoi(s)')
+
+  def test_plain_dict_table(self):
+    table = {'move': ''}
+    rewriter = rules.CallRewriter(lambda: table)
+    self.assertEqual(rewriter.sub('f(move(A))'), 'f(A)')
+    table['move'] = 'copy'
+    self.assertEqual(rewriter.sub('f(move(A))'), 'f(copy(A))')
+
+
+class ReplacerTestCase(unittest.TestCase):
+  def setUp(self) -> None:
+    self.table = rules.VersionedDict({
+        'const': 'final',
+        'const string& ': 'final String ',
+        'LONG_MIN': 'Long.MIN_VALUE',
+        'LLONG_MIN': 'Long.MIN_VALUE',
+        'min(': 'Math.min(',
+    })
+    self.replacer = rules.Replacer(lambda: self.table)
+
+  def test_leftmost_longest(self):
+    self.assertEqual(self.replacer.sub('const string& s = LLONG_MIN;'),
+                     'final String s = Long.MIN_VALUE;')
+
+  def test_identifier_boundaries(self):
+    self.assertEqual(self.replacer.sub('constant = A.min(x) + min(a, b);'),
+                     'constant = A.min(x) + Math.min(a, b);')
+
+  def test_sequential_compatibility_mode(self):
+    self.assertEqual(self.replacer.sub_sequentially('x = LLONG_MIN;'),
+                     'x = LLong.MIN_VALUE;')
+
+  def test_rebuilds_when_table_changes(self):
+    self.table['nullptr'] = 'null'
+    self.assertEqual(self.replacer.sub('p = nullptr;'), 'p = null;')
+
+
+class CliTestCase(unittest.TestCase):
+  def setUp(self) -> None:
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.dir = self.tmp_dir.name
+    os.mkdir(os.path.join(self.dir, 'sub'))
+    for path in ['a.cpp', 'sub/b.cpp', 'sub/c.cpp']:
+      with open(os.path.join(self.dir, path), 'w', encoding='utf-8') as f:
+        f.write('vector<int> A;\n')
+
+  def tearDown(self) -> None:
+    self.tmp_dir.cleanup()
+
+  def run_main(self, *argv: str) -> int:
+    with contextlib.redirect_stdout(io.StringIO()) as self.stdout, \
+            contextlib.redirect_stderr(io.StringIO()) as self.stderr:
+      return cpp2java.main(list(argv))
+
+  def read(self, path: str) -> str:
+    with open(os.path.join(self.dir, path), encoding='utf-8') as f:
+      return f.read()
+
+  def test_directory_in_parallel(self):
+    self.assertEqual(self.run_main(self.dir, '--jobs', '2'), 0)
+    for path in ['a.java', 'sub/b.java', 'sub/c.java']:
+      self.assertEqual(self.read(path),
+                       'List<Integer> A = new ArrayList<>();\n')
+    progress = self.stdout.getvalue().splitlines()
+    self.assertEqual([line.split(' ')[0] for line in progress],
+                     ['[1/3]', '[2/3]', '[3/3]'])
+    self.assertTrue(progress[2].endswith(os.path.join('sub', 'c.java')))
+
+  def test_glob_and_file_list(self):
+    list_path = os.path.join(self.dir, 'files.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+      f.write(os.path.join(self.dir, 'a.cpp') + '\n')
+    pattern = os.path.join(self.dir, 'sub', '*.cpp')
+    self.assertEqual(self.run_main('-j', '1', pattern, '@' + list_path), 0)
+    self.assertTrue(os.path.exists(os.path.join(self.dir, 'a.java')))
+    self.assertTrue(os.path.exists(os.path.join(self.dir, 'sub', 'b.java')))
+
+  def test_only_cpp_files_are_converted(self):
+    for path in ['util.h', 'sub/d.java']:
+      with open(os.path.join(self.dir, path), 'w', encoding='utf-8') as f:
+        f.write('int x;\n')
+    self.assertEqual(self.run_main('-j', '1', os.path.join(self.dir, '*'),
+                                   os.path.join(self.dir, 'sub', '*')), 0)
+    self.assertEqual(self.read('util.h'), 'int x;\n')
+    self.assertEqual(self.read('sub/d.java'), 'int x;\n')
+    self.assertTrue(os.path.exists(os.path.join(self.dir, 'a.java')))
+    self.assertFalse(os.path.exists(os.path.join(self.dir, 'util.java')))
+    # A file named explicitly isn't overwritten either.
+    self.assertEqual(self.run_main(os.path.join(self.dir, 'sub', 'd.java')), -1)
+    self.assertEqual(self.read('sub/d.java'), 'int x;\n')
+    self.assertEqual(files.java_filename('dir.cpp/a.cpp'), 'dir.cpp/a.java')
+
+  def test_error_summary(self):
+    with open(os.path.join(self.dir, 'sub', 'bad.cpp'), 'wb') as f:
+      f.write(b'\xff\xfe\n')
+    self.assertEqual(self.run_main(self.dir, '-j', '2'), 1)
+    self.assertIn('1 of 4 files failed', self.stderr.getvalue())
+    self.assertIn('bad.cpp: UnicodeDecodeError', self.stderr.getvalue())
+    self.assertTrue(os.path.exists(os.path.join(self.dir, 'sub', 'c.java')))
+
+  def test_cache(self):
+    cache_dir = os.path.join(self.dir, 'cache')
+    for path in ['sub/b.cpp', 'sub/c.cpp']:
+      with open(os.path.join(self.dir, path), 'w', encoding='utf-8') as f:
+        f.write(f'vector<int> {path[4]};\n')
+    self.assertEqual(self.run_main(self.dir, '-j', '1', '--cache-dir', cache_dir), 0)
+    self.assertNotIn('(cached)', self.stdout.getvalue())
+
+    with open(os.path.join(self.dir, 'a.cpp'), 'w', encoding='utf-8') as f:
+      f.write('vector<int> B;\n')
+    self.assertEqual(self.run_main(self.dir, '-j', '1', '--cache-dir', cache_dir), 0)
+    progress = self.stdout.getvalue().splitlines()
+    self.assertNotIn('(cached)', progress[0])
+    self.assertIn('(cached)', progress[1])
+    self.assertEqual(self.read('a.java'), 'List<Integer> B = new ArrayList<>();\n')
+    self.assertEqual(self.read('sub/b.java'), 'List<Integer> b = new ArrayList<>();\n')
+
+    # Changing the rule tables invalidates every entry.
+    keywords.replaced_end['ArrayList'] = 'ArrayList'
+    try:
+      self.assertEqual(self.run_main(self.dir, '-j', '1', '--cache-dir', cache_dir), 0)
+    finally:
+      del keywords.replaced_end['ArrayList']
+    self.assertNotIn('(cached)', self.stdout.getvalue())
+
+  def test_cache_eviction(self):
+    cache = ConversionCache(os.path.join(self.dir, 'cache'), 'v1', max_bytes=10)
+    for i, source in enumerate([b'a', b'b', b'c']):
+      cache.put(cache.key(source), '0123456')
+      os.utime(cache._path(cache.key(source)), (i, i))
+    self.assertEqual(cache.evict(), 2)
+    self.assertIsNone(cache.get(cache.key(b'a')))
+    self.assertEqual(cache.get(cache.key(b'c')), '0123456')
+    other_version = ConversionCache(cache.directory, 'v2')
+    self.assertIsNone(other_version.get(other_version.key(b'c')))
+
+  def test_stats_json(self):
+    stats_path = os.path.join(self.dir, 'stats.json')
+    self.assertEqual(self.run_main(self.dir, '-j', '2', '--stats-json', stats_path), 0)
+    with open(stats_path, encoding='utf-8') as f:
+      self.assertEqual(json.load(f)['vector']['hits'], 3)
+
+  def test_stdin_to_stdout(self):
+    stdin = io.StringIO('vector<int> A;\npublic:\nint x = stoi(s);')
+    with unittest.mock.patch('sys.stdin', stdin):
+      self.assertEqual(self.run_main('-'), 0)
+    self.assertEqual(self.stdout.getvalue(),
+                     'List<Integer> A = new ArrayList<>();\n'
+                     'int x = Integer.valueOf(s);\n')
+
+  def test_missing_path(self):
+    self.assertEqual(self.run_main(os.path.join(self.dir, 'missing.cpp')), -1)
+
+  def test_primitive_profile_copies_support_file(self):
+    self.assertEqual(self.run_main(self.dir, '-j', '1'), 0)
+    self.assertFalse(os.path.exists(os.path.join(self.dir, 'Primitives.java')))
+    self.assertEqual(self.run_main(self.dir, '-j', '1', '--profile', 'primitive'), 0)
+    self.assertEqual(self.read('sub/b.java'), 'IntList A = new IntList();\n')
+    with open(os.path.join(support.SUPPORT_DIR, 'Primitives.java'),
+              encoding='utf-8') as f:
+      self.assertEqual(self.read('sub/Primitives.java'), f.read())
+    self.assertTrue(os.path.exists(os.path.join(self.dir, 'Primitives.java')))
+
+  def test_diagnostics_json(self):
+    with open(os.path.join(self.dir, 'sub', 'b.cpp'), 'w', encoding='utf-8') as f:
+      f.write('vector<int> A;\nx = q.top(), q.pop();\n')
+    diagnostics_path = os.path.join(self.dir, 'diagnostics.json')
+    self.assertEqual(
+        self.run_main(self.dir, '-j', '2', '--diagnostics-json', diagnostics_path), 0)
+    b_path = os.path.join(self.dir, 'sub', 'b.cpp')
+    self.assertIn(f'{b_path}:2: warning: ', self.stderr.getvalue())
+    self.assertEqual(self.read('sub/b.java'),
+                     'List<Integer> A = new ArrayList<>();\n'
+                     'x = q.peek(), q.poll();\n')
+    with open(diagnostics_path, encoding='utf-8') as f:
+      report = json.load(f)
+    self.assertEqual(report['counts'], {'peek then pop': 1})
+    self.assertEqual(report['diagnostics'][0]['file'], b_path)
+    self.assertEqual(report['diagnostics'][0]['line_number'], 2)
+
+  def test_unchanged_output_is_not_rewritten(self):
+    java_path = os.path.join(self.dir, 'a.java')
+    self.assertEqual(self.run_main(self.dir, '-j', '1'), 0)
+    os.chmod(java_path, 0o600)
+    os.utime(java_path, (0, 0))
+    self.assertEqual(self.run_main(self.dir, '-j', '1'), 0)
+    self.assertIn('(unchanged)', self.stdout.getvalue())
+    self.assertEqual(os.stat(java_path).st_mtime, 0)
+
+    with open(os.path.join(self.dir, 'a.cpp'), 'w', encoding='utf-8') as f:
+      f.write('vector<int> B;\n')
+    self.assertEqual(self.run_main(self.dir, '-j', '1'), 0)
+    self.assertNotIn('(unchanged)', self.stdout.getvalue().splitlines()[0])
+    self.assertEqual(self.read('a.java'), 'List<Integer> B = new ArrayList<>();\n')
+    self.assertEqual(os.stat(java_path).st_mode & 0o777, 0o600)
+    self.assertEqual(sorted(os.listdir(self.dir)),
+                     ['a.cpp', 'a.java', 'sub'])
+
+
+class WatchTestCase(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.dir = os.path.realpath(self.tmp_dir.name)
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def write(self, *parts: str) -> str:
+    path = os.path.join(self.dir, *parts)
+    with open(path, 'w') as f:
+      f.write('vector<int> A;\n')
+    return path
+
+  def check_watcher(self, watcher: watch._Watcher) -> None:
+    try:
+      self.assertEqual(watcher.read(0), set())
+      a = self.write('a.cpp')
+      self.write('a.java')
+      self.assertEqual(next(watch.watch(watcher, debounce=0.05)), [a])
+      os.mkdir(os.path.join(self.dir, 'sub'))
+      b = self.write('sub', 'b.cpp')
+      c = self.write('sub', 'c.cpp')
+      self.assertEqual(next(watch.watch(watcher, debounce=0.05)), [b, c])
+    finally:
+      watcher.close()
+
+  def test_inotify_watcher(self):
+    try:
+      watcher = watch.InotifyWatcher([self.dir], [])
+    except OSError:
+      self.skipTest('inotify is not available')
+    self.check_watcher(watcher)
+
+  def test_polling_watcher(self):
+    self.check_watcher(watch.PollingWatcher([self.dir], [], interval=0.01))
+
+  def test_watched_file(self):
+    a = self.write('a.cpp')
+    self.write('b.cpp')
+    watcher = watch.create_watcher([], [a])
+    try:
+      self.write('b.cpp')
+      self.assertEqual(watcher.read(0.05), set())
+      os.utime(a, ns=(0, 0))
+      self.write('a.cpp')
+      self.assertEqual(watcher.read(1.0), {a})
+    finally:
+      watcher.close()
+
+
+class ServerTestCase(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.socket_path = os.path.join(self.tmp_dir.name, 'cpp2java.sock')
+    self.loop = asyncio.new_event_loop()
+    self.server = self.loop.run_until_complete(server.start(self.socket_path))
+    self.thread = threading.Thread(target=self.loop.run_forever)
+    self.thread.start()
+
+  def tearDown(self):
+    self.loop.call_soon_threadsafe(self.loop.stop)
+    self.thread.join()
+    self.server.close()
+    self.loop.run_until_complete(self.server.wait_closed())
+    self.loop.close()
+    self.tmp_dir.cleanup()
+
+  def test_convert(self):
+    source = 'vector<int> A(n);\r\nint m = A.size();\r\n'
+    with Client(self.socket_path) as client:
+      self.assertEqual(client.convert(source), cpp2java.convert_source(source))
+      self.assertEqual(client.convert(''), '')
+      java, diagnostics = client.convert_with_diagnostics('q.top(), q.pop();')
+      self.assertEqual(java, 'q.peek(), q.poll();\n')
+      self.assertEqual([d['rule'] for d in diagnostics], ['peek then pop'])
+
+  def test_options(self):
+    source = 'vector<int> A;\n'
+    with Client(self.socket_path) as client:
+      self.assertEqual(client.convert(source, {'profile': 'primitive'}),
+                       'IntList A = new IntList();\n')
+      self.assertEqual(client.convert(source), 'List<Integer> A = new ArrayList<>();\n')
+      with self.assertRaisesRegex(ServerError, "unknown option 'jobs'"):
+        client.convert(source, {'jobs': 2})
+      with self.assertRaisesRegex(ServerError, 'ValueError'):
+        client.convert(source, {'profile': 'unboxed'})
+
+  def test_concurrent_clients(self):
+    with Client(self.socket_path) as a, Client(self.socket_path) as b:
+      self.assertEqual(a.convert('vector<int> A;'),
+                       'List<Integer> A = new ArrayList<>();\n')
+      self.assertEqual(b.convert('string s;'),
+                       'StringBuilder s = new StringBuilder();\n')
+
+  def test_bad_request(self):
+    self.assertEqual(server.handle_request({'id': 7}),
+                     {'id': 7, 'error': "missing 'source'"})
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+      sock.connect(self.socket_path)
+      sock.sendall(b'not json\n{"id": 1}\n')
+      with sock.makefile('rb') as reader:
+        self.assertIn('bad request', json.loads(reader.readline())['error'])
+        self.assertEqual(json.loads(reader.readline()),
+                         {'id': 1, 'error': "missing 'source'"})
+
+  def test_refuses_to_steal_socket(self):
+    with self.assertRaises(OSError):
+      asyncio.run(server.start(self.socket_path))
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,227 @@
+import functools
+import re
+import weakref
+from typing import List, Optional, Pattern, Tuple
+
+# Max number of type strings whose parses and renderings are cached.
+CACHE_SIZE = 4096
+
+# C++ type -> (Java primitive type, Java boxed type).
+_SCALARS = {
+    'bool': ('boolean', 'Boolean'),
+    'char': ('char', 'Character'),
+    'short': ('short', 'Short'),
+    'int': ('int', 'Integer'),
+    'long': ('long', 'Long'),
+    'float': ('float', 'Float'),
+    'double': ('double', 'Double'),
+    'string': ('String', 'String'),
+}
+# Other spellings of the scalar types, including the Java ones, so a type
+# that was already converted (e.g. 'Integer' in 'List<Pair<Integer, Long>>')
+# parses to the same type as its C++ original.
+_ALIASES = {
+    'long long': 'long',
+    'long int': 'long',
+    'long long int': 'long',
+    'unsigned': 'int',
+    'unsigned int': 'int',
+    'unsigned long': 'long',
+    'unsigned long long': 'long',
+    'boolean': 'bool',
+    'Boolean': 'bool',
+    'Character': 'char',
+    'Short': 'short',
+    'Integer': 'int',
+    'Long': 'long',
+    'Float': 'float',
+    'Double': 'double',
+    'String': 'string',
+    'Pair': 'pair',
+}
+# C++ template -> (Java generic type, number of type arguments kept), e.g.
+# the container and comparator of a priority_queue are dropped.
+_GENERICS = {
+    'pair': ('Pair', 2),
+    'unordered_map': ('Map', 2),
+    'map': ('TreeMap', 2),
+    'unordered_set': ('Set', 1),
+    'set': ('Set', 1),
+    'deque': ('Deque', 1),
+    'stack': ('Deque', 1),
+    'queue': ('Queue', 1),
+    'priority_queue': ('Queue', 1),
+}
+
+_TOKEN: Pattern[str] = re.compile(r'\s*(\w+|::|&&|[<>,*&])')
+
+
+class CppType:
+  """A parsed C++ type, e.g. `const vector<pair<int, long long>>&`.
+
+  References, pointers and `std::` are dropped while parsing, since Java has
+  none of them. Types are interned: equal types are the same object, so the
+  nodes of nested types are shared and every node computes its Java
+  renderings at most once.
+  """
+
+  __slots__ = ('name', 'args', 'is_const', '_java_type', '_object_type',
+               '__weakref__')
+
+  def __init__(self, name: str, args: Tuple['CppType', ...], is_const: bool):
+    self.name = name
+    self.args = args
+    self.is_const = is_const
+    self._java_type: Optional[str] = None
+    self._object_type: Optional[str] = None
+
+  def __repr__(self) -> str:
+    return f'CppType({str(self)!r})'
+
+  def __str__(self) -> str:
+    const = 'const ' if self.is_const else ''
+    if not self.args:
+      return const + self.name
+    return f"{const}{self.name}<{', '.join(map(str, self.args))}>"
+
+  @property
+  def java_type(self) -> str:
+    """ -const vector<vector<int>>&
+        +int[][]
+
+        -const long long
+        +final long
+    """
+    if self._java_type is None:
+      self._java_type = self._to_java_type()
+    return self._java_type
+
+  @property
+  def object_type(self) -> str:
+    """ -pair<pair<int, int>, char>
+        +Pair<Pair<Integer, Integer>, Character>
+    """
+    if self._object_type is None:
+      self._object_type = self._to_object_type()
+    return self._object_type
+
+  def _to_java_type(self) -> str:
+    if self.name in _SCALARS:
+      java_type = _SCALARS[self.name][0]
+      return f'final {java_type}' if self.is_const else java_type
+    if self.name == 'vector' and len(self.args) == 1:
+      return f'{self.args[0].java_type}[]'
+    return self._to_generic_type()
+
+  def _to_object_type(self) -> str:
+    if self.name in _SCALARS:
+      return _SCALARS[self.name][1]
+    if self.name == 'vector' and len(self.args) == 1:
+      return f'{self.args[0].java_type}[]'
+    if not self.args and not self.name.isidentifier():
+      return '???'  # Unparsable.
+    return self._to_generic_type()
+
+  def _to_generic_type(self) -> str:
+    if not self.args:
+      return self.name
+    java_name, num_args = _GENERICS.get(self.name, (self.name, len(self.args)))
+    object_args = ', '.join(arg.object_type for arg in self.args[:num_args])
+    return f'{java_name}<{object_args}>'
+
+
+_interned: 'weakref.WeakValueDictionary[Tuple, CppType]' = \
+    weakref.WeakValueDictionary()
+
+
+def _intern(name: str, args: Tuple[CppType, ...], is_const: bool) -> CppType:
+  key = (name, args, is_const)
+  cpp_type = _interned.get(key)
+  if cpp_type is None:
+    cpp_type = _interned[key] = CppType(name, args, is_const)
+  return cpp_type
+
+
+class _Parser:
+  # Recursive descent over the tokens of a type, e.g.
+  # ['const', 'vector', '<', 'int', '>', '&'].
+
+  def __init__(self, tokens: List[str]):
+    self._tokens = tokens
+    self._i = 0
+
+  def _peek(self) -> str:
+    return self._tokens[self._i] if self._i < len(self._tokens) else ''
+
+  def parse(self) -> Optional[CppType]:
+    cpp_type = self._parse_type()
+    return cpp_type if self._i == len(self._tokens) else None
+
+  def _parse_type(self) -> Optional[CppType]:
+    is_const = False
+    words: List[str] = []
+    args: List[CppType] = []
+    while True:
+      token = self._peek()
+      if token == 'const':
+        is_const = True
+      elif token == 'std' and self._tokens[self._i + 1:self._i + 2] == ['::']:
+        self._i += 1
+      elif token in ('*', '&', '&&'):
+        if not words:
+          return None
+      elif token == '<':
+        if not words or args:
+          return None
+        self._i += 1
+        if self._peek() != '>':
+          while True:
+            arg = self._parse_type()
+            if arg is None:
+              return None
+            args.append(arg)
+            if self._peek() != ',':
+              break
+            self._i += 1
+        if self._peek() != '>':
+          return None
+      elif token.isidentifier() and not args:
+        words.append(token)
+      else:
+        break
+      self._i += 1
+    if not words:
+      return None
+    name = ' '.join(words)
+    return _intern(_ALIASES.get(name, name), tuple(args), is_const)
+
+
+def _tokenize(cpp_type: str) -> Optional[List[str]]:
+  tokens: List[str] = []
+  pos = 0
+  end = len(cpp_type.rstrip())
+  while pos < end:
+    match = _TOKEN.match(cpp_type, pos)
+    if not match:
+      return None
+    tokens.append(match.group(1))
+    pos = match.end()
+  return tokens
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse(cpp_type: str) -> CppType:
+  # Types that can't be parsed are kept verbatim as the type's name.
+  tokens = _tokenize(cpp_type)
+  parsed = _Parser(tokens).parse() if tokens else None
+  return parsed or _intern(cpp_type.strip(), (), False)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_java_type(cpp_type: str) -> str:
+  return parse(cpp_type).java_type
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_object_type(cpp_type: str) -> str:
+  return parse(cpp_type).object_type
@@ -0,0 +1,100 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Plans which adjacency lists can be emitted as support/CsrGraph.java, i.e. in
+# compressed sparse row form: the targets of all vertices in one int[], and
+# the offsets of each vertex's targets in another.
+#
+# A graph qualifies if, in the scope of its declaration, every statement
+# mentioning it is one of
+#
+#   graph[u].push_back(v);               // edges, all before the first read
+#                                        // and outside of its loop or block
+#   for (const int v : graph[u]) { ...   // reads
+#   ... graph[u].size() ...
+#
+# Anything else, e.g. passing the graph to a function, falls back to the
+# usual List<Integer>[].
+
+_DECLARATION = re.compile(r'^(\s*)vector<vector<int>> (\w+)\(.+\);$')
+# An index allowing one level of nested brackets, e.g. '[edge[0]]'.
+_INDEX = r'\[(?:[^\[\]]|\[[^\[\]]*\])+\]'
+_BLOCK_HEADER = re.compile(r'^\s*(?:for|while|if|do|switch|else)\b')
+
+
+class CsrPlan(NamedTuple):
+  # Line numbers of the declarations of the graphs to emit as CSR.
+  graphs: Set[int]
+  # Line number of the body of a read loop without braces -> the indentation
+  # of the brace closing it, since the loop's body gets a declaration.
+  closing_braces: Dict[int, str]
+
+
+def plan(statements: List[Tuple[int, str]]) -> CsrPlan:
+  # `statements` are the (line number, text) of the logical statements of the
+  # whole input, see `statements.StatementAssembler`.
+  graphs: Set[int] = set()
+  closing_braces: Dict[int, str] = {}
+  for i, (line_number, text) in enumerate(statements):
+    match = _DECLARATION.match(text)
+    if not match:
+      continue
+    braces = _plan_graph(match.group(2), statements, i + 1)
+    if braces is not None:
+      graphs.add(line_number)
+      closing_braces.update(braces)
+  return CsrPlan(graphs, closing_braces)
+
+
+def _plan_graph(name: str, statements: List[Tuple[int, str]],
+                start: int) -> Optional[Dict[int, str]]:
+  # Returns the closing braces the reads of graph `name` declared before
+  # `statements[start]` need, or None if it doesn't qualify.
+  mention = re.compile(rf'\b{name}\b')
+  edge = re.compile(rf'^\s*{name}{_INDEX}\.(?:push|emplace)_back\(.+\);$')
+  read = re.compile(
+      rf'^(\s*)for \((?:const )?(?:int|auto)&? \w+ : {name}{_INDEX}\)( {{)?$')
+  size = re.compile(rf'\b{name}\[[^\[\]]+\]\.size\(\)')
+  closing_braces: Dict[int, str] = {}
+  has_edges = is_read = False
+  # Whether an edge was added in a block that hasn't been closed yet, e.g. a
+  # loop whose next iteration would add edges after a read in it.
+  is_in_edge_block = False
+  depth = 0
+  for i in range(start, len(statements)):
+    line_number, text = statements[i]
+    depth += text.count('{') - text.count('}')
+    if depth < 0:
+      # The end of the declaration's scope.
+      break
+    if depth == 0:
+      is_in_edge_block = False
+    mentions = len(mention.findall(text))
+    if not mentions:
+      continue
+    if edge.match(text) and mentions == 1:
+      if is_read:
+        return None
+      has_edges = True
+      is_in_edge_block = depth > 0
+      continue
+    if is_in_edge_block:
+      return None
+    is_read = True
+    match = read.match(text)
+    if match and mentions == 1:
+      spaces, left_bracket = match.groups()
+      if not left_bracket:
+        # The body must be a single simple statement to be braced.
+        if i + 1 == len(statements):
+          return None
+        body_line_number, body = statements[i + 1]
+        if _BLOCK_HEADER.match(body) or '{' in body or '}' in body or \
+                not body.rstrip().endswith(';'):
+          return None
+        closing_braces[body_line_number] = spaces
+      continue
+    if len(size.findall(text)) == mentions:
+      continue
+    return None
+  return closing_braces if has_edges else None
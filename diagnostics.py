@@ -0,0 +1,62 @@
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+WARNING = 'warning'
+ERROR = 'error'
+
+
+class Diagnostic(NamedTuple):
+  severity: str
+  rule: str
+  line_number: int
+  message: str
+  source: str
+
+  def format(self, filename: Optional[str] = None) -> str:
+    """ -Diagnostic('warning', 'peek then pop', 3, "unknown type of 'q'", 'q.front(), q.pop();')
+        +a.cpp:3: warning: unknown type of 'q' [peek then pop]
+    """
+    location = f'{filename}:{self.line_number}' if filename \
+        else f'line {self.line_number}'
+    return f'{location}: {self.severity}: {self.message} [{self.rule}]'
+
+  def to_json(self) -> Dict[str, Any]:
+    return self._asdict()
+
+
+class Diagnostics:
+  """What a conversion couldn't do, collected instead of printed.
+
+  A `CppConverter` appends to its collector while converting, the caller
+  decides what to print, so parallel workers don't interleave their messages
+  and a batch can count failures by rule.
+  """
+
+  def __init__(self):
+    self.items: List[Diagnostic] = []
+
+  def add(self, severity: str, rule: str, line_number: int, message: str,
+          source: str) -> None:
+    self.items.append(Diagnostic(severity, rule, line_number, message, source))
+
+  def warning(self, rule: str, line_number: int, message: str,
+              source: str) -> None:
+    self.items.append(Diagnostic(WARNING, rule, line_number, message, source))
+
+  def merge(self, other: 'Diagnostics') -> None:
+    self.items.extend(other.items)
+
+  def counts(self) -> Dict[str, int]:
+    # rule -> number of diagnostics
+    counts: Dict[str, int] = {}
+    for diagnostic in self.items:
+      counts[diagnostic.rule] = counts.get(diagnostic.rule, 0) + 1
+    return counts
+
+  def to_json(self) -> List[Dict[str, Any]]:
+    return [diagnostic.to_json() for diagnostic in self.items]
+
+  def __iter__(self) -> Iterator[Diagnostic]:
+    return iter(self.items)
+
+  def __len__(self) -> int:
+    return len(self.items)
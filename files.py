@@ -0,0 +1,50 @@
+import os
+import stat
+from typing import Optional
+
+
+def write_atomically(path: str, data: bytes, mode: Optional[int] = None) -> None:
+  # Writes `data` to a temporary file next to `path` and renames it into
+  # place, so readers of `path` see either the old or the new content but
+  # never a truncated file, even if we crash midway. The file gets `mode` if
+  # given, else the mode `open()` would create it with.
+  directory, name = os.path.split(path)
+  tmp_path = os.path.join(
+      directory, f'.{name}.{os.getpid()}.{os.urandom(4).hex()}.tmp')
+  fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    if mode is not None:
+      os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+  except BaseException:
+    os.unlink(tmp_path)
+    raise
+
+
+def write_if_changed(path: str, text: str) -> bool:
+  # Atomically replaces the content of `path` with `text` (UTF-8) unless it's
+  # already `text`, in which case the file and its mtime are left untouched.
+  # Returns whether the file was written.
+  data = text.encode('utf-8')
+  try:
+    st = os.stat(path)
+  except FileNotFoundError:
+    write_atomically(path, data)
+    return True
+  if st.st_size == len(data):
+    with open(path, 'rb') as f:
+      if f.read() == data:
+        return False
+  write_atomically(path, data, stat.S_IMODE(st.st_mode))
+  return True
+
+
+def java_filename(cpp_filename: str) -> str:
+  """ -dir/a.cpp
+      +dir/a.java
+  """
+  if not cpp_filename.endswith('.cpp'):
+    raise ValueError(f'not a .cpp file: {cpp_filename}')
+  return os.path.splitext(cpp_filename)[0] + '.java'
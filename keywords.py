@@ -1,5 +1,7 @@
 from typing import Dict, List
 
+from rules import VersionedDict
+
 # Maps C++ func name to Java func name.
 """ -move(A)
     +A
@@ -9,13 +11,13 @@ from typing import Dict, List
 
     ...
 """
-func_name: Dict[str, str] = {
+func_name: Dict[str, str] = VersionedDict({
     'move': '',
     'to_string': 'String.valueOf',
     'stoi': 'Integer.valueOf',
     'stol': 'Long.valueOf',
     'stoll': 'Long.valueOf',
-}
+})
 
 # Maps C++ container to Java interface and implementation.
 """ -unordered_set<int> seen;
@@ -31,10 +33,9 @@ data_structure: Dict[str, str] = {
     'queue': ('Queue', 'ArrayDeque'),
 }
 
-replaced_end: Dict[str, str] = {
+replaced_end: Dict[str, str] = VersionedDict({
     'constexpr': 'final',
     'const': 'final',
-    '1\'000\'000\'007': '1_000_000_007',
     '.top()': '.peek()',
     '.pop(': '.poll(',
     'bool': 'boolean',
@@ -63,4 +64,4 @@ replaced_end: Dict[str, str] = {
     'LLONG_MAX': 'Long.MAX_VALUE',
     'long long': 'long',
     'nullptr': 'null',
-}
+})
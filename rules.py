@@ -0,0 +1,413 @@
+import bisect
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+# Leading identifier of a line, e.g. '  vector<int> A;' -> 'vector'.
+_LEADING_WORD: Pattern[str] = re.compile(r'\s*(\w+)')
+
+
+class Rule(NamedTuple):
+  # Rules come in two kinds:
+  #
+  #   1. Statement rules (`pattern` is set). If `pattern` matches the line,
+  #      `handler(converter, line, line_number, match)` is called. A `str`
+  #      result is the final conversion of the line, `None` falls through to
+  #      the next rule.
+  #   2. Rewrite rules (`pattern` is None). `handler(converter, line,
+  #      line_number)` returns the rewritten line and dispatching continues.
+  #
+  # `keyword` and `required` are cheap prefilters checked before the regex:
+  # `keyword` must be the leading identifier of the line and every string in
+  # `required` must appear in the line. `when(converter)` can further disable
+  # the rule depending on the converter's state.
+  name: str
+  handler: Callable[..., Optional[str]]
+  pattern: Optional[Pattern[str]] = None
+  keyword: Optional[str] = None
+  required: Tuple[str, ...] = ()
+  when: Optional[Callable[[Any], bool]] = None
+
+
+def rule(name: str, pattern: str, handler: Callable[..., Optional[str]],
+         keyword: Optional[str] = None, required: Tuple[str, ...] = (),
+         when: Optional[Callable[[Any], bool]] = None) -> Rule:
+  return Rule(name, handler, re.compile(pattern), keyword, required, when)
+
+
+def rewrite(name: str, handler: Callable[..., str],
+            required: Tuple[str, ...] = ()) -> Rule:
+  return Rule(name, handler, None, None, required)
+
+
+class RuleSet:
+  """An ordered list of rules indexed by their leading keyword.
+
+  For each keyword we precompute the ordered list of rules that can possibly
+  match a line starting with it (the keyword's own rules plus the unkeyed
+  ones), so a line is only tried against those.
+  """
+
+  def __init__(self, rules: Iterable[Rule]):
+    self.rules: List[Rule] = list(rules)
+    self._unkeyed: List[Rule] = [r for r in self.rules if r.keyword is None]
+    self._by_keyword: Dict[str, List[Rule]] = {
+        keyword: [r for r in self.rules if r.keyword in (None, keyword)]
+        for keyword in {r.keyword for r in self.rules if r.keyword}
+    }
+
+  def candidates(self, line: str) -> List[Rule]:
+    match = _LEADING_WORD.match(line)
+    if not match:
+      return self._unkeyed
+    return self._by_keyword.get(match.group(1), self._unkeyed)
+
+  def apply(self, converter: Any, line: str, line_number: int,
+            stats: Optional['RuleStats'] = None) -> str:
+    if stats is not None:
+      return self._apply_instrumented(converter, line, line_number, stats)
+    for r in self.candidates(line):
+      if r.when is not None and not r.when(converter):
+        continue
+      for s in r.required:
+        if s not in line:
+          break
+      else:
+        if r.pattern is None:
+          line = r.handler(converter, line, line_number)
+          continue
+        match = r.pattern.search(line)
+        if match:
+          result = r.handler(converter, line, line_number, match)
+          if result is not None:
+            return result
+    return line
+
+  def _apply_instrumented(self, converter: Any, line: str, line_number: int,
+                          stats: 'RuleStats') -> str:
+    # Same as `apply()`, but records every rule that passes its prefilters.
+    for r in self.candidates(line):
+      if r.when is not None and not r.when(converter):
+        continue
+      for s in r.required:
+        if s not in line:
+          break
+      else:
+        start = time.perf_counter()
+        if r.pattern is None:
+          rewritten = r.handler(converter, line, line_number)
+          stats.record(r.name, rewritten != line, time.perf_counter() - start)
+          line = rewritten
+          continue
+        match = r.pattern.search(line)
+        result = r.handler(converter, line, line_number, match) \
+            if match else None
+        stats.record(r.name, result is not None, time.perf_counter() - start)
+        if result is not None:
+          return result
+    return line
+
+
+class RuleStats:
+  """Per-rule counters collected by `RuleSet.apply()`.
+
+  For every rule we record how often it was attempted (its prefilters passed),
+  how often it hit (a statement rule converted the line, or a rewrite rule
+  changed it) and the total time spent in its regex and handler.
+  """
+
+  def __init__(self):
+    # name -> [attempts, hits, seconds]
+    self.rules: Dict[str, List[Any]] = {}
+
+  def record(self, name: str, hit: bool, seconds: float) -> None:
+    counters = self.rules.get(name)
+    if counters is None:
+      counters = self.rules[name] = [0, 0, 0.0]
+    counters[0] += 1
+    counters[1] += hit
+    counters[2] += seconds
+
+  def merge(self, other: 'RuleStats') -> None:
+    for name, (attempts, hits, seconds) in other.rules.items():
+      counters = self.rules.setdefault(name, [0, 0, 0.0])
+      counters[0] += attempts
+      counters[1] += hits
+      counters[2] += seconds
+
+  def to_json(self) -> Dict[str, Dict[str, Any]]:
+    return {name: {'attempts': attempts, 'hits': hits, 'seconds': seconds}
+            for name, (attempts, hits, seconds) in self.rules.items()}
+
+  def format_table(self) -> str:
+    lines = [f'{"rule":<32} {"attempts":>10} {"hits":>10} {"hit %":>6} {"ms":>10}']
+    for name, (attempts, hits, seconds) in sorted(
+            self.rules.items(), key=lambda item: -item[1][2]):
+      hit_rate = 100 * hits / attempts if attempts else 0
+      lines.append(f'{name:<32} {attempts:>10} {hits:>10} {hit_rate:>6.1f} '
+                   f'{seconds * 1000:>10.2f}')
+    return '\n'.join(lines)
+
+
+class VersionedDict(dict):
+  # A dict that bumps `version` on every mutation, so tables derived from it
+  # can cheaply tell whether they are stale.
+  version: int = 0
+
+  def _bump(self) -> None:
+    self.version += 1
+
+  def __setitem__(self, key, value) -> None:
+    super().__setitem__(key, value)
+    self._bump()
+
+  def __delitem__(self, key) -> None:
+    super().__delitem__(key)
+    self._bump()
+
+  def clear(self) -> None:
+    super().clear()
+    self._bump()
+
+  def pop(self, *args):
+    try:
+      return super().pop(*args)
+    finally:
+      self._bump()
+
+  def popitem(self):
+    try:
+      return super().popitem()
+    finally:
+      self._bump()
+
+  def setdefault(self, key, default=None):
+    try:
+      return super().setdefault(key, default)
+    finally:
+      self._bump()
+
+  def update(self, *args, **kwargs) -> None:
+    super().update(*args, **kwargs)
+    self._bump()
+
+  def __ior__(self, other):
+    result = super().__ior__(other)
+    self._bump()
+    return result
+
+
+class _TableRewriter:
+  # Base class of rewriters compiled from a (possibly mutable) table, e.g.
+  # `keywords.func_name`. Subclasses implement `_compile()`, which is called
+  # again whenever the table changes.
+
+  def __init__(self, table: Callable[[], Dict[str, str]]):
+    self._table = table
+    self._source: Optional[Dict[str, str]] = None
+    self._version: Any = None
+
+  def _is_stale(self, table: Dict[str, str]) -> bool:
+    if table is not self._source:
+      return True
+    if isinstance(table, VersionedDict):
+      return table.version != self._version
+    return tuple(table.items()) != self._version
+
+  def _current(self) -> Dict[str, str]:
+    table = self._table()
+    if self._is_stale(table):
+      self._source = table
+      self._version = table.version if isinstance(table, VersionedDict) \
+          else tuple(table.items())
+      self._compile(table)
+    return table
+
+  def _compile(self, table: Dict[str, str]) -> None:
+    raise NotImplementedError
+
+
+class CallRewriter(_TableRewriter):
+  """Rewrites calls `f(arg)` to `g(arg)` (or `arg` if `g` is empty) for every
+  entry `f: g` of a table in one scan of the line.
+
+  All names are combined into a single alternation, and the argument of a
+  call is either a word (`stoi(s)`) or runs up to the first run of closing
+  characters `)]}"` followed by ')' (`to_string(f(x))`). Arguments are
+  rewritten recursively, e.g. `to_string(stoi(s))` ->
+  `String.valueOf(Integer.valueOf(s))`, up to `MAX_DEPTH` nested calls. The
+  argument ends are found with a precomputed index of the line's closing
+  characters, so a line is rewritten in linear time even if it's full of
+  unclosed calls. The regex is rebuilt whenever the table changes.
+  """
+
+  MAX_DEPTH = 32
+
+  def __init__(self, table: Callable[[], Dict[str, str]]):
+    super().__init__(table)
+    self._pattern: Optional[Pattern[str]] = None
+
+  def _compile(self, table: Dict[str, str]) -> None:
+    if not table:
+      self._pattern = None
+      return
+    # Longest names first, so a name is never shadowed by its prefix.
+    names = sorted(table, key=lambda name: -len(name))
+    self._pattern = re.compile(
+        r'(?<![\w.])(' + '|'.join(map(re.escape, names)) + r')\(')
+
+  def sub(self, line: str) -> str:
+    table = self._current()
+    if self._pattern is None:
+      return line
+    return self._sub(line, table, 0)
+
+  def _sub(self, line: str, table: Dict[str, str], depth: int) -> str:
+    pieces: List[str] = []
+    pos = 0  # Everything before `pos` is in `pieces`.
+    search_pos = 0
+    arg_ends: Optional[_ArgEnds] = None
+    while True:
+      match = self._pattern.search(line, search_pos)
+      if not match:
+        break
+      start = match.end()
+      word = _WORD_ARG.match(line, start)
+      if word:
+        end = word.end() - 1
+      else:
+        if arg_ends is None:
+          arg_ends = _ArgEnds(line)
+        end = arg_ends.find(start)
+      if end < 0:
+        search_pos = match.start() + 1
+        continue
+      arg = line[start:end]
+      if depth < self.MAX_DEPTH:
+        arg = self._sub(arg, table, depth + 1)
+      java_func_name = table[match.group(1)]
+      pieces.append(line[pos:match.start()])
+      pieces.append(f'{java_func_name}({arg})' if java_func_name else arg)
+      pos = search_pos = end + 1
+    if not pieces:
+      return line
+    pieces.append(line[pos:])
+    return ''.join(pieces)
+
+
+_WORD_ARG: Pattern[str] = re.compile(r'\w+\)')
+_CLOSERS: Pattern[str] = re.compile(r'[)\]}"]+')
+
+
+class _ArgEnds:
+  # Finds where the argument of a call starting at some index ends, i.e. the
+  # end of the shortest match of `.*?[)\]}"]+` followed by ')', in O(log n).
+  #
+  # The argument ends in the first run of closing characters that has a ')'
+  # after the run's first character (or after the argument's start, for the
+  # run the argument starts in). Greedily, it ends before the run's last ')'.
+
+  def __init__(self, line: str):
+    self._starts: List[int] = []
+    self._ends: List[int] = []
+    self._last_parens: List[int] = []  # -1 if the run has none
+    for match in _CLOSERS.finditer(line):
+      start, end = match.span()
+      self._starts.append(start)
+      self._ends.append(end)
+      self._last_parens.append(line.rfind(')', start + 1, end))
+    # Index of the first run at or after i with a ')', or -1.
+    self._next_run = [-1] * (len(self._starts) + 1)
+    for i in reversed(range(len(self._starts))):
+      self._next_run[i] = i if self._last_parens[i] >= 0 else self._next_run[i + 1]
+    # `.` doesn't match newlines, so an argument can't span lines.
+    self._newlines = [i for i, c in enumerate(line) if c == '\n'] \
+        if '\n' in line else []
+
+  def find(self, start: int) -> int:
+    # Returns the index of the ')' closing the argument, or -1.
+    i = bisect.bisect_right(self._starts, start) - 1
+    end = -1
+    if i >= 0 and start < self._ends[i] and self._last_parens[i] > start:
+      end = self._last_parens[i]
+    else:
+      run = self._next_run[i + 1]
+      if run >= 0:
+        end = self._last_parens[run]
+    if end >= 0 and self._newlines:
+      newline = bisect.bisect_left(self._newlines, start)
+      if newline < len(self._newlines) and self._newlines[newline] < end:
+        return -1
+    return end
+
+
+class Replacer(_TableRewriter):
+  """Replaces every key of a table by its value in one pass over the line.
+
+  Matching is leftmost-longest: scanning left to right, at each position the
+  longest key starting there is replaced and scanning resumes after it, so
+  replaced text is never matched again and the result doesn't depend on the
+  table's order (e.g. 'const string& ' wins over 'const'). Keys starting or
+  ending with an identifier character only match at identifier boundaries, so
+  'min(' doesn't match in '.min(' and 'const' doesn't match in 'constant'.
+
+  The keys are compiled into a trie-shaped regex, so at each position the
+  regex engine follows at most one branch per character instead of trying
+  every key in turn.
+
+  `sub_sequentially()` reproduces the old behavior of calling `str.replace()`
+  once per entry, in table order, for regression comparison.
+  """
+
+  def __init__(self, table: Callable[[], Dict[str, str]]):
+    super().__init__(table)
+    self._pattern: Optional[Pattern[str]] = None
+
+  def _compile(self, table: Dict[str, str]) -> None:
+    if not table:
+      self._pattern = None
+      return
+    word_keys = [key for key in table if re.match(r'\w', key)]
+    other_keys = [key for key in table if not re.match(r'\w', key)]
+    alternatives = []
+    if word_keys:
+      alternatives.append(r'(?<![\w.])' + _trie_regex(word_keys))
+    if other_keys:
+      alternatives.append(_trie_regex(other_keys))
+    self._pattern = re.compile('|'.join(alternatives))
+
+  def sub(self, line: str) -> str:
+    table = self._current()
+    if self._pattern is None:
+      return line
+    return self._pattern.sub(lambda match: table[match.group()], line)
+
+  def sub_sequentially(self, line: str) -> str:
+    for k, v in self._table().items():
+      line = line.replace(k, v)
+    return line
+
+
+def _trie_regex(keys: Iterable[str]) -> str:
+  # Builds a regex matching the longest of `keys` at the current position,
+  # e.g. ['min(', 'max(', 'const', 'constexpr'] ->
+  # 'm(?:ax\(|in\()|const(?:expr(?!\w)|(?!\w))'. Keys ending with an identifier
+  # character must not be followed by one.
+  trie: Dict[str, Any] = {}
+  for key in keys:
+    node = trie
+    for c in key:
+      node = node.setdefault(c, {})
+    node[''] = key
+
+  def build(node: Dict[str, Any]) -> str:
+    # Longer continuations are tried before the key ending here.
+    alternatives = [re.escape(c) + build(child)
+                    for c, child in sorted(node.items()) if c]
+    if '' in node:
+      alternatives.append(r'(?!\w)' if re.search(r'\w$', node['']) else '')
+    if len(alternatives) == 1:
+      return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+  return build(trie)
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+import cpp2java
+from client import default_socket_path
+from diagnostics import Diagnostics
+
+# Max size of one request line, i.e. of one JSON-encoded source.
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+# Options of `cpp2java.CppConverter` a request may set, as the CLI does.
+OPTIONS = ('line_budget', 'profile', 'csr', 'pack_pairs')
+
+
+def handle_request(request: Dict[str, Any]) -> Dict[str, Any]:
+  """ -{"id": 1, "source": "vector<int> A;\\n"}
+      +{"id": 1, "java": "List<Integer> A = new ArrayList<>();\\n"}
+
+  "options" may set any of `OPTIONS`, e.g. {"profile": "primitive"}. What
+  couldn't be converted is listed in "diagnostics", if anything.
+  """
+  response: Dict[str, Any] = {'id': request.get('id')}
+  source = request.get('source')
+  if not isinstance(source, str):
+    response['error'] = "missing 'source'"
+    return response
+  options = request.get('options') or {}
+  if not isinstance(options, dict):
+    response['error'] = "'options' is not an object"
+    return response
+  for option in options:
+    if option not in OPTIONS:
+      response['error'] = f"unknown option '{option}'"
+      return response
+  diagnostics = Diagnostics()
+  try:
+    response['java'] = cpp2java.convert_source(source, options=options,
+                                               diagnostics=diagnostics)
+  except Exception as e:
+    response['error'] = f'{type(e).__name__}: {e}'
+  if diagnostics:
+    response['diagnostics'] = diagnostics.to_json()
+  return response
+
+
+async def _serve_client(reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter) -> None:
+  # Requests of a connection are answered in order, one JSON line each. They
+  # are converted in a worker thread, so a long conversion doesn't stall the
+  # other connections.
+  loop = asyncio.get_running_loop()
+  try:
+    while True:
+      try:
+        line = await reader.readline()
+      except ValueError:
+        # Longer than MAX_REQUEST_BYTES, the rest of the stream is garbage.
+        writer.write(json.dumps({'id': None, 'error': 'request too large'})
+                     .encode() + b'\n')
+        break
+      if not line:
+        break
+      try:
+        request = json.loads(line)
+      except ValueError as e:
+        response: Dict[str, Any] = {'id': None, 'error': f'bad request: {e}'}
+      else:
+        if isinstance(request, dict):
+          response = await loop.run_in_executor(None, handle_request, request)
+        else:
+          response = {'id': None, 'error': 'bad request: not an object'}
+      writer.write(json.dumps(response).encode() + b'\n')
+      await writer.drain()
+  except ConnectionError:
+    pass
+  finally:
+    writer.close()
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+  # Removes the socket file left by a server that didn't exit cleanly, but
+  # never steals the socket of a running one.
+  if not os.path.exists(socket_path):
+    return
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    try:
+      sock.connect(socket_path)
+    except ConnectionRefusedError:
+      os.unlink(socket_path)
+      return
+  raise OSError(f'a server is already listening on {socket_path}')
+
+
+async def start(socket_path: str) -> asyncio.AbstractServer:
+  _remove_stale_socket(socket_path)
+  # Warms up the lazily compiled tables before the first request.
+  cpp2java.convert_source('vector<int> A;\nint m = A.size();\n')
+  return await asyncio.start_unix_server(
+      _serve_client, socket_path, limit=MAX_REQUEST_BYTES)
+
+
+async def serve(socket_path: str) -> None:
+  server = await start(socket_path)
+  # Exits cleanly on SIGTERM too, so the socket file is removed.
+  asyncio.get_running_loop().add_signal_handler(
+      signal.SIGTERM, asyncio.current_task().cancel)
+  try:
+    async with server:
+      await server.serve_forever()
+  finally:
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  parser = argparse.ArgumentParser(
+      description='Serves conversions over a Unix socket, one JSON object per '
+                  'line each way: {"id": ..., "source": ..., "options": {...}} '
+                  'is answered by {"id": ..., "java": ...} or '
+                  '{"id": ..., "error": ...}.')
+  parser.add_argument('--socket', default=default_socket_path(),
+                      help='path of the Unix socket (default: %(default)s)')
+  args = parser.parse_args(argv)
+  try:
+    asyncio.run(serve(args.socket))
+  except OSError as e:
+    print(e, file=sys.stderr)
+    return 1
+  except (KeyboardInterrupt, asyncio.CancelledError):
+    pass
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,172 @@
+import re
+from typing import Iterable, Iterator, List, Pattern, Tuple
+
+import lexer
+
+# Lines with these characters may have literals or comments, and need to be
+# lexed to find their brackets.
+_LEXED_CHARS: Pattern[str] = re.compile(r'["\'/]')
+_BRACKET: Pattern[str] = re.compile(r'[()\[\]{}]')
+# Tokens after which '{' starts an initializer list rather than a block.
+_INITIALIZER_PREFIXES = ('=', ',', '(', '[', '{', 'return')
+# Identifiers after which '{' starts a block even without a space.
+_BLOCK_KEYWORDS = ('else', 'do', 'try')
+
+
+class StatementAssembler:
+  """Groups physical lines into logical statements.
+
+  A line whose parentheses, brackets or initializer braces are left open is
+  joined with the following lines until they are closed, e.g.
+
+    vector<vector<int>> dp(m + 1,
+                           vector<int>(n + 1));
+
+  is one statement. Block braces (`if (x) {`) never join lines. At most
+  `max_lines` lines are buffered: if a statement isn't closed by then, or a
+  line comment would end up in the middle of it, the buffered lines are
+  emitted one by one as if they weren't joined.
+  """
+
+  def __init__(self, max_lines: int = 32):
+    self.max_lines = max_lines
+    self._lexer = lexer.Lexer()
+    self._open: List[str] = []
+
+  def _opens_initializer(self, prev: str, prev_is_adjacent: bool) -> bool:
+    # Whether a '{' after the token `prev` opens a bracket to be closed before
+    # the statement ends, rather than a block.
+    return bool(self._open) or prev in _INITIALIZER_PREFIXES or \
+        prev_is_adjacent and (prev == '>' or prev.isidentifier()) and \
+        prev not in _BLOCK_KEYWORDS
+
+  def _scan(self, line: str) -> bool:
+    # Updates the open brackets with the line, returns whether the line ends
+    # with a line comment.
+    if self._lexer.in_block_comment or _LEXED_CHARS.search(line):
+      return self._scan_tokens(line)
+    if not self._open and '{' not in line and '}' not in line and \
+            line.count('(') == line.count(')') and \
+            line.count('[') == line.count(']'):
+      # A balanced line outside of a statement, which is the common case.
+      return False
+    # Without literals and comments, the brackets can be found without lexing.
+    for match in _BRACKET.finditer(line):
+      c = match.group()
+      if c in '([':
+        self._open.append(c)
+      elif c != '{':
+        if self._open:
+          self._open.pop()
+      else:
+        prev, prev_is_adjacent = _token_before(line, match.start())
+        if prev:
+          if self._opens_initializer(prev, prev_is_adjacent):
+            self._open.append(c)
+        elif self._open:
+          self._open.append(c)
+    return False
+
+  def _scan_tokens(self, line: str) -> bool:
+    prev = ''  # The previous non-space token.
+    prev_is_adjacent = False
+    ends_with_comment = False
+    for kind, text in self._lexer.tokenize(line):
+      if kind == lexer.SPACE:
+        prev_is_adjacent = False
+        continue
+      ends_with_comment = kind == lexer.COMMENT and text.startswith('//')
+      if kind == lexer.PUNCT:
+        if text in ('(', '['):
+          self._open.append(text)
+        elif text in (')', ']', '}'):
+          if self._open:
+            self._open.pop()
+        elif text == '{':
+          if self._opens_initializer(prev, prev_is_adjacent):
+            self._open.append(text)
+      if kind != lexer.COMMENT:
+        prev = text
+        prev_is_adjacent = True
+    return ends_with_comment
+
+  def statements(self, lines: Iterable[str]) -> Iterator[Tuple[int, List[str]]]:
+    # Yields (line number of the first line, lines of the statement).
+    buffer: List[str] = []
+    first_line_number = 1
+    for line_number, line in enumerate(lines, 1):
+      if not buffer:
+        first_line_number = line_number
+        if line.lstrip().startswith('#'):
+          yield line_number, [line]
+          continue
+      ends_with_comment = self._scan(line)
+      buffer.append(line)
+      if not self._open:
+        yield first_line_number, buffer
+        buffer = []
+      elif ends_with_comment or len(buffer) >= self.max_lines:
+        self._open.clear()
+        for i, buffered_line in enumerate(buffer):
+          yield first_line_number + i, [buffered_line]
+        buffer = []
+    for i, buffered_line in enumerate(buffer):
+      yield first_line_number + i, [buffered_line]
+
+
+def _token_before(line: str, end: int) -> Tuple[str, bool]:
+  # Returns the non-space token before `line[end]` ('' if none) and whether
+  # it's adjacent to it, e.g. ('A', True) for 'A{'. Only looks at the chars
+  # of the token and the spaces after it, so it's cheap for every brace.
+  i = end
+  while i and line[i - 1].isspace():
+    i -= 1
+  if not i:
+    return '', False
+  j = i - 1
+  if line[j].isalnum() or line[j] == '_':
+    while j and (line[j - 1].isalnum() or line[j - 1] == '_'):
+      j -= 1
+  return line[j:i], i == end
+
+
+def join(lines: List[str]) -> str:
+  # Joins the lines of a statement into one line.
+  #
+  #    join(['f(a,\n', '  b);\n'])
+  # -> 'f(a, b);\n'
+  joined = lines[0].rstrip('\n')
+  for line in lines[1:]:
+    fragment = line.strip()
+    if not fragment:
+      continue
+    if joined[-1:] not in ('(', '[', '{') and fragment[0] not in (')', ']', '}'):
+      joined += ' '
+    joined += fragment
+  return joined + ('\n' if lines[-1].endswith('\n') else '')
+
+
+def rewrap(java: str, lines: List[str]) -> str:
+  # Restores the line breaks of the original statement in its conversion
+  # `java` where the continuation lines survived the conversion unchanged.
+  # Continuation lines that were rewritten stay on the joined line.
+  if java == join(lines):
+    return ''.join(lines)
+  pos = 0
+  pieces: List[str] = []
+  for line in lines[1:]:
+    fragment = line.strip()
+    if not fragment:
+      continue
+    i = java.find(fragment, pos)
+    # The fragment must start where the lines were joined, not in the middle
+    # of a rewritten token (e.g. 'min(' in 'Math.min(').
+    while i > 0 and java[i - 1] not in ' ([{':
+      i = java.find(fragment, i + 1)
+    if i <= 0:
+      continue
+    indent = line[:len(line) - len(line.lstrip())]
+    pieces.append(java[pos:i].rstrip(' ') + '\n' + indent)
+    pos = i
+  pieces.append(java[pos:])
+  return ''.join(pieces)
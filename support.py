@@ -0,0 +1,39 @@
+import os
+import re
+from typing import List
+
+import files
+
+# Java files the converted code may depend on, in the `support` directory.
+SUPPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'support')
+
+# Support file -> the classes it defines.
+_CLASSES = {
+    'Algorithms.java': ('Algorithms',),
+    'CsrGraph.java': ('CsrGraph',),
+    'FastIO.java': ('FastReader', 'FastWriter'),
+    'PackedPairs.java': ('Pairs', 'LongHeap', 'LongQueue'),
+    'Primitives.java': ('IntList', 'LongList', 'IntSet', 'IntIntMap'),
+}
+
+_CLASS_TO_FILE = {class_name: filename
+                  for filename, class_names in _CLASSES.items()
+                  for class_name in class_names}
+_CLASS_NAME = re.compile(r'\b(' + '|'.join(_CLASS_TO_FILE) + r')\b')
+
+
+def required_files(java: str) -> List[str]:
+  """ -IntList A = new IntList();
+      +['Primitives.java']
+  """
+  return sorted({_CLASS_TO_FILE[name] for name in _CLASS_NAME.findall(java)})
+
+
+def copy_required_files(java: str, out_dir: str) -> List[str]:
+  # Copies the support files `java` needs to `out_dir`, where they're compiled
+  # with it. Returns the copied filenames.
+  filenames = required_files(java)
+  for filename in filenames:
+    with open(os.path.join(SUPPORT_DIR, filename), encoding='utf-8') as f:
+      files.write_if_changed(os.path.join(out_dir, filename), f.read())
+  return filenames
@@ -0,0 +1,166 @@
+import java.util.Collections;
+import java.util.List;
+import java.util.NoSuchElementException;
+
+// Loops for the converted <algorithm> and <numeric> calls, which don't box or
+// allocate like the equivalent streams. Keep this file next to the converted
+// sources.
+final class Algorithms {
+  private Algorithms() {}
+
+  static void reverse(int[] a) {
+    for (int i = 0, j = a.length - 1; i < j; ++i, --j) {
+      final int t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  static void reverse(long[] a) {
+    for (int i = 0, j = a.length - 1; i < j; ++i, --j) {
+      final long t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  static void reverse(double[] a) {
+    for (int i = 0, j = a.length - 1; i < j; ++i, --j) {
+      final double t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  static void reverse(char[] a) {
+    for (int i = 0, j = a.length - 1; i < j; ++i, --j) {
+      final char t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  // accumulate(): the sum has the type of `init` like in C++.
+  static int sum(int[] a, int init) {
+    for (final int x : a)
+      init += x;
+    return init;
+  }
+
+  static long sum(int[] a, long init) {
+    for (final int x : a)
+      init += x;
+    return init;
+  }
+
+  static double sum(int[] a, double init) {
+    for (final int x : a)
+      init += x;
+    return init;
+  }
+
+  static long sum(long[] a, long init) {
+    for (final long x : a)
+      init += x;
+    return init;
+  }
+
+  static double sum(long[] a, double init) {
+    for (final long x : a)
+      init += x;
+    return init;
+  }
+
+  static double sum(double[] a, double init) {
+    for (final double x : a)
+      init += x;
+    return init;
+  }
+
+  static int sum(List<? extends Number> a, int init) {
+    for (final Number x : a)
+      init += x.intValue();
+    return init;
+  }
+
+  static long sum(List<? extends Number> a, long init) {
+    for (final Number x : a)
+      init += x.longValue();
+    return init;
+  }
+
+  static double sum(List<? extends Number> a, double init) {
+    for (final Number x : a)
+      init += x.doubleValue();
+    return init;
+  }
+
+  // *min_element() and *max_element() of a nonempty range.
+  static int min(int[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    int result = a[0];
+    for (final int x : a)
+      if (x < result)
+        result = x;
+    return result;
+  }
+
+  static long min(long[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    long result = a[0];
+    for (final long x : a)
+      if (x < result)
+        result = x;
+    return result;
+  }
+
+  static double min(double[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    double result = a[0];
+    for (final double x : a)
+      if (x < result)
+        result = x;
+    return result;
+  }
+
+  static <T extends Comparable<? super T>> T min(List<T> a) {
+    return Collections.min(a);
+  }
+
+  static int max(int[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    int result = a[0];
+    for (final int x : a)
+      if (x > result)
+        result = x;
+    return result;
+  }
+
+  static long max(long[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    long result = a[0];
+    for (final long x : a)
+      if (x > result)
+        result = x;
+    return result;
+  }
+
+  static double max(double[] a) {
+    if (a.length == 0)
+      throw new NoSuchElementException();
+    double result = a[0];
+    for (final double x : a)
+      if (x > result)
+        result = x;
+    return result;
+  }
+
+  static <T extends Comparable<? super T>> T max(List<T> a) {
+    return Collections.max(a);
+  }
+}
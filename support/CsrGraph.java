@@ -0,0 +1,69 @@
+import java.util.Arrays;
+
+// An adjacency list in compressed sparse row form, for code converted with
+// `--csr`: the targets of vertex u are targets[offsets[u]..offsets[u + 1]), in
+// the order their edges were added. Edges are buffered until the first read,
+// which builds the arrays, so all edges must be added before then. Keep this
+// file next to the converted sources.
+final class CsrGraph {
+  private final int n;
+  // The edges added so far, freed once built.
+  private int[] from = new int[8];
+  private int[] to = new int[8];
+  private int m;
+  private int[] offsets;
+  private int[] targets;
+
+  CsrGraph(int n) {
+    this.n = n;
+  }
+
+  void addEdge(int u, int v) {
+    if (offsets != null)
+      throw new IllegalStateException("edge added after the graph was read");
+    if (u < 0 || u >= n)
+      throw new IndexOutOfBoundsException("Index " + u + " out of bounds for length " + n);
+    if (m == from.length) {
+      from = Arrays.copyOf(from, 2 * m);
+      to = Arrays.copyOf(to, 2 * m);
+    }
+    from[m] = u;
+    to[m++] = v;
+  }
+
+  // The edges of u are begin(u)..end(u) - 1.
+  int begin(int u) {
+    build();
+    return offsets[u];
+  }
+
+  int end(int u) {
+    build();
+    return offsets[u + 1];
+  }
+
+  int degree(int u) {
+    build();
+    return offsets[u + 1] - offsets[u];
+  }
+
+  int target(int e) {
+    return targets[e];
+  }
+
+  private void build() {
+    if (offsets != null)
+      return;
+    offsets = new int[n + 1];
+    for (int e = 0; e < m; ++e)
+      ++offsets[from[e] + 1];
+    for (int u = 0; u < n; ++u)
+      offsets[u + 1] += offsets[u];
+    targets = new int[m];
+    final int[] next = Arrays.copyOf(offsets, n);
+    for (int e = 0; e < m; ++e)
+      targets[next[from[e]]++] = to[e];
+    from = null;
+    to = null;
+  }
+}
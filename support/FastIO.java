@@ -0,0 +1,166 @@
+import java.io.BufferedWriter;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.OutputStreamWriter;
+import java.io.PrintWriter;
+import java.io.UncheckedIOException;
+import java.util.Locale;
+import java.util.NoSuchElementException;
+
+// Buffered standard input and output for converted programs that read with
+// cin/scanf and write with cout/printf. Keep this file next to the converted
+// sources.
+
+// Reads whitespace-separated tokens from a byte buffer, parsing numbers
+// without creating strings.
+final class FastReader {
+  private final InputStream stream;
+  private final byte[] buffer = new byte[1 << 16];
+  private int length;
+  private int pos;
+
+  FastReader(InputStream stream) {
+    this.stream = stream;
+  }
+
+  int nextInt() {
+    return (int) nextLong();
+  }
+
+  long nextLong() {
+    int c = skipSpaces();
+    final boolean negative = c == '-';
+    if (negative || c == '+')
+      c = read();
+    long x = 0;
+    for (; c >= '0' && c <= '9'; c = read())
+      x = x * 10 + (c - '0');
+    return negative ? -x : x;
+  }
+
+  double nextDouble() {
+    return Double.parseDouble(next());
+  }
+
+  char nextChar() {
+    return (char) skipSpaces();
+  }
+
+  String next() {
+    StringBuilder sb = new StringBuilder();
+    for (int c = skipSpaces(); c > ' '; c = read())
+      sb.append((char) c);
+    return sb.toString();
+  }
+
+  private int skipSpaces() {
+    int c = read();
+    while (c != -1 && c <= ' ')
+      c = read();
+    if (c == -1)
+      throw new NoSuchElementException("end of input");
+    return c;
+  }
+
+  private int read() {
+    if (pos == length) {
+      try {
+        length = stream.read(buffer, 0, buffer.length);
+      } catch (IOException e) {
+        throw new UncheckedIOException(e);
+      }
+      pos = 0;
+      if (length <= 0) {
+        length = 0;
+        return -1;
+      }
+    }
+    return buffer[pos++] & 0xff;
+  }
+}
+
+// Buffers everything written and flushes it once, when the program exits.
+// The print methods return the writer, so that `cout << a << b` becomes one
+// expression.
+final class FastWriter {
+  private final PrintWriter writer;
+  // Digits of doubles (setprecision), -1 if not set: significant digits like
+  // C's %g, or digits after the decimal point once `fixed` is set.
+  private int precision = -1;
+  private boolean isFixed;
+
+  FastWriter(OutputStream stream) {
+    writer = new PrintWriter(new BufferedWriter(new OutputStreamWriter(stream), 1 << 16));
+    Runtime.getRuntime().addShutdownHook(new Thread(this::flush));
+  }
+
+  FastWriter print(int x) {
+    writer.print(x);
+    return this;
+  }
+
+  FastWriter print(long x) {
+    writer.print(x);
+    return this;
+  }
+
+  FastWriter print(double x) {
+    if (precision < 0)
+      writer.print(x);
+    else if (isFixed)
+      writer.print(String.format(Locale.ROOT, "%." + precision + "f", x));
+    else
+      writer.print(toSignificantDigits(x));
+    return this;
+  }
+
+  // Java's %g keeps the trailing zeros that C's %g drops.
+  private String toSignificantDigits(double x) {
+    final String s = String.format(Locale.ROOT, "%." + Math.max(precision, 1) + "g", x);
+    final int e = s.indexOf('e');
+    String mantissa = e < 0 ? s : s.substring(0, e);
+    if (mantissa.indexOf('.') >= 0)
+      mantissa = mantissa.replaceAll("\\.?0+$", "");
+    return e < 0 ? mantissa : mantissa + s.substring(e);
+  }
+
+  FastWriter print(char x) {
+    writer.print(x);
+    return this;
+  }
+
+  FastWriter print(boolean x) {
+    writer.print(x ? 1 : 0);
+    return this;
+  }
+
+  FastWriter print(Object x) {
+    writer.print(x);
+    return this;
+  }
+
+  FastWriter println() {
+    writer.print('\n');
+    return this;
+  }
+
+  FastWriter printf(String format, Object... args) {
+    writer.printf(Locale.ROOT, format, args);
+    return this;
+  }
+
+  FastWriter fixed() {
+    isFixed = true;
+    return this;
+  }
+
+  FastWriter precision(int digits) {
+    precision = digits;
+    return this;
+  }
+
+  void flush() {
+    writer.flush();
+  }
+}
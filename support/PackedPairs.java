@@ -0,0 +1,156 @@
+import java.util.Arrays;
+import java.util.NoSuchElementException;
+
+// Heaps and queues of pair<int, int> for code converted with `--pack-pairs`,
+// which stores each pair in one long instead of allocating a Pair. Keep this
+// file next to the converted sources.
+
+// Packs (first, second) so that packed pairs compare like the pairs, first
+// by `first`, then by `second`.
+final class Pairs {
+  private Pairs() {}
+
+  static long pack(int first, int second) {
+    return (long) first << 32 | (second ^ Integer.MIN_VALUE) & 0xffffffffL;
+  }
+
+  static int first(long pair) {
+    return (int) (pair >> 32);
+  }
+
+  static int second(long pair) {
+    return (int) pair ^ Integer.MIN_VALUE;
+  }
+}
+
+// A binary heap of longs, smallest first. A max heap stores ~x, which reverses
+// the order, so both kinds share the same comparisons.
+final class LongHeap {
+  private final boolean isMaxHeap;
+  private long[] a = new long[16];
+  private int n;
+
+  LongHeap() {
+    this(false);
+  }
+
+  private LongHeap(boolean isMaxHeap) {
+    this.isMaxHeap = isMaxHeap;
+  }
+
+  static LongHeap maxHeap() {
+    return new LongHeap(true);
+  }
+
+  int size() {
+    return n;
+  }
+
+  boolean isEmpty() {
+    return n == 0;
+  }
+
+  void clear() {
+    n = 0;
+  }
+
+  boolean add(long x) {
+    return offer(x);
+  }
+
+  boolean offer(long x) {
+    if (n == a.length)
+      a = Arrays.copyOf(a, 2 * n);
+    int i = n++;
+    final long key = isMaxHeap ? ~x : x;
+    for (; i > 0 && key < a[(i - 1) / 2]; i = (i - 1) / 2)
+      a[i] = a[(i - 1) / 2];
+    a[i] = key;
+    return true;
+  }
+
+  long peek() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return isMaxHeap ? ~a[0] : a[0];
+  }
+
+  long poll() {
+    final long top = peek();
+    final long key = a[--n];
+    int i = 0;
+    for (int child = 1; child < n; child = 2 * i + 1) {
+      if (child + 1 < n && a[child + 1] < a[child])
+        ++child;
+      if (key <= a[child])
+        break;
+      a[i] = a[child];
+      i = child;
+    }
+    a[i] = key;
+    return top;
+  }
+}
+
+// A FIFO queue of longs in a ring buffer.
+final class LongQueue {
+  private long[] a;
+  private int head;
+  private int n;
+
+  LongQueue() {
+    this(16);
+  }
+
+  private LongQueue(int capacity) {
+    a = new long[Integer.highestOneBit(Math.max(capacity, 1) * 2 - 1)];
+  }
+
+  static LongQueue of(long... values) {
+    LongQueue q = new LongQueue(values.length);
+    for (final long x : values)
+      q.offer(x);
+    return q;
+  }
+
+  int size() {
+    return n;
+  }
+
+  boolean isEmpty() {
+    return n == 0;
+  }
+
+  void clear() {
+    head = n = 0;
+  }
+
+  boolean add(long x) {
+    return offer(x);
+  }
+
+  boolean offer(long x) {
+    if (n == a.length) {
+      long[] b = new long[2 * n];
+      for (int i = 0; i < n; ++i)
+        b[i] = a[(head + i) & (a.length - 1)];
+      a = b;
+      head = 0;
+    }
+    a[(head + n++) & (a.length - 1)] = x;
+    return true;
+  }
+
+  long peek() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return a[head];
+  }
+
+  long poll() {
+    final long front = peek();
+    head = (head + 1) & (a.length - 1);
+    --n;
+    return front;
+  }
+}
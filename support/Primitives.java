@@ -0,0 +1,413 @@
+import java.util.Arrays;
+import java.util.NoSuchElementException;
+import java.util.function.IntBinaryOperator;
+
+// Primitive-specialized collections for code converted with
+// `--profile primitive`, which stores ints and longs without boxing them.
+// Keep this file next to the converted sources.
+
+final class IntList {
+  private int[] a;
+  private int n;
+
+  IntList() {
+    this(8);
+  }
+
+  IntList(int capacity) {
+    a = new int[Math.max(capacity, 1)];
+  }
+
+  static IntList of(int... values) {
+    IntList list = new IntList(values.length);
+    System.arraycopy(values, 0, list.a, 0, values.length);
+    list.n = values.length;
+    return list;
+  }
+
+  int size() {
+    return n;
+  }
+
+  boolean isEmpty() {
+    return n == 0;
+  }
+
+  void clear() {
+    n = 0;
+  }
+
+  void add(int x) {
+    if (n == a.length)
+      a = Arrays.copyOf(a, 2 * n);
+    a[n++] = x;
+  }
+
+  int get(int i) {
+    checkIndex(i);
+    return a[i];
+  }
+
+  void set(int i, int x) {
+    checkIndex(i);
+    a[i] = x;
+  }
+
+  int peekLast() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return a[n - 1];
+  }
+
+  int pollLast() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return a[--n];
+  }
+
+  int[] toArray() {
+    return Arrays.copyOf(a, n);
+  }
+
+  void sort() {
+    Arrays.sort(a, 0, n);
+  }
+
+  void reverse() {
+    for (int i = 0, j = n - 1; i < j; ++i, --j) {
+      final int t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  private void checkIndex(int i) {
+    if (i < 0 || i >= n)
+      throw new IndexOutOfBoundsException("Index " + i + " out of bounds for length " + n);
+  }
+}
+
+final class LongList {
+  private long[] a;
+  private int n;
+
+  LongList() {
+    this(8);
+  }
+
+  LongList(int capacity) {
+    a = new long[Math.max(capacity, 1)];
+  }
+
+  static LongList of(long... values) {
+    LongList list = new LongList(values.length);
+    System.arraycopy(values, 0, list.a, 0, values.length);
+    list.n = values.length;
+    return list;
+  }
+
+  int size() {
+    return n;
+  }
+
+  boolean isEmpty() {
+    return n == 0;
+  }
+
+  void clear() {
+    n = 0;
+  }
+
+  void add(long x) {
+    if (n == a.length)
+      a = Arrays.copyOf(a, 2 * n);
+    a[n++] = x;
+  }
+
+  long get(int i) {
+    checkIndex(i);
+    return a[i];
+  }
+
+  void set(int i, long x) {
+    checkIndex(i);
+    a[i] = x;
+  }
+
+  long peekLast() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return a[n - 1];
+  }
+
+  long pollLast() {
+    if (n == 0)
+      throw new NoSuchElementException();
+    return a[--n];
+  }
+
+  long[] toArray() {
+    return Arrays.copyOf(a, n);
+  }
+
+  void sort() {
+    Arrays.sort(a, 0, n);
+  }
+
+  void reverse() {
+    for (int i = 0, j = n - 1; i < j; ++i, --j) {
+      final long t = a[i];
+      a[i] = a[j];
+      a[j] = t;
+    }
+  }
+
+  private void checkIndex(int i) {
+    if (i < 0 || i >= n)
+      throw new IndexOutOfBoundsException("Index " + i + " out of bounds for length " + n);
+  }
+}
+
+// Open addressing with linear probing. Removing shifts the following entries
+// of the probe sequence back, so there are no tombstones.
+final class IntSet {
+  private int[] keys;
+  private boolean[] used;
+  private int mask;
+  private int size;
+
+  IntSet() {
+    this(8);
+  }
+
+  IntSet(int expectedSize) {
+    allocate(tableSize(expectedSize));
+  }
+
+  int size() {
+    return size;
+  }
+
+  boolean isEmpty() {
+    return size == 0;
+  }
+
+  void clear() {
+    Arrays.fill(used, false);
+    size = 0;
+  }
+
+  boolean contains(int key) {
+    return find(key) >= 0;
+  }
+
+  boolean add(int key) {
+    int i = slot(key);
+    for (; used[i]; i = (i + 1) & mask)
+      if (keys[i] == key)
+        return false;
+    used[i] = true;
+    keys[i] = key;
+    if (++size * 2 > keys.length)
+      rehash(keys.length * 2);
+    return true;
+  }
+
+  boolean remove(int key) {
+    int i = find(key);
+    if (i < 0)
+      return false;
+    --size;
+    // Moves back every entry that can't be found anymore once i is empty.
+    for (int j = (i + 1) & mask; used[j]; j = (j + 1) & mask) {
+      final int k = slot(keys[j]);
+      if (i <= j ? i < k && k <= j : i < k || k <= j)
+        continue;
+      keys[i] = keys[j];
+      i = j;
+    }
+    used[i] = false;
+    return true;
+  }
+
+  int[] toArray() {
+    int[] result = new int[size];
+    int n = 0;
+    for (int i = 0; i < keys.length; ++i)
+      if (used[i])
+        result[n++] = keys[i];
+    return result;
+  }
+
+  private int find(int key) {
+    for (int i = slot(key); used[i]; i = (i + 1) & mask)
+      if (keys[i] == key)
+        return i;
+    return -1;
+  }
+
+  private int slot(int key) {
+    final int h = key * 0x9E3779B9;
+    return (h ^ (h >>> 16)) & mask;
+  }
+
+  private void allocate(int capacity) {
+    keys = new int[capacity];
+    used = new boolean[capacity];
+    mask = capacity - 1;
+  }
+
+  private void rehash(int capacity) {
+    final int[] oldKeys = keys;
+    final boolean[] oldUsed = used;
+    allocate(capacity);
+    size = 0;
+    for (int i = 0; i < oldKeys.length; ++i)
+      if (oldUsed[i])
+        add(oldKeys[i]);
+  }
+
+  static int tableSize(int expectedSize) {
+    int capacity = 16;
+    while (capacity < expectedSize * 2)
+      capacity *= 2;
+    return capacity;
+  }
+}
+
+// Same table as IntSet, with a value per key. A missing key reads as 0 like
+// C++'s operator[], but isn't inserted.
+final class IntIntMap {
+  private int[] keys;
+  private int[] values;
+  private boolean[] used;
+  private int mask;
+  private int size;
+
+  IntIntMap() {
+    this(8);
+  }
+
+  IntIntMap(int expectedSize) {
+    allocate(IntSet.tableSize(expectedSize));
+  }
+
+  int size() {
+    return size;
+  }
+
+  boolean isEmpty() {
+    return size == 0;
+  }
+
+  void clear() {
+    Arrays.fill(used, false);
+    size = 0;
+  }
+
+  boolean containsKey(int key) {
+    return find(key) >= 0;
+  }
+
+  boolean contains(int key) {
+    return find(key) >= 0;
+  }
+
+  int get(int key) {
+    return getOrDefault(key, 0);
+  }
+
+  int getOrDefault(int key, int defaultValue) {
+    final int i = find(key);
+    return i < 0 ? defaultValue : values[i];
+  }
+
+  void put(int key, int value) {
+    int i = slot(key);
+    for (; used[i]; i = (i + 1) & mask)
+      if (keys[i] == key) {
+        values[i] = value;
+        return;
+      }
+    used[i] = true;
+    keys[i] = key;
+    values[i] = value;
+    if (++size * 2 > keys.length)
+      rehash(keys.length * 2);
+  }
+
+  // Like Map.merge(), e.g. merge(key, 1, Integer::sum), without boxing.
+  int merge(int key, int value, IntBinaryOperator f) {
+    final int i = find(key);
+    if (i < 0) {
+      put(key, value);
+      return value;
+    }
+    return values[i] = f.applyAsInt(values[i], value);
+  }
+
+  boolean remove(int key) {
+    int i = find(key);
+    if (i < 0)
+      return false;
+    --size;
+    for (int j = (i + 1) & mask; used[j]; j = (j + 1) & mask) {
+      final int k = slot(keys[j]);
+      if (i <= j ? i < k && k <= j : i < k || k <= j)
+        continue;
+      keys[i] = keys[j];
+      values[i] = values[j];
+      i = j;
+    }
+    used[i] = false;
+    return true;
+  }
+
+  int[] keys() {
+    int[] result = new int[size];
+    int n = 0;
+    for (int i = 0; i < keys.length; ++i)
+      if (used[i])
+        result[n++] = keys[i];
+    return result;
+  }
+
+  int[] values() {
+    int[] result = new int[size];
+    int n = 0;
+    for (int i = 0; i < keys.length; ++i)
+      if (used[i])
+        result[n++] = values[i];
+    return result;
+  }
+
+  private int find(int key) {
+    for (int i = slot(key); used[i]; i = (i + 1) & mask)
+      if (keys[i] == key)
+        return i;
+    return -1;
+  }
+
+  private int slot(int key) {
+    final int h = key * 0x9E3779B9;
+    return (h ^ (h >>> 16)) & mask;
+  }
+
+  private void allocate(int capacity) {
+    keys = new int[capacity];
+    values = new int[capacity];
+    used = new boolean[capacity];
+    mask = capacity - 1;
+  }
+
+  private void rehash(int capacity) {
+    final int[] oldKeys = keys;
+    final int[] oldValues = values;
+    final boolean[] oldUsed = used;
+    allocate(capacity);
+    size = 0;
+    for (int i = 0; i < oldKeys.length; ++i)
+      if (oldUsed[i])
+        put(oldKeys[i], oldValues[i]);
+  }
+}
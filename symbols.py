@@ -0,0 +1,81 @@
+from typing import Dict, List, Optional
+
+
+class SymbolTable:
+  """Types of the declared variables, scoped by braces.
+
+  `push()` opens a scope and `pop()` closes it and frees everything declared
+  in it. Every name maps to the stack of its types in the open scopes, the
+  innermost last, so a lookup is one dict access and a shadowed declaration
+  reappears once the inner scope is closed:
+
+    int x;        // x: int
+    {
+      string x;   // x: String (shadows int)
+    }             // x: int
+
+  The outermost scope is never closed, and neither are the scopes of a
+  truncated input, so a scope keeps at most `max_scope_size` names, the
+  oldest being forgotten first. This bounds the memory of a converter that
+  streams any number of files.
+  """
+
+  def __init__(self, max_scope_size: int = 1024):
+    self.max_scope_size = max_scope_size
+    # name -> types of the name, innermost scope last
+    self._types: Dict[str, List[str]] = {}
+    # Names declared in each open scope, the outermost first. Dicts are used
+    # as ordered sets.
+    self._scopes: List[Dict[str, None]] = [{}]
+
+  @property
+  def depth(self) -> int:
+    return len(self._scopes) - 1
+
+  def push(self) -> None:
+    self._scopes.append({})
+
+  def pop(self) -> None:
+    # Closing the outermost scope is ignored (e.g. unbalanced braces).
+    if len(self._scopes) == 1:
+      return
+    for name in self._scopes.pop():
+      self._forget(name)
+
+  def _forget(self, name: str) -> None:
+    # Drops the innermost type of `name`.
+    types = self._types[name]
+    types.pop()
+    if not types:
+      del self._types[name]
+
+  def clear(self) -> None:
+    self._types.clear()
+    self._scopes = [{}]
+
+  def __setitem__(self, name: str, type: str) -> None:
+    scope = self._scopes[-1]
+    if name in scope:
+      # Redeclared in the same scope.
+      self._types[name][-1] = type
+      return
+    scope[name] = None
+    self._types.setdefault(name, []).append(type)
+    if len(scope) > self.max_scope_size:
+      # The innermost scope's types are on top of their stacks.
+      oldest = next(iter(scope))
+      del scope[oldest]
+      self._forget(oldest)
+
+  def __getitem__(self, name: str) -> str:
+    return self._types[name][-1]
+
+  def __contains__(self, name: str) -> bool:
+    return name in self._types
+
+  def __len__(self) -> int:
+    return len(self._types)
+
+  def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+    types = self._types.get(name)
+    return types[-1] if types else default
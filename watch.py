@@ -0,0 +1,205 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# inotify(7) constants.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _is_cpp_file(path: str) -> bool:
+  return path.endswith('.cpp')
+
+
+def _walk_dirs(root: str) -> Iterator[str]:
+  yield root
+  for dirpath, dirnames, _ in os.walk(root):
+    for dirname in dirnames:
+      yield os.path.join(dirpath, dirname)
+
+
+def _cpp_files(root: str) -> Iterator[str]:
+  for dirpath, _, filenames in os.walk(root):
+    for filename in filenames:
+      if _is_cpp_file(filename):
+        yield os.path.join(dirpath, filename)
+
+
+class _Watcher:
+  # Reports the `.cpp` files created or modified under `dirs` (recursively),
+  # and the modifications of `files`.
+
+  def __init__(self, dirs: Iterable[str], files: Iterable[str]):
+    self.dirs = [os.path.abspath(d) for d in dirs]
+    self.files = {os.path.abspath(f) for f in files}
+
+  def read(self, timeout: Optional[float]) -> Set[str]:
+    # Blocks for at most `timeout` seconds (forever if None) until there are
+    # changes, returns the changed files.
+    raise NotImplementedError
+
+  def close(self) -> None:
+    pass
+
+
+class InotifyWatcher(_Watcher):
+  """A watcher sleeping in the kernel until something changes.
+
+  Every watched directory gets an inotify watch, added to new subdirectories
+  as they appear, so a change costs the same however large the tree is.
+  Raises OSError if inotify isn't available (e.g. not on Linux, or out of
+  watches).
+  """
+
+  def __init__(self, dirs: Iterable[str], files: Iterable[str]):
+    super().__init__(dirs, files)
+    self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if not hasattr(self._libc, 'inotify_init1'):
+      raise OSError(errno.ENOSYS, 'inotify is not available')
+    self._fd = self._check(self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC))
+    # watch descriptor -> (directory, whether it's watched recursively)
+    self._watches: Dict[int, Tuple[str, bool]] = {}
+    try:
+      for d in self.dirs:
+        self._add_tree(d)
+      for d in {os.path.dirname(f) for f in self.files}:
+        self._add(d, recursive=False)
+    except OSError:
+      self.close()
+      raise
+
+  def _check(self, result: int) -> int:
+    if result < 0:
+      e = ctypes.get_errno()
+      raise OSError(e, os.strerror(e))
+    return result
+
+  def _add(self, path: str, recursive: bool) -> None:
+    wd = self._check(self._libc.inotify_add_watch(
+        self._fd, os.fsencode(path), _IN_MASK))
+    # A directory watched both ways is watched recursively.
+    _, was_recursive = self._watches.get(wd, ('', False))
+    self._watches[wd] = (path, recursive or was_recursive)
+
+  def _add_tree(self, root: str) -> List[str]:
+    # Watches `root` and its subdirectories, returns the `.cpp` files already
+    # in them (created before the watches were added).
+    for d in _walk_dirs(root):
+      self._add(d, recursive=True)
+    return list(_cpp_files(root))
+
+  def _all_files(self) -> Set[str]:
+    changed = {f for d in self.dirs for f in _cpp_files(d)}
+    return changed | {f for f in self.files if os.path.isfile(f)}
+
+  def read(self, timeout: Optional[float]) -> Set[str]:
+    changed: Set[str] = set()
+    if not select.select([self._fd], [], [], timeout)[0]:
+      return changed
+    while True:
+      try:
+        data = os.read(self._fd, 64 * 1024)
+      except BlockingIOError:
+        return changed
+      pos = 0
+      while pos < len(data):
+        wd, mask, _, length = _EVENT.unpack_from(data, pos)
+        pos += _EVENT.size
+        name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+        pos += length
+        if mask & _IN_Q_OVERFLOW:
+          # Events were lost, so anything may have changed.
+          changed |= self._all_files()
+          continue
+        if mask & _IN_IGNORED:
+          self._watches.pop(wd, None)
+          continue
+        if wd not in self._watches:
+          continue
+        d, recursive = self._watches[wd]
+        path = os.path.join(d, name)
+        if mask & _IN_ISDIR:
+          if recursive and mask & (_IN_CREATE | _IN_MOVED_TO):
+            changed.update(self._add_tree(path))
+        elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+          if recursive and _is_cpp_file(path) or path in self.files:
+            changed.add(path)
+
+  def close(self) -> None:
+    if self._fd >= 0:
+      os.close(self._fd)
+      self._fd = -1
+
+
+class PollingWatcher(_Watcher):
+  # Compares the mtimes and sizes of all watched files every `interval`
+  # seconds. The fallback where inotify isn't available.
+
+  def __init__(self, dirs: Iterable[str], files: Iterable[str],
+               interval: float = 1.0):
+    super().__init__(dirs, files)
+    self.interval = interval
+    self._stats = self._scan()
+
+  def _scan(self) -> Dict[str, Tuple[int, int]]:
+    stats: Dict[str, Tuple[int, int]] = {}
+    paths = [f for d in self.dirs for f in _cpp_files(d)]
+    for path in paths + sorted(self.files):
+      try:
+        st = os.stat(path)
+      except FileNotFoundError:
+        continue
+      stats[path] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+  def read(self, timeout: Optional[float]) -> Set[str]:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+      stats = self._scan()
+      changed = {path for path, stat in stats.items()
+                 if self._stats.get(path) != stat}
+      self._stats = stats
+      if changed:
+        return changed
+      if deadline is None:
+        time.sleep(self.interval)
+        continue
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        return changed
+      time.sleep(min(self.interval, remaining))
+
+
+def create_watcher(dirs: Iterable[str], files: Iterable[str]) -> _Watcher:
+  dirs, files = list(dirs), list(files)
+  try:
+    return InotifyWatcher(dirs, files)
+  except OSError:
+    return PollingWatcher(dirs, files)
+
+
+def watch(watcher: _Watcher, debounce: float = 0.2) -> Iterator[List[str]]:
+  # Yields the sorted changed files in batches. A batch is yielded once no
+  # more changes came in for `debounce` seconds, so a burst of saves is
+  # converted once.
+  while True:
+    changed = watcher.read(None)
+    while changed:
+      more = watcher.read(debounce)
+      if not more:
+        break
+      changed |= more
+    existing = sorted(path for path in changed if os.path.isfile(path))
+    if existing:
+      yield existing